@@ -1,14 +1,114 @@
 # detectors/alpr.py
-import easyocr
 import cv2
-reader = easyocr.Reader(["en"])  # you can add other langs
+from detectors.metrics import timed, timer
+from detectors.registry import get_model, setting
 
-def detect_and_read_plate(frame):
-    # frame: OpenCV BGR array
-    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    results = reader.readtext(gray)
+# Crops handed to OCR in the "crop" strategy are resized to this height
+PLATE_HEIGHT = 64
+MAX_CANDIDATES = 3
+
+_rect_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (13, 5))
+_square_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+
+def _readtext(image, plate_crop=False):
+    reader = get_model("ocr")
+    if plate_crop and setting("OCR", {}).get("recognize_only"):
+        # Already a plate region: skip EasyOCR's own text detector
+        return reader.recognize(image)
+    return reader.readtext(image)
+
+
+def _best_text(results):
     # pick the text box with highest confidence and plausible length
     for bbox, text, conf in sorted(results, key=lambda x: -x[2]):
         if len(text) >= 5 and conf > 0.5:
-            return text.replace(" ", "")
-    return None
+            return text.replace(" ", ""), conf
+    return None, 0.0
+
+
+def localize_plates(gray, max_candidates=MAX_CANDIDATES):
+    """
+    Cheap plate-region proposals on a grayscale image: dark-on-light text
+    blobs with a plate-like aspect ratio. Returns up to `max_candidates`
+    (x1,y1,x2,y2) boxes, largest first.
+    """
+    blackhat = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, _rect_kernel)
+    grad = cv2.Sobel(blackhat, cv2.CV_8U, 1, 0, ksize=3)
+    grad = cv2.GaussianBlur(grad, (5, 5), 0)
+    grad = cv2.morphologyEx(grad, cv2.MORPH_CLOSE, _rect_kernel)
+    _, thresh = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    thresh = cv2.erode(thresh, _square_kernel, iterations=1)
+    thresh = cv2.dilate(thresh, _square_kernel, iterations=2)
+
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    h_img, w_img = gray.shape[:2]
+    min_area = (h_img * w_img) * 0.001
+    boxes = []
+    for c in contours:
+        x, y, w, h = cv2.boundingRect(c)
+        if h == 0 or w * h < min_area:
+            continue
+        if 2.0 <= w / h <= 10.0:
+            # pad a little so characters touching the edge survive OCR
+            px, py = w // 10, h // 4
+            boxes.append((w * h, (x - px, y - py, x + w + px, y + h + py)))
+    boxes.sort(key=lambda b: -b[0])
+    return [box for _, box in boxes[:max_candidates]]
+
+
+def vehicle_plate_regions(vehicle_boxes):
+    # plates sit in the lower third of a YOLO vehicle box
+    regions = []
+    for box in vehicle_boxes:
+        x1, y1, x2, y2 = box[:4]
+        regions.append((x1, y1 + (y2 - y1) * 2 // 3, x2, y2))
+    return regions
+
+
+def _resize_to_height(img, height=PLATE_HEIGHT):
+    h, w = img.shape[:2]
+    if h == 0 or w == 0:
+        return None
+    if h <= height:
+        return img
+    width = max(1, int(w * height / h))
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def _read_crops(gray, regions):
+    best, best_conf = None, 0.0
+    for x1, y1, x2, y2 in regions:
+        crop = _resize_to_height(gray[max(0, y1):y2, max(0, x1):x2])
+        if crop is None:
+            continue
+        with timer("alpr_readtext"):
+            results = _readtext(crop, plate_crop=True)
+        text, conf = _best_text(results)
+        if text and conf > best_conf:
+            best, best_conf = text, conf
+    return best
+
+
+@timed("alpr")
+def detect_and_read_plate(frame, strategy="full", vehicle_boxes=None):
+    """
+    frame: OpenCV BGR array.
+
+    strategy="full" runs OCR over the whole frame. strategy="crop" only
+    OCRs candidate plate regions (the lower third of `vehicle_boxes` if
+    given, otherwise regions from localize_plates), each scaled down to
+    PLATE_HEIGHT, and falls back to nothing rather than a full-frame pass.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if strategy == "crop":
+        if vehicle_boxes:
+            regions = vehicle_plate_regions(vehicle_boxes)
+        else:
+            regions = localize_plates(gray)
+        return _read_crops(gray, regions)
+
+    with timer("alpr_readtext"):
+        results = _readtext(gray)
+    text, _ = _best_text(results)
+    return text
@@ -0,0 +1,231 @@
+# detectors/backends.py
+"""
+Inference backends for the vehicle detector.
+
+  torch     the ultralytics .pt model as before
+  onnx      an exported ONNX copy run with ONNX Runtime
+  openvino  an exported OpenVINO IR run with the OpenVINO runtime
+
+Every backend takes a DetectorConfig (input size, INT8, intra-op threads)
+and exposes detect_batch(frames) -> [[(x1,y1,x2,y2, class_name, conf), ...]].
+The ONNX/OpenVINO files are produced ahead of time by export_model()
+(`manage.py export_models`); ultralytics is only needed for that step and
+for the torch backend.
+"""
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# COCO ids of the classes we keep
+VEHICLE_IDS = {2: "car", 5: "bus", 7: "truck"}
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.45
+
+DetectorConfig = namedtuple("DetectorConfig", "backend imgsz int8 threads",
+                            defaults=("torch", 640, False, None))
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def parse_config(value=None, base=None):
+    """
+    DetectorConfig from a dict ({"backend": "onnx", "imgsz": 480}) or a
+    "backend=onnx,imgsz=480,int8=1,threads=2" string, on top of `base`.
+    """
+    fields = dict((base or DetectorConfig())._asdict())
+    if isinstance(value, str):
+        value = dict(part.split("=", 1) for part in value.split(",") if part)
+    for key, raw in (value or {}).items():
+        if key not in fields:
+            raise ValueError(f"unknown detector option {key!r}")
+        if key in ("imgsz", "threads"):
+            raw = int(raw) if raw not in (None, "") else None
+        elif key == "int8" and isinstance(raw, str):
+            raw = raw.lower() in ("1", "true", "yes")
+        fields[key] = raw
+    config = DetectorConfig(**fields)
+    if config.backend not in BACKENDS:
+        raise ValueError(f"unknown detector backend {config.backend!r}")
+    return config
+
+
+def label(config):
+    """Short name for reports, e.g. "onnx-480-int8-t2"."""
+    parts = [config.backend, str(config.imgsz)]
+    if config.int8:
+        parts.append("int8")
+    if config.threads:
+        parts.append(f"t{config.threads}")
+    return "-".join(parts)
+
+
+def exported_path(weights, config, model_dir):
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    name = f"{stem}_{config.imgsz}{'_int8' if config.int8 else ''}"
+    if config.backend == "onnx":
+        return os.path.join(model_dir, f"{name}.onnx")
+    return os.path.join(model_dir, f"{name}_openvino_model")
+
+
+def letterbox(frame, size):
+    """Resize keeping aspect ratio and pad to size x size, like ultralytics."""
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas = np.full((size, size, 3), 114, np.uint8)
+    canvas[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return canvas, scale, (left, top)
+
+
+def preprocess(frames, size):
+    """NCHW float32 RGB batch plus each frame's (scale, pad)."""
+    blobs, transforms = [], []
+    for frame in frames:
+        canvas, scale, pad = letterbox(frame, size)
+        blobs.append(canvas[:, :, ::-1].transpose(2, 0, 1))
+        transforms.append((scale, pad))
+    return np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0, transforms
+
+
+def decode(output, scale, pad, shape, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD):
+    """
+    One image's raw YOLOv8 output (84 x N: cx, cy, w, h, 80 class scores,
+    in letterboxed pixels) to vehicle detections in frame pixels, after
+    per-class NMS.
+    """
+    preds = output.T
+    scores = preds[:, 4:]
+    classes = scores.argmax(axis=1)
+    confs = scores[np.arange(len(classes)), classes]
+    keep = (confs >= conf) & np.isin(classes, list(VEHICLE_IDS))
+    if not keep.any():
+        return []
+    preds, classes, confs = preds[keep], classes[keep], confs[keep]
+
+    left, top = pad
+    cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+    x1 = (cx - bw / 2 - left) / scale
+    y1 = (cy - bh / 2 - top) / scale
+    w, h = bw / scale, bh / scale
+    # Offset boxes by class so NMS never merges a car with a bus
+    offset = classes * 10000.0
+    boxes = np.stack([x1 + offset, y1 + offset, w, h], axis=1)
+    picked = cv2.dnn.NMSBoxes(boxes.tolist(), confs.tolist(), conf, iou)
+
+    fh, fw = shape[:2]
+    dets = []
+    for i in np.array(picked).reshape(-1):
+        bx1, by1 = max(0, int(x1[i])), max(0, int(y1[i]))
+        bx2, by2 = min(fw, int(x1[i] + w[i])), min(fh, int(y1[i] + h[i]))
+        dets.append((bx1, by1, bx2, by2, VEHICLE_IDS[int(classes[i])], float(confs[i])))
+    return dets
+
+
+class TorchBackend:
+    def __init__(self, weights, config):
+        from ultralytics import YOLO
+
+        if config.threads:
+            # PyTorch's pool is process-wide; the last camera loaded wins
+            import torch
+            torch.set_num_threads(config.threads)
+        self.model = YOLO(weights)
+        self.config = config
+
+    def detect_batch(self, frames):
+        results = self.model(list(frames), imgsz=self.config.imgsz, verbose=False)
+        out = []
+        for result in results:
+            dets = []
+            for box in result.boxes:
+                name = self.model.names[int(box.cls)]
+                if name in VEHICLE_IDS.values():
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    dets.append((x1, y1, x2, y2, name, float(box.conf[0])))
+            out.append(dets)
+        return out
+
+
+class OnnxBackend:
+    def __init__(self, path, config):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if config.threads:
+            options.intra_op_num_threads = config.threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.config = config
+
+    def _infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def detect_batch(self, frames):
+        blob, transforms = preprocess(frames, self.config.imgsz)
+        output = self._infer(blob)
+        return [decode(o, scale, pad, f.shape) for o, (scale, pad), f in zip(output, transforms, frames)]
+
+
+class OpenVinoBackend(OnnxBackend):
+    def __init__(self, path, config):
+        import openvino as ov
+
+        core = ov.Core()
+        xml = os.path.join(path, next(f for f in os.listdir(path) if f.endswith(".xml")))
+        properties = {"PERFORMANCE_HINT": "LATENCY"}
+        if config.threads:
+            properties["INFERENCE_NUM_THREADS"] = config.threads
+        self.compiled = core.compile_model(core.read_model(xml), "CPU", properties)
+        self.config = config
+
+    def _infer(self, blob):
+        return self.compiled(blob)[0]
+
+
+def load_backend(config, weights, model_dir):
+    if config.backend == "torch":
+        return TorchBackend(weights, config)
+    path = exported_path(weights, config, model_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found; run `manage.py export_models --backend {config.backend} "
+            f"--imgsz {config.imgsz}{' --int8' if config.int8 else ''}` first"
+        )
+    if config.backend == "onnx":
+        return OnnxBackend(path, config)
+    return OpenVinoBackend(path, config)
+
+
+def export_model(config, weights, model_dir, data=None):
+    """
+    Export `weights` for `config` into model_dir and return the path. ONNX
+    INT8 uses ONNX Runtime dynamic quantisation; OpenVINO INT8 uses
+    ultralytics/NNCF post-training quantisation calibrated on `data`.
+    """
+    import shutil
+
+    from ultralytics import YOLO
+
+    target = exported_path(weights, config, model_dir)
+    os.makedirs(model_dir, exist_ok=True)
+    model = YOLO(weights)
+    if config.backend == "onnx":
+        exported = model.export(format="onnx", imgsz=config.imgsz, dynamic=True, simplify=True)
+        if config.int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+        else:
+            shutil.move(exported, target)
+    elif config.backend == "openvino":
+        kwargs = {"int8": True, "data": data or "coco8.yaml"} if config.int8 else {}
+        exported = model.export(format="openvino", imgsz=config.imgsz, dynamic=True, **kwargs)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+    else:
+        raise ValueError("the torch backend needs no export")
+    return target
@@ -0,0 +1,218 @@
+# detectors/capture.py
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from detectors.metrics import registry
+
+
+def parse_source(source):
+    """
+    Camera.source is stored as text ("0", "rtsp://...", "/path/clip.mp4").
+    OpenCV wants an int for local device indexes.
+    """
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source.strip())
+    return source
+
+
+def is_live_source(source):
+    source = parse_source(source)
+    return not (isinstance(source, str) and os.path.isfile(source))
+
+
+class FrameGrabber:
+    """
+    Reads frames from one camera source on a background thread and keeps
+    only the newest `buffer_size` frames. When the consumer is slower than
+    the camera the oldest buffered frame is dropped, so inference always
+    works on the most recent picture instead of a backlog.
+
+    read() mirrors cv2.VideoCapture.read(): it returns (ok, frame) and only
+    ever hands out a frame once.
+    """
+
+    def __init__(self, source, buffer_size=1, reconnect_delay=2.0):
+        self.source = parse_source(source)
+        self.live = is_live_source(source)
+        self.reconnect_delay = reconnect_delay
+        self._buffer = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._cap = None
+        self._finished = False
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self.read_failures = 0
+
+    def start(self):
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            return False
+        self._thread = threading.Thread(
+            target=self._run, name=f"grabber-{self.source}", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def isOpened(self):
+        return self._thread is not None and not self._finished
+
+    def _reopen(self):
+        if self._cap is not None:
+            self._cap.release()
+        self._stop.wait(self.reconnect_delay)
+        self._cap = cv2.VideoCapture(self.source)
+
+    def _run(self):
+        decode = registry.histogram("decode", str(self.source))
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            ret, frame = self._cap.read()
+            decode.observe(time.perf_counter() - start)
+            if not ret:
+                self.read_failures += 1
+                if not self.live:
+                    break
+                self._reopen()
+                continue
+
+            with self._cond:
+                if len(self._buffer) == self._buffer.maxlen:
+                    self.frames_dropped += 1
+                self.frames_read += 1
+                self._buffer.append(frame)
+                self._cond.notify_all()
+
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+        self._cap.release()
+
+    def read(self, timeout=None):
+        """
+        Wait for the next unread frame. Returns (False, None) once the
+        stream has ended (files) or the grabber was stopped.
+        """
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._buffer or self._finished, timeout=timeout
+            ):
+                return False, None
+            if not self._buffer:
+                return False, None
+            frame = self._buffer.popleft()
+            self.frames_processed += 1
+            return True, frame
+
+    def stats(self):
+        return {
+            "source": str(self.source),
+            "read": self.frames_read,
+            "processed": self.frames_processed,
+            "dropped": self.frames_dropped,
+            "failures": self.read_failures,
+        }
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def release(self):
+        # Same name as cv2.VideoCapture so the command loops read naturally
+        self.stop()
+
+
+_grabbers = {}
+_grabbers_lock = threading.Lock()
+
+
+def open_grabber(source, buffer_size=1):
+    """
+    Return the shared, already started grabber for `source`, creating it on
+    first use. Returns None if the source cannot be opened.
+    """
+    key = str(source)
+    with _grabbers_lock:
+        grabber = _grabbers.get(key)
+        if grabber is not None and grabber.isOpened():
+            return grabber
+        grabber = FrameGrabber(source, buffer_size=buffer_size)
+        if not grabber.start():
+            return None
+        _grabbers[key] = grabber
+        return grabber
+
+
+def close_grabber(source):
+    """
+    Stop the shared grabber for `source` and return its stats. A source
+    that is not open (never opened, or already closed) reports zeros.
+    """
+    with _grabbers_lock:
+        grabber = _grabbers.pop(str(source), None)
+    if grabber is not None:
+        grabber.stop()
+        return grabber.stats()
+    return {"source": str(source), "read": 0, "processed": 0, "dropped": 0, "failures": 0}
+
+
+def format_stats(stats):
+    return (
+        f"[capture {stats['source']}] read={stats['read']} "
+        f"processed={stats['processed']} dropped={stats['dropped']} "
+        f"failures={stats['failures']}"
+    )
+
+
+def wait_for_frame(grabber, poll=0.5):
+    """
+    Convenience loop helper: block until a frame is available, returning
+    None when the stream is over.
+    """
+    while True:
+        ret, frame = grabber.read(timeout=poll)
+        if ret:
+            return frame
+        if not grabber.isOpened():
+            return None
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def iter_frames(path, max_frames=None):
+    """
+    Yield every frame of a recorded clip, or every image in a directory in
+    name order, without dropping any. Used for offline benchmarks.
+    """
+    count = 0
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if max_frames is not None and count >= max_frames:
+                return
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                frame = cv2.imread(os.path.join(path, name))
+                if frame is not None:
+                    count += 1
+                    yield frame
+        return
+
+    cap = cv2.VideoCapture(path)
+    try:
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            count += 1
+            yield frame
+    finally:
+        cap.release()
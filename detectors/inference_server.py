@@ -0,0 +1,157 @@
+# detectors/inference_server.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from detectors.metrics import timer
+
+
+class InferenceServer:
+    """
+    One YOLO worker shared by every camera in the process. Cameras submit
+    frames, the worker groups whatever has arrived within `max_wait` seconds
+    (up to `max_batch` frames) into a single batched model call and hands
+    each camera back its own detection list.
+
+    `detect_batch` defaults to detectors.yolo_detector.detect_vehicles_batch
+    for `config` (a DetectorConfig, default settings.DETECTOR) and can be
+    swapped out (e.g. in tests).
+    """
+
+    def __init__(self, max_batch=8, max_wait=0.02, detect_batch=None, config=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.config = config
+        self._detect_batch = detect_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stop = threading.Event()
+        self.batches = 0
+        self.frames = 0
+
+    def start(self):
+        if self._thread is None:
+            if self._detect_batch is None:
+                from detectors.yolo_detector import detect_vehicles_batch
+                config = self.config
+                self._detect_batch = lambda frames: detect_vehicles_batch(frames, config)
+            self._thread = threading.Thread(
+                target=self._run, name="yolo-inference", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._fail_queued()
+        # The next get_server() starts a fresh one
+        with _server_lock:
+            for key, server in list(_servers.items()):
+                if server is self:
+                    del _servers[key]
+
+    def submit(self, frame, camera=None):
+        """Queue a frame; returns a Future resolving to its detections."""
+        future = Future()
+        if self._stop.is_set():
+            future.set_exception(RuntimeError("inference server stopped"))
+        else:
+            self._queue.put((camera, frame, future))
+        return future
+
+    def detect(self, frame, camera=None, timeout=None):
+        """Blocking drop-in for detect_vehicles(frame)."""
+        # Includes time spent waiting for the batch to fill
+        with timer("yolo_wait", camera or ""):
+            return self.submit(frame, camera).result(timeout=timeout)
+
+    def detect_many(self, frames, camera=None, timeout=None):
+        """
+        Detections for a list of frames (e.g. one camera's slot tiles),
+        submitted together so they share batches. `timeout` covers the
+        whole list.
+        """
+        futures = [self.submit(frame, camera) for frame in frames]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with timer("yolo_wait", camera or ""):
+            return [f.result(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+                    for f in futures]
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stop.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            frames = [frame for _, frame, _ in batch]
+            try:
+                results = self._detect_batch(frames)
+            except Exception as exc:
+                for _, _, future in batch:
+                    future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.frames += len(batch)
+            results = list(results)
+            for (_, _, future), dets in zip(batch, results):
+                future.set_result(dets)
+            for _, _, future in batch[len(results):]:
+                future.set_exception(RuntimeError(
+                    f"detector returned {len(results)} results for {len(batch)} frames"))
+        self._fail_queued()
+
+    def _fail_queued(self):
+        # Fail anything still queued so callers don't hang on shutdown
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[2].set_exception(RuntimeError("inference server stopped"))
+
+    def stats(self):
+        avg = self.frames / self.batches if self.batches else 0.0
+        return {"batches": self.batches, "frames": self.frames, "avg_batch": round(avg, 2)}
+
+
+_servers = {}
+_server_lock = threading.Lock()
+
+
+def get_server(max_batch=8, max_wait=0.02, config=None):
+    """
+    Process-wide server per detector config, started on first use. Cameras
+    sharing a config (same backend and input size) share its batches.
+    """
+    with _server_lock:
+        server = _servers.get(config)
+        if server is None:
+            server = _servers[config] = InferenceServer(
+                max_batch=max_batch, max_wait=max_wait, config=config
+            ).start()
+        return server
@@ -0,0 +1,182 @@
+# detectors/metrics.py
+import functools
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds, Prometheus style (+Inf is implicit)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and a lock."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        """Bucket upper bound containing the q-th observation (an estimate)."""
+        counts, _, total = self.snapshot()
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self._hists = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage, camera=""):
+        key = (stage, camera)
+        hist = self._hists.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, stage, seconds, camera=""):
+        self.histogram(stage, camera).observe(seconds)
+
+    def items(self):
+        with self._lock:
+            return sorted(self._hists.items())
+
+    def clear(self):
+        with self._lock:
+            self._hists.clear()
+
+
+registry = Registry()
+
+
+class _Timer:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+        return False
+
+
+def timer(stage, camera=""):
+    """`with timer("ocr", "entrance"): ...` records into the registry."""
+    return _Timer(registry.histogram(stage, camera))
+
+
+def timed(stage):
+    """Decorator recording every call of the function under `stage`."""
+    def decorate(func):
+        hist = registry.histogram(stage)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(hist):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class CameraTimer:
+    """The timer interface the camera pipelines use, bound to one camera."""
+
+    def __init__(self, camera):
+        self.camera = camera
+
+    def time(self, stage):
+        return timer(stage, self.camera)
+
+
+def render_prometheus():
+    lines = [
+        "# HELP parking_stage_seconds Time spent per pipeline stage",
+        "# TYPE parking_stage_seconds histogram",
+    ]
+    for (stage, camera), hist in registry.items():
+        counts, total, count = hist.snapshot()
+        labels = f'stage="{stage}",camera="{camera}"'
+        cumulative = 0
+        for bound, n in zip(hist.buckets, counts):
+            cumulative += n
+            lines.append(f'parking_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'parking_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"parking_stage_seconds_sum{{{labels}}} {total}")
+        lines.append(f"parking_stage_seconds_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def summary_lines():
+    """One human-readable line per camera: count and ~p50/p95 per stage."""
+    per_camera = {}
+    for (stage, camera), hist in registry.items():
+        if not hist.count:
+            continue
+        per_camera.setdefault(camera or "-", []).append(
+            f"{stage} n={hist.count} avg={hist.sum / hist.count * 1000:.1f}ms "
+            f"p50<={hist.quantile(0.5) * 1000:g}ms p95<={hist.quantile(0.95) * 1000:g}ms"
+        )
+    return [f"[metrics {camera}] " + " | ".join(parts) for camera, parts in sorted(per_camera.items())]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread (one per camera process)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_log_reporter(interval, log=print):
+    """Print summary_lines() every `interval` seconds from a daemon thread."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            for line in summary_lines():
+                log(line)
+
+    threading.Thread(target=run, name="metrics-log", daemon=True).start()
+    return stop
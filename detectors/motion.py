@@ -0,0 +1,82 @@
+# detectors/motion.py
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap "did anything move?" check in front of the detectors. Frames are
+    shrunk to `width` pixels, blurred and compared against a slowly
+    updated background; inference only runs when at least `min_area` of
+    the watched pixels changed by more than `threshold` grey levels, or
+    when `refresh_seconds` have passed since the last frame let through.
+
+    `regions` (polygons in full-frame pixels, e.g. slot outlines) limits
+    the check to those areas; by default the whole frame is watched.
+    """
+
+    def __init__(self, threshold=25, min_area=0.002, refresh_seconds=5.0,
+                 width=160, regions=None, alpha=0.05):
+        self.threshold = threshold
+        self.min_area = min_area
+        self.refresh_seconds = refresh_seconds
+        self.width = width
+        self.regions = regions
+        self.alpha = alpha
+        self._background = None
+        self._mask = None
+        self._mask_pixels = 0
+        self._frame_shape = None
+        self._last_pass = 0.0
+        self.passed = 0
+        self.skipped = 0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / w if w > self.width else 1.0
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA) if scale != 1.0 else frame
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0), scale
+
+    def _reset(self, small, scale, frame_shape):
+        self._background = small.astype(np.float32)
+        self._frame_shape = frame_shape
+        self._mask = None
+        self._mask_pixels = small.size
+        if self.regions:
+            mask = np.zeros(small.shape, np.uint8)
+            for poly in self.regions:
+                pts = (np.asarray(poly, np.float32).reshape(-1, 2) * scale).astype(np.int32)
+                cv2.fillPoly(mask, [pts.reshape(-1, 1, 2)], 1)
+            self._mask = mask.astype(bool)
+            self._mask_pixels = max(1, int(self._mask.sum()))
+
+    def motion_fraction(self, frame):
+        """Fraction of watched pixels that changed; updates the background."""
+        small, scale = self._prepare(frame)
+        if self._background is None or frame.shape[:2] != self._frame_shape:
+            self._reset(small, scale, frame.shape[:2])
+            return 1.0
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+        moving = diff > self.threshold
+        if self._mask is not None:
+            moving &= self._mask
+        cv2.accumulateWeighted(small, self._background, self.alpha)
+        return np.count_nonzero(moving) / self._mask_pixels
+
+    def should_process(self, frame, force=False):
+        now = time.monotonic()
+        moved = self.motion_fraction(frame) >= self.min_area
+        if moved or force or now - self._last_pass >= self.refresh_seconds:
+            self._last_pass = now
+            self.passed += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        return {"passed": self.passed, "skipped": self.skipped}
@@ -0,0 +1,124 @@
+# detectors/registry.py
+import threading
+import time
+
+# Heavy models are built on first use, once per process, and shared by
+# every camera. Nothing here imports torch/ultralytics/easyocr until a
+# model is actually requested, so web workers and `migrate` stay light.
+_loaders = {}
+_defaults = {}
+_models = {}
+_load_times = {}
+_lock = threading.Lock()
+
+
+def setting(name, default):
+    """Read a Django setting if Django is configured, else `default`."""
+    try:
+        from django.conf import settings
+
+        return getattr(settings, name, default)
+    except Exception:
+        return default
+
+
+def register(name, defaults=None):
+    """
+    Decorator registering a loader under `name`. Extra arguments given to
+    get_model() are passed to the loader and become part of the cache key,
+    so e.g. each detector configuration is loaded once; `defaults()`
+    supplies them when get_model() is called without any.
+    """
+    def decorate(loader):
+        _loaders[name] = loader
+        if defaults is not None:
+            _defaults[name] = defaults
+        return loader
+    return decorate
+
+
+def _key(name, args):
+    return ":".join([name, *map(str, args)]) if args else name
+
+
+def get_model(name, *args):
+    if not args and name in _defaults:
+        args = _defaults[name]()
+    key = _key(name, args)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            start = time.perf_counter()
+            model = _loaders[name](*args)
+            _load_times[key] = time.perf_counter() - start
+            _models[key] = model
+    return model
+
+
+def is_loaded(name, *args):
+    if not args and name in _defaults:
+        args = _defaults[name]()
+    return _key(name, args) in _models
+
+
+def load_times():
+    return dict(_load_times)
+
+
+def names():
+    """Names of the registered models."""
+    return sorted(_loaders)
+
+
+def warm(names=None):
+    """Load the given models (all registered ones by default)."""
+    for name in names or list(_loaders):
+        get_model(name)
+    return load_times()
+
+
+def unload(name=None):
+    with _lock:
+        if name is None:
+            _models.clear()
+        else:
+            for key in [k for k in _models if k == name or k.startswith(name + ":")]:
+                del _models[key]
+
+
+def detector_config(overrides=None):
+    """settings.DETECTOR with `overrides` (dict or "k=v,..." string) on top."""
+    from detectors.backends import parse_config
+
+    return parse_config(overrides, parse_config(setting("DETECTOR", None)))
+
+
+@register("yolo", defaults=lambda: (detector_config(),))
+def _load_yolo(config):
+    from detectors.backends import load_backend
+
+    return load_backend(
+        config,
+        setting("YOLO_WEIGHTS", "yolov8s.pt"),
+        str(setting("MODEL_DIR", "models")),
+    )
+
+
+@register("ocr")
+def _load_ocr():
+    import easyocr
+
+    options = setting("OCR", {})
+    if options.get("threads"):
+        import torch
+        torch.set_num_threads(options["threads"])
+    # gpu=False: the gate boxes are CPU only. quantize applies PyTorch
+    # dynamic INT8 quantisation to the recogniser.
+    return easyocr.Reader(
+        setting("OCR_LANGUAGES", ["en"]),
+        gpu=False,
+        quantize=options.get("int8", True),
+    )
@@ -0,0 +1,93 @@
+# detectors/tiling.py
+import math
+
+
+def expand(rect, margin, shape):
+    """Grow (x1,y1,x2,y2) by `margin` of its size on every side, clipped to the frame."""
+    x1, y1, x2, y2 = rect
+    dx, dy = int((x2 - x1) * margin), int((y2 - y1) * margin)
+    h, w = shape[:2]
+    return max(0, x1 - dx), max(0, y1 - dy), min(w, x2 + dx), min(h, y2 + dy)
+
+
+def merge_rects(rects):
+    """Union overlapping rectangles until none overlap."""
+    rects = [tuple(r) for r in rects]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        for r in rects:
+            for i, o in enumerate(out):
+                if r[0] < o[2] and o[0] < r[2] and r[1] < o[3] and o[1] < r[3]:
+                    out[i] = (min(r[0], o[0]), min(r[1], o[1]), max(r[2], o[2]), max(r[3], o[3]))
+                    merged = True
+                    break
+            else:
+                out.append(r)
+        rects = out
+    return rects
+
+
+def _spans(start, stop, tile, overlap):
+    length = stop - start
+    if length <= tile:
+        return [(start, stop)]
+    step = tile - int(tile * overlap)
+    n = math.ceil((length - tile) / step) + 1
+    # Spread the tiles evenly so the last one ends exactly at `stop`
+    starts = [start + round(i * (length - tile) / (n - 1)) for i in range(n)]
+    return [(s, s + tile) for s in starts]
+
+
+def split(rect, tile, overlap=0.2):
+    """Cover `rect` with tiles of at most tile x tile pixels, overlapping by `overlap`."""
+    x1, y1, x2, y2 = rect
+    return [(tx1, ty1, tx2, ty2)
+            for ty1, ty2 in _spans(y1, y2, tile, overlap)
+            for tx1, tx2 in _spans(x1, x2, tile, overlap)]
+
+
+def plan_tiles(rects, shape, tile, margin=0.25, overlap=0.2):
+    """
+    Detection tiles for regions of interest (e.g. slot bounding boxes):
+    each grown by `margin` so whole vehicles fit, overlapping ones merged,
+    and anything larger than `tile` pixels split into overlapping tiles
+    that the detector can take at (close to) native resolution.
+    """
+    grown = [expand(r, margin, shape) for r in rects]
+    tiles = []
+    for region in merge_rects(grown):
+        tiles.extend(split(region, tile, overlap))
+    return tiles
+
+
+def coverage(tiles, shape):
+    """Fraction of frame pixels the tiles make the detector look at."""
+    h, w = shape[:2]
+    return sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in tiles) / float(h * w)
+
+
+def _overlap_of_smaller(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return ix * iy / smaller if smaller else 0.0
+
+
+def merge_detections(tiles, results, threshold=0.6):
+    """
+    Map per-tile detections back to frame coordinates and drop duplicates
+    from overlapping tiles: a box mostly inside a bigger one (a vehicle cut
+    by a tile edge, or seen twice) is discarded.
+    """
+    boxes = []
+    for (tx, ty, _, _), dets in zip(tiles, results):
+        for x1, y1, x2, y2, *rest in dets:
+            boxes.append((x1 + tx, y1 + ty, x2 + tx, y2 + ty, *rest))
+    boxes.sort(key=lambda d: -(d[2] - d[0]) * (d[3] - d[1]))
+    kept = []
+    for box in boxes:
+        if all(_overlap_of_smaller(box, k) < threshold for k in kept):
+            kept.append(box)
+    return kept
@@ -0,0 +1,171 @@
+# detectors/tracker.py
+from collections import Counter
+from itertools import count
+
+
+def iou(a, b):
+    ax1, ay1, ax2, ay2 = a[:4]
+    bx1, by1, bx2, by2 = b[:4]
+    ix1, iy1 = max(ax1, bx1), max(ay1, by1)
+    ix2, iy2 = min(ax2, bx2), min(ay2, by2)
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / union if union else 0.0
+
+
+def centroid(box):
+    x1, y1, x2, y2 = box[:4]
+    return (x1 + x2) / 2, (y1 + y2) / 2
+
+
+class PlateVoter:
+    """
+    Collects OCR reads of one vehicle and votes character by character.
+    Reads are grouped by length (the most common length wins) and each
+    position takes its majority character. The plate is confirmed once
+    every position is backed by at least `required` reads.
+    """
+
+    def __init__(self, required=3, max_reads=15):
+        self.required = required
+        self.max_reads = max_reads
+        self.reads = []
+
+    def add(self, text):
+        if text and len(self.reads) < self.max_reads:
+            self.reads.append(text)
+        return self.result()
+
+    def vote(self):
+        """Returns (voted_plate, weakest_position_support)."""
+        if not self.reads:
+            return None, 0
+        length = Counter(len(r) for r in self.reads).most_common(1)[0][0]
+        same_length = [r for r in self.reads if len(r) == length]
+        chars, support = [], len(same_length)
+        for i in range(length):
+            ch, n = Counter(r[i] for r in same_length).most_common(1)[0]
+            chars.append(ch)
+            support = min(support, n)
+        return "".join(chars), support
+
+    def result(self):
+        plate, support = self.vote()
+        return plate if support >= self.required else None
+
+    @property
+    def exhausted(self):
+        return len(self.reads) >= self.max_reads
+
+
+class Track:
+    def __init__(self, track_id, box, required_votes):
+        self.id = track_id
+        self.box = box
+        self.missed = 0
+        self.age = 1
+        self.plate = None
+        self.voter = PlateVoter(required=required_votes)
+
+    @property
+    def needs_ocr(self):
+        return self.plate is None and not self.voter.exhausted
+
+    def add_read(self, text):
+        """
+        Feed one OCR result. Returns the plate the first time the vote
+        confirms it, None otherwise; after that needs_ocr is False.
+        """
+        if self.plate is not None:
+            return None
+        self.plate = self.voter.add(text)
+        return self.plate
+
+
+class VehicleTracker:
+    """
+    Greedy IoU tracker over detect_vehicles() boxes with a centroid
+    distance fallback for fast-moving cars. Tracks unseen for more than
+    `max_missed` frames are dropped (the car left the view).
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=15, max_distance=80,
+                 required_votes=3):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_distance = max_distance
+        self.required_votes = required_votes
+        self.tracks = {}
+        self._ids = count(1)
+
+    def _match_score(self, track, det):
+        overlap = iou(track.box, det)
+        if overlap >= self.iou_threshold:
+            return 1.0 + overlap
+        (tx, ty), (dx, dy) = centroid(track.box), centroid(det)
+        dist = ((tx - dx) ** 2 + (ty - dy) ** 2) ** 0.5
+        if dist <= self.max_distance:
+            return 1.0 - dist / self.max_distance
+        return None
+
+    def update(self, detections):
+        """
+        detections: list of (x1,y1,x2,y2, ...) for this frame.
+        Returns the tracks seen in this frame, in detection order.
+        """
+        candidates = []
+        for tid, track in self.tracks.items():
+            for di, det in enumerate(detections):
+                score = self._match_score(track, det)
+                if score is not None:
+                    candidates.append((score, tid, di))
+        candidates.sort(reverse=True)
+
+        matched_tracks, assigned = set(), {}
+        for score, tid, di in candidates:
+            if tid in matched_tracks or di in assigned:
+                continue
+            matched_tracks.add(tid)
+            assigned[di] = self.tracks[tid]
+
+        seen = []
+        for di, det in enumerate(detections):
+            track = assigned.get(di)
+            if track is None:
+                track = Track(next(self._ids), det[:4], self.required_votes)
+                self.tracks[track.id] = track
+            else:
+                track.box = det[:4]
+                track.missed = 0
+                track.age += 1
+            seen.append(track)
+
+        seen_ids = {t.id for t in seen}
+        for tid in list(self.tracks):
+            if tid not in seen_ids:
+                self.tracks[tid].missed += 1
+                if self.tracks[tid].missed > self.max_missed:
+                    del self.tracks[tid]
+        return seen
+
+
+def confirmed_plates(tracker, frame, detections, read_plate):
+    """
+    Advance `tracker` with this frame's detections and OCR only the tracks
+    that are still voting. `read_plate` is called on each vehicle crop.
+    Returns [(track, plate)] for plates confirmed on this frame.
+    """
+    confirmed = []
+    for track in tracker.update(detections):
+        if not track.needs_ocr:
+            continue
+        x1, y1, x2, y2 = track.box
+        text = read_plate(frame[max(0, y1):y2, max(0, x1):x2])
+        if text:
+            text = text.strip().upper()
+        plate = track.add_read(text)
+        if plate:
+            confirmed.append((track, plate))
+    return confirmed
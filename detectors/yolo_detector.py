@@ -1,20 +1,30 @@
-from ultralytics import YOLO
-import cv2
+from detectors.metrics import timed
+from detectors.registry import get_model
 
-model = YOLO("yolov8s.pt")  # or yolov8n/yolov8m as you need
+# The detector backend (torch/onnx/openvino, input size, threads) comes
+# from settings.DETECTOR, or a DetectorConfig per camera; see
+# detectors/backends.py. Models load on first detection, not at import.
 
-def detect_vehicles(frame):
+
+def _backend(config=None):
+    return get_model("yolo", config) if config else get_model("yolo")
+
+
+@timed("yolo")
+def detect_vehicles(frame, config=None):
     """
     Returns list of (x1,y1,x2,y2, class_name, confidence)
     for each car/truck/bus detected.
     """
-    result = model(frame)[0]
-    dets = []
-    for box in result.boxes:
-        cls = int(box.cls)
-        name = model.names[cls]
-        if name in ("car","truck","bus"):
-            x1,y1,x2,y2 = map(int, box.xyxy[0])
-            conf = float(box.conf[0])
-            dets.append((x1,y1,x2,y2, name, conf))
-    return dets
+    return _backend(config).detect_batch([frame])[0]
+
+
+@timed("yolo_batch")
+def detect_vehicles_batch(frames, config=None):
+    """
+    Same as detect_vehicles but for a list of frames in one model call.
+    Returns one detection list per input frame, in order.
+    """
+    if not frames:
+        return []
+    return _backend(config).detect_batch(list(frames))
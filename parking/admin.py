@@ -1,21 +1,100 @@
 # parking/admin.py
-from django.contrib import admin
-from .models import ParkingRecord, Payment, Camera
+from decimal import Decimal
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils.functional import cached_property
+from . import counters, payments
+from .models import ParkingRecord, Payment, Camera, ParkingSlot, ArchivedParkingRecord, PaymentEvent
 
-admin.site.register(ParkingRecord)
-# admin.site.register(Payment)
 admin.site.register(Camera)
 
+
+def estimated_rows(model):
+    """The planner's row estimate for a table, where the backend keeps one."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute("SELECT TABLE_ROWS FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) over a whole large table is a full scan on PostgreSQL/InnoDB;
+    unfiltered listings above `threshold` rows use the planner estimate
+    instead. Filtered listings (index-backed) and SQLite count exactly.
+    """
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = estimated_rows(self.object_list.model)
+            if estimate and estimate > self.threshold:
+                return estimate
+        return super().count
+
+
+@admin.register(ParkingRecord)
+class ParkingRecordAdmin(admin.ModelAdmin):
+    list_display = ("plate", "entry_time", "exit_time", "section", "slot", "paid")
+    list_filter = ("paid", "section", "entry_time")
+    # Prefix match can use the plate index; "contains" cannot
+    search_fields = ("^plate",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(ArchivedParkingRecord)
+class ArchivedParkingRecordAdmin(admin.ModelAdmin):
+    list_display = ("plate", "entry_time", "exit_time", "section", "payment_amount")
+    list_filter = ("month", "section")
+    search_fields = ("^plate",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(ParkingSlot)
+class ParkingSlotAdmin(admin.ModelAdmin):
+    list_display = ("name", "camera")
+    list_filter = ("camera",)
+    list_select_related = ("camera",)
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ("parking_record", "method", "status", "amount")
+    list_display = ("parking_record", "method", "status", "amount", "created_at")
+    list_filter = ("status", "method", "created_at")
+    list_select_related = ("parking_record",)
+    search_fields = ("^parking_record__plate", "=razorpay_order_id")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     actions = ["mark_success"]
 
     def mark_success(self, request, queryset):
-        for obj in queryset:
-            obj.status = 'SUCCESS'
-            obj.parking_record.paid = True
-            obj.parking_record.save()
-            obj.save()
+        # Set-based: one UPDATE per table however many rows are selected
+        with transaction.atomic():
+            # Locked, and only rows not yet SUCCESS, so a payment the
+            # reconciler settles meanwhile is never counted twice
+            rows = list(Payment.objects.select_for_update()
+                        .filter(pk__in=queryset.values("pk")).exclude(status="SUCCESS")
+                        .values_list("pk", "parking_record_id", "amount"))
+            ids = [pk for pk, _, _ in rows]
+            revenue = sum((amount for _, _, amount in rows), Decimal("0.00"))
+            if rows:
+                ParkingRecord.objects.filter(pk__in=[rec for _, rec, _ in rows]).update(paid=True)
+                payments.set_status(ids, "SUCCESS")
+                counters.bump({counters.revenue_key(): revenue})
+        self.message_user(request, f"Marked {len(ids)} payments as SUCCESS", messages.SUCCESS)
     mark_success.short_description = "Mark selected payments as SUCCESS"
 
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ("order_id", "status", "amount", "source", "received_at", "processed_at")
+    list_filter = ("status", "source")
+    search_fields = ("=order_id",)
@@ -0,0 +1,103 @@
+# parking/archive.py
+"""
+Keeps ParkingRecord small: closed and paid sessions older than a cutoff
+move, in batches, to ArchivedParkingRecord (payment folded in) and leave
+the hot table. Gate lookups and the dashboard only ever see the hot
+table; reports go through sessions(), which reads both.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ArchivedParkingRecord, ParkingRecord
+
+# Columns shared by both tables, in the order sessions() returns them
+FIELDS = ("id", "plate", "entry_time", "exit_time", "section", "slot", "paid")
+
+
+def archivable(before):
+    return ParkingRecord.objects.filter(paid=True, exit_time__isnull=False, exit_time__lt=before)
+
+
+def _archived(rec):
+    payment = getattr(rec, "payment", None)
+    month = timezone.localtime(rec.exit_time).date().replace(day=1)
+    return ArchivedParkingRecord(
+        id=rec.pk, plate=rec.plate, entry_time=rec.entry_time, exit_time=rec.exit_time,
+        section=rec.section, slot=rec.slot, paid=rec.paid, month=month,
+        payment_method=payment.method if payment else None,
+        payment_status=payment.status if payment else None,
+        payment_amount=payment.amount if payment else None,
+        razorpay_order_id=payment.razorpay_order_id if payment else None,
+    )
+
+
+def archive_sessions(before=None, batch_size=None, log=print):
+    """
+    Move closed, paid sessions that exited before `before` (default:
+    ARCHIVE_AFTER_DAYS ago) to the archive table. Each batch is copied and
+    deleted in one transaction, so a crash never loses or duplicates a
+    session. Returns the number archived.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(archivable(before).select_related("payment").order_by("pk")[:batch_size])
+            if not batch:
+                break
+            # No ignore_conflicts: an id already in the archive (another
+            # session) raises and rolls the batch back instead of deleting
+            # a session that was never copied
+            ArchivedParkingRecord.objects.bulk_create([_archived(r) for r in batch])
+            # Cascades to Payment in one DELETE per table
+            ParkingRecord.objects.filter(pk__in=[r.pk for r in batch]).delete()
+        moved += len(batch)
+        log(f"[archive] moved {moved} sessions")
+    return moved
+
+
+def sessions(since=None, until=None, section=None, closed=False, fields=FIELDS, annotate=None):
+    """
+    Sessions from the hot and archive tables as one UNION ALL query of
+    `fields` rows, for reports. `since`/`until` bound the entry time. Archived
+    rows are always closed; pass closed=True to drop open hot sessions too.
+    `annotate` adds computed columns (on both tables) that `fields` can name.
+    """
+    hot = ParkingRecord.objects.all()
+    cold = ArchivedParkingRecord.objects.all()
+    if since is not None:
+        hot, cold = hot.filter(entry_time__gte=since), cold.filter(entry_time__gte=since)
+        # Nothing that entered after `since` can have exited before it
+        cold = cold.filter(month__gte=timezone.localtime(since).date().replace(day=1))
+    if until is not None:
+        hot, cold = hot.filter(entry_time__lt=until), cold.filter(entry_time__lt=until)
+    if section is not None:
+        hot, cold = hot.filter(section=section), cold.filter(section=section)
+    if closed:
+        hot = hot.filter(exit_time__isnull=False)
+    if annotate:
+        hot, cold = hot.annotate(**annotate), cold.annotate(**annotate)
+    return hot.values_list(*fields).union(cold.values_list(*fields), all=True)
+
+
+def start_archiver(interval, log=print):
+    """Run archive_sessions() every `interval` seconds from a daemon thread."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                archive_sessions(log=log)
+            except Exception as exc:
+                log(f"[archive] failed: {exc}")
+            finally:
+                close_old_connections()
+
+    threading.Thread(target=run, name="archiver", daemon=True).start()
+    return stop
@@ -0,0 +1,116 @@
+# parking/counters.py
+from collections import Counter
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import DashboardCounter, ParkingRecord, Payment
+
+INSIDE = "inside"
+OCCUPIED_PREFIX = "occupied:"
+REVENUE_PREFIX = "revenue:"
+SNAPSHOT_CACHE_KEY = "parking:dashboard"
+SNAPSHOT_TTL = 1  # seconds; every viewer within this window shares one read
+
+
+def occupied_key(section):
+    return f"{OCCUPIED_PREFIX}{section}"
+
+
+def revenue_key(day=None):
+    day = day or timezone.localdate()
+    return f"{REVENUE_PREFIX}{day.isoformat()}"
+
+
+def bump(deltas):
+    """
+    Apply {key: delta} to the counters with F() updates, creating missing
+    rows. Call it inside the transaction that made the change so counters
+    and records commit together.
+    """
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        delta = Decimal(delta)
+        if DashboardCounter.objects.filter(key=key).update(value=F("value") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                DashboardCounter.objects.create(key=key, value=delta)
+        except IntegrityError:
+            # Someone else created it first
+            DashboardCounter.objects.filter(key=key).update(value=F("value") + delta)
+    cache.delete(SNAPSHOT_CACHE_KEY)
+
+
+def session_deltas(entered=0, exited_sections=(), assigned_sections=(), released_sections=()):
+    """
+    Counter changes for a batch of session events. `exited_sections`,
+    `assigned_sections` and `released_sections` list the section of each
+    closed, newly slotted or unslotted session (None for sessions without
+    a slot).
+    """
+    deltas = Counter()
+    deltas[INSIDE] += entered - len(exited_sections)
+    for section in exited_sections:
+        if section:
+            deltas[occupied_key(section)] -= 1
+    for section in assigned_sections:
+        if section:
+            deltas[occupied_key(section)] += 1
+    for section in released_sections:
+        if section:
+            deltas[occupied_key(section)] -= 1
+    return deltas
+
+
+def rebuild():
+    """Recompute every counter from the tables (startup / repair)."""
+    today = timezone.localdate()
+    with transaction.atomic():
+        DashboardCounter.objects.all().delete()
+        rows = [DashboardCounter(
+            key=INSIDE,
+            value=ParkingRecord.objects.filter(exit_time__isnull=True).count(),
+        )]
+        occupied = (ParkingRecord.objects
+                    .filter(exit_time__isnull=True, slot__isnull=False)
+                    .values("section").annotate(n=Count("id")))
+        rows += [DashboardCounter(key=occupied_key(r["section"]), value=r["n"])
+                 for r in occupied if r["section"]]
+        revenue = Payment.objects.filter(
+            status="SUCCESS", updated_at__date=today
+        ).aggregate(total=Sum("amount"))["total"]
+        rows.append(DashboardCounter(key=revenue_key(today), value=revenue or 0))
+        DashboardCounter.objects.bulk_create(rows)
+    cache.delete(SNAPSHOT_CACHE_KEY)
+
+
+def snapshot():
+    """
+    Dashboard numbers from the counter table, cached for SNAPSHOT_TTL
+    seconds so concurrent viewers share a single small query.
+    """
+    data = cache.get(SNAPSHOT_CACHE_KEY)
+    if data is not None:
+        return data
+
+    today_key = revenue_key()
+    values = dict(DashboardCounter.objects.filter(key__in=[INSIDE, today_key])
+                  .values_list("key", "value"))
+    sections = {
+        key[len(OCCUPIED_PREFIX):]: int(value)
+        for key, value in DashboardCounter.objects
+        .filter(key__startswith=OCCUPIED_PREFIX).values_list("key", "value")
+    }
+    data = {
+        "inside": int(values.get(INSIDE, 0)),
+        "occupied": sections,
+        "revenue_today": str(values.get(today_key, Decimal("0.00"))),
+        "updated": timezone.now().isoformat(),
+    }
+    cache.set(SNAPSHOT_CACHE_KEY, data, SNAPSHOT_TTL)
+    return data
@@ -0,0 +1,122 @@
+# parking/dbbench.py
+# Simulated camera writers hammering the configured database at once, to
+# compare backends (SQLite WAL vs MySQL/PostgreSQL) and connection setups.
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+
+from . import counters
+from .events import apply_events, entry_event, exit_event, slot_event
+from .models import DashboardCounter, ParkingRecord
+from .replay import percentile
+from .sessions import OpenSessionIndex
+
+PLATE_PREFIX = "BENCH"
+SECTION_PREFIX = "Bench "
+# A batch that still fails after this many retries fails its writer
+MAX_RETRIES = 5
+RETRY_DELAY = 0.05
+
+
+def camera_events(camera, sessions):
+    """Entry, slot and exit events for `sessions` made-up plates of one camera."""
+    plates = [f"{PLATE_PREFIX}{camera:02d}X{i:05d}" for i in range(sessions)]
+    return (
+        [entry_event(p) for p in plates]
+        + [slot_event(p, f"{SECTION_PREFIX}{camera}", f"S{i % 50}") for i, p in enumerate(plates)]
+        + [exit_event(p) for p in plates]
+    )
+
+
+def _writer(camera, events, batch_size, start, result):
+    index = OpenSessionIndex()
+    quiet = lambda msg: None
+    waits, latencies, retries = [], [], 0
+    start.wait()
+    try:
+        for i in range(0, len(events), batch_size):
+            batch = events[i:i + batch_size]
+            t0 = time.perf_counter()
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    with transaction.atomic():
+                        # SQLite takes the file write lock at BEGIN IMMEDIATE,
+                        # so this is the time spent queued behind other writers
+                        begun = time.perf_counter()
+                        apply_events(batch, log=quiet, index=index)
+                    break
+                except OperationalError:
+                    # Busy timeout expired (or a deadlock on server backends)
+                    if attempt == MAX_RETRIES:
+                        raise
+                    retries += 1
+                    index.clear()
+                    time.sleep(RETRY_DELAY * 2 ** attempt)
+            done = time.perf_counter()
+            waits.append(begun - t0)
+            latencies.append(done - t0)
+    finally:
+        connection.close()
+    result.update(waits=waits, latencies=latencies, retries=retries, events=len(events))
+
+
+def run_writers(writers=4, sessions=100, batch_size=20):
+    """
+    Run `writers` threads (each with its own DB connection, like separate
+    camera workers), each writing entry/slot/exit events for `sessions`
+    vehicles in batches. Returns throughput, batch latency and (SQLite only)
+    the time spent queued for the write lock at BEGIN IMMEDIATE; a writer
+    whose batch fails MAX_RETRIES times in a row stops and is counted in
+    failed_writers.
+    """
+    start = threading.Barrier(writers + 1)
+    results = [{} for _ in range(writers)]
+    threads = [
+        threading.Thread(target=_writer, args=(n, camera_events(n, sessions), batch_size, start, results[n]))
+        for n in range(writers)
+    ]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    waits = sorted(w for r in results for w in r.get("waits", ()))
+    latencies = sorted(l for r in results for l in r.get("latencies", ()))
+    events = sum(r.get("events", 0) for r in results)
+    # Only SQLite queues writers at BEGIN; server backends wait on row
+    # locks inside the batch, which batch latency already includes
+    sqlite = connection.vendor == "sqlite"
+    return {
+        "backend": connection.vendor,
+        "writers": writers,
+        "events": events,
+        "batches": len(latencies),
+        "seconds": round(elapsed, 3),
+        "events_per_sec": round(events / elapsed, 1) if elapsed else 0.0,
+        "sqlite_lock_wait_total_ms": round(sum(waits) * 1000, 1) if sqlite else None,
+        "sqlite_lock_wait_p95_ms": round(percentile(waits, 0.95) * 1000, 2) if sqlite else None,
+        "batch_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "batch_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "retries": sum(r.get("retries", 0) for r in results),
+        "failed_writers": sum(1 for r in results if not r),
+    }
+
+
+def cleanup():
+    """
+    Remove the bench's records and its sections' counters, and recount
+    `inside`, which a writer that failed halfway leaves off.
+    """
+    with transaction.atomic():
+        deleted = ParkingRecord.objects.filter(plate__startswith=PLATE_PREFIX).delete()[0]
+        DashboardCounter.objects.filter(
+            key__startswith=counters.occupied_key(SECTION_PREFIX)).delete()
+        DashboardCounter.objects.update_or_create(key=counters.INSIDE, defaults={
+            "value": ParkingRecord.objects.filter(exit_time__isnull=True).count()})
+    cache.delete(counters.SNAPSHOT_CACHE_KEY)
+    return deleted
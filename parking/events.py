@@ -0,0 +1,327 @@
+# parking/events.py
+import atexit
+import json
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from detectors.metrics import registry
+
+from . import counters
+from .models import ParkingRecord
+from .sessions import get_index
+
+ENTRY = "entry"
+EXIT = "exit"
+SLOT = "slot"
+RELEASE = "release"
+
+Event = namedtuple("Event", "kind plate time section slot")
+
+
+def entry_event(plate, when=None):
+    return Event(ENTRY, plate, when or timezone.now(), None, None)
+
+
+def exit_event(plate, when=None):
+    return Event(EXIT, plate, when or timezone.now(), None, None)
+
+
+def slot_event(plate, section, slot, when=None):
+    return Event(SLOT, plate, when or timezone.now(), section, slot)
+
+
+def release_event(plate, section, slot, when=None):
+    """The vehicle left `slot`; clears ParkingRecord.slot if it is still that slot."""
+    return Event(RELEASE, plate, when or timezone.now(), section, slot)
+
+
+def apply_events(events, log=print, index=None):
+    """
+    Apply a batch of events in order inside one transaction, together with
+    the dashboard counters. Returns (created, updated) counts.
+
+    Other processes (the kiosk, other camera processes, the admin, the
+    archiver) change the same rows, so the index is not trusted for
+    writes: the batch's open sessions are re-read and locked inside the
+    transaction (one query), and each update only writes the columns its
+    events changed. Index entries the database contradicts are corrected
+    once the transaction has committed.
+    """
+    if index is None:
+        index = get_index()
+    plates = {e.plate for e in events}
+
+    to_create, exits, moves = [], {}, {}
+    exited_sections, assigned_sections, released_sections = [], [], []
+    with transaction.atomic():
+        rows = (ParkingRecord.objects.select_for_update()
+                .filter(plate__in=list(plates), exit_time__isnull=True)
+                .order_by("entry_time")
+                .values_list("pk", "plate", "section", "slot"))
+        open_recs = {plate: ParkingRecord(pk=pk, plate=plate, section=section, slot=slot)
+                     for pk, plate, section, slot in rows}
+        stale = {p for p in plates if index.get(p) is not None and p not in open_recs}
+
+        closed = set()
+        for e in events:
+            rec = open_recs.get(e.plate)
+            if e.kind == ENTRY:
+                if rec is None:
+                    rec = ParkingRecord(plate=e.plate, entry_time=e.time)
+                    open_recs[e.plate] = rec
+                    to_create.append(rec)
+                    closed.discard(e.plate)
+                    log(f"Logged new entry for {e.plate}")
+                else:
+                    log(f"{e.plate} already logged. Skipping.")
+            elif e.kind == EXIT:
+                if rec is not None:
+                    rec.exit_time = e.time
+                    del open_recs[e.plate]
+                    closed.add(e.plate)
+                    exited_sections.append(rec.section if rec.slot else None)
+                    if rec.pk is not None:
+                        exits[rec.pk] = rec
+                    log(f"[Exit] {e.plate} exited at {rec.exit_time}")
+            elif e.kind == SLOT:
+                if rec is not None and rec.slot is None:
+                    rec.section = e.section
+                    rec.slot = e.slot
+                    assigned_sections.append(e.section)
+                    if rec.pk is not None:
+                        moves[rec.pk] = rec
+                    log(f"[{e.section}] {e.plate} → {e.slot}")
+            elif e.kind == RELEASE:
+                if rec is not None and rec.slot == e.slot and rec.section == e.section:
+                    rec.slot = None
+                    released_sections.append(e.section)
+                    if rec.pk is not None:
+                        moves[rec.pk] = rec
+                    log(f"[{e.section}] {e.plate} left {e.slot}")
+
+        if to_create:
+            ParkingRecord.objects.bulk_create(to_create)
+        # Only the columns the events changed, so nothing another process
+        # wrote to the other columns is overwritten
+        if moves:
+            ParkingRecord.objects.bulk_update(list(moves.values()), ["section", "slot"])
+        if exits:
+            ParkingRecord.objects.bulk_update(list(exits.values()), ["exit_time"])
+        counters.bump(counters.session_deltas(
+            len(to_create), exited_sections, assigned_sections, released_sections
+        ))
+
+    for plate in closed | stale:
+        index.closed(plate)
+    for plate, rec in open_recs.items():
+        if rec.pk is not None:
+            index.opened(plate, rec.pk, rec.section, rec.slot)
+        else:
+            # Backends without RETURNING leave pk unset; reload on next miss
+            index.closed(plate)
+    return len(to_create), len(set(exits) | set(moves))
+
+
+class EventWriter:
+    """
+    Decouples the camera loops from the database. Loops call emit(); a
+    writer thread drains the queue every `flush_interval` seconds (or once
+    `batch_size` events are waiting) and applies them with apply_events.
+
+    The queue is bounded: when the database falls behind, emit() blocks for
+    up to `put_timeout` seconds and then drops the event, and both cases are
+    counted in stats(). stop() flushes everything still queued.
+
+    A batch that fails is retried `retries` times with exponential backoff
+    from `retry_delay` seconds, then applied one event at a time; events that
+    still fail are appended to `dead_letter_path` (JSON lines, replayed by
+    `manage.py replay_events`) instead of being lost.
+    """
+
+    def __init__(self, max_queue=1000, batch_size=200, flush_interval=0.2,
+                 put_timeout=1.0, retries=3, retry_delay=0.5, dead_letter_path=None,
+                 log=print):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.dead_letter_path = dead_letter_path
+        self.log = log
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self.emitted = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def emit(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.blocked += 1
+            try:
+                self._queue.put(event, timeout=self.put_timeout)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        self.emitted += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _drain(self, wait):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=wait))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, batch):
+        start = time.perf_counter()
+        try:
+            apply_events(batch, log=self.log)
+        except Exception:
+            # A failed transaction can leave the connection unusable
+            close_old_connections()
+            raise
+        elapsed = time.perf_counter() - start
+        registry.observe("db_flush", elapsed)
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = elapsed * 1000
+
+    def _flush(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                self._apply(batch)
+                return
+            except Exception as exc:
+                self.log(f"[events] failed to write {len(batch)} events "
+                         f"(attempt {attempt + 1}): {exc}")
+            if attempt < self.retries:
+                self.retried += 1
+                time.sleep(self.retry_delay * 2 ** attempt)
+        # Still failing: isolate the bad events so the rest get written
+        for event in batch:
+            try:
+                self._apply([event])
+            except Exception as exc:
+                self.failed += 1
+                self._dead_letter(event, exc)
+
+    def _dead_letter(self, event, exc):
+        if self.dead_letter_path is None:
+            self.log(f"[events] dropped {event}: {exc}")
+            return
+        with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event_to_dict(event)) + "\n")
+        self.dead_lettered += 1
+        self.log(f"[events] dead-lettered {event.kind} for {event.plate}: {exc}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(wait=self.flush_interval)
+            if batch:
+                self._flush(batch)
+        # Shutdown: write whatever is still queued
+        while True:
+            batch = self._drain(wait=0)
+            if not batch:
+                break
+            self._flush(batch)
+        connection.close()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "max_depth": self.max_depth,
+            "emitted": self.emitted,
+            "written": self.written,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Process-wide writer, started on first use and flushed at exit."""
+    from django.conf import settings
+
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = EventWriter(
+                max_queue=settings.EVENT_QUEUE_SIZE,
+                batch_size=settings.EVENT_BATCH_SIZE,
+                flush_interval=settings.EVENT_FLUSH_INTERVAL_MS / 1000,
+                retries=settings.EVENT_RETRIES,
+                dead_letter_path=settings.EVENT_DEAD_LETTER_FILE,
+            ).start()
+            atexit.register(_writer.stop)
+        return _writer
+
+
+def shutdown_writer():
+    """
+    Flush and stop the process-wide writer; returns its stats (None if it
+    was never started). Only the process's entry point calls this, never a
+    pipeline: every pipeline in the process shares the writer.
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is None:
+        return None
+    writer.stop()
+    return writer.stats()
+
+
+def event_to_dict(event):
+    data = event._asdict()
+    data["time"] = event.time.isoformat()
+    return data
+
+
+def event_from_dict(data):
+    from django.utils.dateparse import parse_datetime
+
+    return Event(**dict(data, time=parse_datetime(data["time"])))
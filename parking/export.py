@@ -0,0 +1,97 @@
+# parking/export.py
+# Streaming exports of sessions and payments (hot and archived rows). Rows
+# come from the database in iterator() chunks and are encoded one by one,
+# so memory stays flat however long the date range is.
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import archive
+from .models import ArchivedParkingRecord, Payment
+
+CHUNK_SIZE = 2000
+
+SESSION_COLUMNS = archive.FIELDS
+PAYMENT_COLUMNS = ("record_id", "plate", "section", "method", "status", "amount",
+                   "order_id", "created_at")
+COLUMNS = {"sessions": SESSION_COLUMNS, "payments": PAYMENT_COLUMNS}
+
+
+def day_bounds(since=None, until=None):
+    """'YYYY-MM-DD' strings (both inclusive) to aware [start, end) datetimes."""
+    def start_of(day, name):
+        parsed = parse_date(day)
+        if parsed is None:
+            raise ValueError(f"{name} must be YYYY-MM-DD, got {day!r}")
+        return timezone.make_aware(datetime.combine(parsed, time.min))
+
+    start = start_of(since, "since") if since else None
+    end = start_of(until, "until") + timedelta(days=1) if until else None
+    return start, end
+
+
+def session_rows(start=None, end=None, section=None):
+    """Sessions that entered in [start, end), hot and archived."""
+    return archive.sessions(since=start, until=end, section=section)
+
+
+def payment_rows(start=None, end=None, section=None):
+    """
+    Payments created in [start, end). Archived sessions keep their payment
+    but not its creation time, so their exit time stands in for it.
+    """
+    hot = Payment.objects.all()
+    cold = ArchivedParkingRecord.objects.filter(payment_status__isnull=False)
+    if start is not None:
+        hot, cold = hot.filter(created_at__gte=start), cold.filter(exit_time__gte=start)
+    if end is not None:
+        hot, cold = hot.filter(created_at__lt=end), cold.filter(exit_time__lt=end)
+    if section is not None:
+        hot, cold = hot.filter(parking_record__section=section), cold.filter(section=section)
+    return hot.values_list(
+        "parking_record_id", "parking_record__plate", "parking_record__section",
+        "method", "status", "amount", "razorpay_order_id", "created_at",
+    ).union(cold.values_list(
+        "id", "plate", "section", "payment_method", "payment_status", "payment_amount",
+        "razorpay_order_id", "exit_time",
+    ), all=True)
+
+
+def rows(kind, start=None, end=None, section=None):
+    query = session_rows if kind == "sessions" else payment_rows
+    return query(start, end, section).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    """csv.writer target that hands each encoded line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            [timezone.localtime(v).isoformat() if isinstance(v, datetime) else v for v in row]
+        )
+
+
+def stream_json(columns, rows):
+    """A JSON array of objects, written one element at a time."""
+    encoder = DjangoJSONEncoder()
+    yield "["
+    separator = "\n"
+    for row in rows:
+        yield separator + encoder.encode(dict(zip(columns, row)))
+        separator = ",\n"
+    yield "\n]\n"
+
+
+def stream(kind, fmt, start=None, end=None, section=None):
+    encode = stream_csv if fmt == "csv" else stream_json
+    return encode(COLUMNS[kind], rows(kind, start, end, section))
@@ -0,0 +1,116 @@
+# parking/gateway.py
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class RazorpayGateway:
+    """Thin wrapper so views never touch the razorpay client directly."""
+
+    def __init__(self):
+        import razorpay
+
+        self.client = razorpay.Client(
+            auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+        )
+
+    def create_order(self, amount_paise, receipt):
+        return self.client.order.create({
+            "amount": amount_paise,
+            "currency": "INR",
+            "receipt": receipt,
+            "payment_capture": 1,
+        })
+
+    def fetch_order(self, order_id):
+        # "status" is "created", "attempted" or "paid"
+        return self.client.order.fetch(order_id)
+
+
+class FakeGateway:
+    """
+    In-process stand-in for local development and tests: hands out order
+    ids immediately and remembers what it created.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.orders = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_order(self, amount_paise, receipt):
+        if self.delay:
+            threading.Event().wait(self.delay)
+        with self._lock:
+            order = {
+                "id": f"order_fake{next(self._ids):06d}",
+                "amount": amount_paise,
+                "currency": "INR",
+                "receipt": receipt,
+                "status": "created",
+            }
+            self.orders[order["id"]] = order
+        return order
+
+    def fetch_order(self, order_id):
+        with self._lock:
+            return dict(self.orders[order_id])
+
+    def pay(self, order_id):
+        """The customer paid: the order flips to "paid", as Razorpay's would."""
+        with self._lock:
+            order = self.orders[order_id]
+            order["status"] = "paid"
+            order["amount_paid"] = order["amount"]
+        return order
+
+    def webhook(self, order_id, event="payment.captured", secret=None):
+        """
+        (body, headers) of the callback Razorpay would POST for `order_id`,
+        signed with `secret` (default settings.RAZORPAY_WEBHOOK_SECRET).
+        """
+        order = self.orders[order_id]
+        payment_id = f"pay_fake{order_id[-6:]}"
+        body = json.dumps({
+            "entity": "event",
+            "event": event,
+            "contains": ["payment"],
+            "payload": {"payment": {"entity": {
+                "id": payment_id,
+                "order_id": order_id,
+                "amount": order["amount"],
+                "currency": order["currency"],
+                "status": "failed" if event == "payment.failed" else "captured",
+            }}},
+        }).encode()
+        secret = settings.RAZORPAY_WEBHOOK_SECRET if secret is None else secret
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return body, {
+            "HTTP_X_RAZORPAY_SIGNATURE": signature,
+            "HTTP_X_RAZORPAY_EVENT_ID": f"evt_{event}_{payment_id}",
+        }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The gateway named by settings.PAYMENT_GATEWAY, built once."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = import_string(settings.PAYMENT_GATEWAY)()
+        return _gateway
+
+
+def reset_gateway():
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from parking.archive import archivable, archive_sessions
+
+
+class Command(BaseCommand):
+    help = "Move closed, paid sessions older than the cutoff from ParkingRecord to the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Archive sessions that exited more than this many days ago")
+        parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would move")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["older_than_days"])
+        if options["dry_run"]:
+            self.stdout.write(f"{archivable(before).count()} sessions would be archived")
+            return
+        moved = archive_sessions(before, options["batch_size"], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} sessions that exited before {before:%Y-%m-%d}"))
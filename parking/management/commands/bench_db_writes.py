@@ -0,0 +1,36 @@
+import json
+from django.core.management.base import BaseCommand
+from parking.dbbench import cleanup, run_writers
+
+
+class Command(BaseCommand):
+    help = ("Run simulated camera writers against the configured database and "
+            "report write throughput, batch latency and (SQLite) lock-wait time. Writes real rows "
+            "(plates BENCH...), removed afterwards unless --keep.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", default="1,4,8",
+                            help="Comma-separated writer counts to try (default 1,4,8)")
+        parser.add_argument("--sessions", type=int, default=200, help="Vehicles per writer")
+        parser.add_argument("--batch-size", type=int, default=20, help="Events per transaction")
+        parser.add_argument("--keep", action="store_true", help="Keep the bench rows")
+        parser.add_argument("--json", action="store_true", help="Print reports as JSON")
+
+    def handle(self, *args, **options):
+        for writers in [int(n) for n in options["writers"].split(",")]:
+            cleanup()
+            report = run_writers(writers, options["sessions"], options["batch_size"])
+            if options["json"]:
+                self.stdout.write(json.dumps(report))
+            else:
+                lock_wait = ""
+                if report["sqlite_lock_wait_total_ms"] is not None:
+                    lock_wait = (f"BEGIN IMMEDIATE wait total={report['sqlite_lock_wait_total_ms']}ms "
+                                 f"p95={report['sqlite_lock_wait_p95_ms']}ms ")
+                self.stdout.write(
+                    f"[{report['backend']}] writers={writers} {report['events_per_sec']} events/s "
+                    f"batch p50={report['batch_p50_ms']}ms p95={report['batch_p95_ms']}ms "
+                    f"{lock_wait}retries={report['retries']}"
+                )
+        if not options["keep"]:
+            cleanup()
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from parking.archive import sessions
+from parking.tariff import PRICE_FIELDS, get_engine, price_annotations
+
+
+class Command(BaseCommand):
+    help = "Fares per section for sessions that started in the last N days, priced with settings.TARIFF"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Look back this many days (default 30)")
+        parser.add_argument("--section", help="Only this section")
+        parser.add_argument("--closed", action="store_true", help="Skip sessions still open")
+
+    def handle(self, *args, **options):
+        # Hot and archived sessions alike, durations computed by the database
+        now = timezone.now()
+        qs = sessions(since=now - timedelta(days=options["days"]), section=options["section"],
+                      closed=options["closed"], fields=PRICE_FIELDS, annotate=price_annotations(now))
+
+        start = time.perf_counter()
+        report = get_engine().report(qs)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        total = sum(row["amount"] for row in report.values())
+        count = sum(row["sessions"] for row in report.values())
+        for section, row in sorted(report.items(), key=lambda kv: kv[0] or ""):
+            self.stdout.write(
+                f"{section or '-':<12} sessions={row['sessions']:<6} "
+                f"hours={row['minutes'] / 60:<8.1f} amount={row['amount']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} sessions, total {total} (priced in {elapsed:.1f}ms)"
+        ))
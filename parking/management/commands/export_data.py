@@ -0,0 +1,39 @@
+import gzip
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from parking import export
+
+
+class Command(BaseCommand):
+    help = ("Stream sessions or payments (hot and archived) as CSV or JSON to a file or stdout; "
+            "a .gz output is compressed on the fly")
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=["sessions", "payments"])
+        parser.add_argument("--format", choices=["csv", "json"], default="csv")
+        parser.add_argument("--since", help="First day, YYYY-MM-DD (inclusive)")
+        parser.add_argument("--until", help="Last day, YYYY-MM-DD (inclusive)")
+        parser.add_argument("--section", help="Only this section")
+        parser.add_argument("-o", "--output", help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            start, end = export.day_bounds(options["since"], options["until"])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        output = options["output"]
+        if not output:
+            out = sys.stdout
+        elif output.endswith(".gz"):
+            out = gzip.open(output, "wt", newline="")
+        else:
+            out = open(output, "w", newline="")
+        try:
+            for chunk in export.stream(options["kind"], options["format"], start, end, options["section"]):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if output:
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['kind']} to {output}"))
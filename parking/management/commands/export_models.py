@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from detectors.backends import DetectorConfig, export_model
+
+
+class Command(BaseCommand):
+    help = "Export the YOLO weights to ONNX or OpenVINO (optionally INT8) for the CPU detector backends"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=["onnx", "openvino"], required=True)
+        parser.add_argument("--imgsz", type=int, action="append",
+                            help="Input size (repeatable, default 640)")
+        parser.add_argument("--int8", action="store_true", help="Quantise to INT8")
+        parser.add_argument("--data", help="Calibration dataset YAML for OpenVINO INT8 (default coco8.yaml)")
+
+    def handle(self, *args, **options):
+        for imgsz in options["imgsz"] or [640]:
+            config = DetectorConfig(backend=options["backend"], imgsz=imgsz, int8=options["int8"])
+            try:
+                path = export_model(config, settings.YOLO_WEIGHTS, str(settings.MODEL_DIR), options["data"])
+            except ImportError as exc:
+                raise CommandError(f"{exc}; install ultralytics and the {options['backend']} runtime")
+            self.stdout.write(self.style.SUCCESS(f"Exported {path}"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from parking import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute dashboard counters from ParkingRecord and Payment"
+
+    def handle(self, *args, **options):
+        counters.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Counters rebuilt: {counters.snapshot()}"))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from parking.payments import prune, reconcile, sweep
+
+
+class Command(BaseCommand):
+    help = "Apply queued payment webhooks, and optionally check pending orders with the gateway"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.PAYMENT_RECONCILE_BATCH)
+        parser.add_argument("--sweep", action="store_true",
+                            help="Also ask the gateway about pending orders that never got a callback, "
+                                 "and prune applied events older than PAYMENT_EVENT_RETENTION_DAYS")
+        parser.add_argument("--sweep-after", type=int, default=settings.PAYMENT_SWEEP_AFTER,
+                            help="Only sweep orders older than this many seconds")
+
+    def handle(self, *args, **options):
+        if options["sweep"]:
+            totals = sweep(after=options["sweep_after"], log=self.stdout.write)
+            prune(log=self.stdout.write)
+        else:
+            totals = reconcile(options["batch_size"], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {totals['events']} events: {totals['paid']} paid, {totals['failed']} failed"
+        ))
@@ -0,0 +1,110 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from detectors.backends import label
+from detectors.registry import detector_config
+from parking.models import Camera
+from parking.pipelines import EntrancePipeline, ExitPipeline, SectionPipeline
+from parking.replay import load_annotations, replay_clip
+from parking.slots import SlotMap
+
+
+class Command(BaseCommand):
+    help = ("Replay recorded clips through a camera pipeline and report fps, "
+            "per-stage latency percentiles and accuracy. Database changes are "
+            "rolled back.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=["entrance", "exit", "section"])
+        parser.add_argument("clips", nargs="+", help="Video files or image directories")
+        parser.add_argument("--annotations", help="Ground-truth JSON (default: <clip>.json)")
+        parser.add_argument("--camera", help="Camera name to take slot polygons from (section)")
+        parser.add_argument("--realtime", action="store_true",
+                            help="Pace frames at the annotated fps and drop late ones")
+        parser.add_argument("--max-frames", type=int, default=None)
+        parser.add_argument("--json", action="store_true", help="Print reports as JSON")
+        parser.add_argument("--detector", action="append",
+                            help="Detector settings over settings.DETECTOR, e.g. "
+                                 "backend=onnx,imgsz=480,int8=1,threads=2 (repeatable: "
+                                 "each clip is replayed once per setting and compared)")
+
+    def handle(self, *args, **options):
+        kind = options["kind"]
+        try:
+            configs = [detector_config(d) for d in options["detector"] or [None]]
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        for clip in options["clips"]:
+            annotations = load_annotations(options["annotations"] or f"{clip.rstrip(os.sep)}.json")
+            reports = []
+            for config in configs:
+                factory = self._factory(kind, options["camera"], annotations, config)
+                with transaction.atomic():
+                    report = replay_clip(kind, clip, factory, annotations,
+                                         realtime=options["realtime"],
+                                         max_frames=options["max_frames"])
+                    transaction.set_rollback(True)
+
+                report["clip"] = clip
+                report["kind"] = kind
+                report["detector"] = label(config)
+                reports.append(report)
+                if options["json"]:
+                    self.stdout.write(json.dumps(report))
+                else:
+                    self._print(report)
+            if len(reports) > 1 and not options["json"]:
+                self._compare(reports)
+
+    def _factory(self, kind, camera_name, annotations, config=None):
+        quiet = lambda msg: None
+        detector = dict(config._asdict()) if config else None
+        if kind == "entrance":
+            return lambda writer, sessions, timer: EntrancePipeline(
+                "replay", writer=writer, sessions=sessions, timer=timer, log=quiet, detector=detector)
+        if kind == "exit":
+            return lambda writer, sessions, timer: ExitPipeline(
+                "replay", writer=writer, sessions=sessions, timer=timer, log=quiet, detector=detector)
+
+        if "slot_polygons" in annotations:
+            slot_map = SlotMap(annotations["slot_polygons"])
+            section = annotations.get("section", "replay")
+        elif camera_name:
+            try:
+                camera = Camera.objects.get(name=camera_name)
+            except Camera.DoesNotExist:
+                raise CommandError(f"No camera named {camera_name!r}")
+            slot_map = SlotMap.for_camera(camera)
+            section = camera.section or camera.name
+        else:
+            raise CommandError("Section replay needs --camera or slot_polygons in the annotations")
+        return lambda writer, sessions, timer: SectionPipeline(
+            "replay", slot_map, section, writer=writer, sessions=sessions, timer=timer, log=quiet,
+            detector=detector)
+
+    def _print(self, report):
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['clip']} [{report['kind']}, {report['detector']}] frames={report['frames']} "
+            f"processed={report['processed']} dropped={report['dropped']} fps={report['fps']}"
+        ))
+        for stage, s in sorted(report["stages"].items()):
+            self.stdout.write(
+                f"  {stage:<7} n={s['count']:<6} p50={s['p50_ms']:.2f}ms "
+                f"p95={s['p95_ms']:.2f}ms p99={s['p99_ms']:.2f}ms"
+            )
+        if "accuracy" in report:
+            self.stdout.write(f"  accuracy {report['accuracy']}")
+
+    def _compare(self, reports):
+        """Accuracy vs speed, one line per detector setting."""
+        self.stdout.write(f"{'detector':<24} {'fps':>8} {'detect p50':>11} {'detect p95':>11}  accuracy")
+        for r in reports:
+            detect = r["stages"].get("detect", {})
+            accuracy = r.get("accuracy", {})
+            score = accuracy.get("accuracy", accuracy.get("recall", "-"))
+            self.stdout.write(
+                f"{r['detector']:<24} {r['fps']:>8} {detect.get('p50_ms', 0):>9.2f}ms "
+                f"{detect.get('p95_ms', 0):>9.2f}ms  {score}"
+            )
@@ -0,0 +1,29 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from parking.events import apply_events, event_from_dict
+import json
+
+
+class Command(BaseCommand):
+    help = "Apply camera events the event writer could not write (its dead-letter file)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=str(settings.EVENT_DEAD_LETTER_FILE),
+                            help="Dead-letter file written by the event writer")
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        if not os.path.exists(path):
+            self.stdout.write("No dead-lettered events")
+            return
+        with open(path, encoding="utf-8") as f:
+            events = [event_from_dict(json.loads(line)) for line in f if line.strip()]
+        try:
+            created, updated = apply_events(events, log=self.stdout.write)
+        except Exception as exc:
+            raise CommandError(f"Replay failed, {path} kept: {exc}")
+        os.remove(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {len(events)} events ({created} sessions opened, {updated} updated)"
+        ))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from detectors import registry
+from parking.archive import start_archiver
+from parking.events import shutdown_writer
+from parking.payments import start_reconciler
+from parking.pipelines import start_metrics
+from parking.preview import start_preview_server
+from parking.supervisor import Supervisor
+
+
+class Command(BaseCommand):
+    help = ("Run every enabled camera from the Camera table in one process, "
+            "sharing the loaded models, and follow changes to the table")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.CAMERA_WORKERS,
+                            help='Cameras processing frames at once (default: CPU cores)')
+        parser.add_argument('--reload-interval', type=float, default=settings.CAMERA_RELOAD_INTERVAL,
+                            help='Seconds between Camera table checks')
+        parser.add_argument('--metrics-port', type=int, default=settings.METRICS_PORT,
+                            help='Serve Prometheus metrics on this port')
+        parser.add_argument('--preview-port', type=int, default=settings.PREVIEW_PORT,
+                            help='Serve on-demand MJPEG/snapshot previews on this port')
+
+    def handle(self, *args, **options):
+        # Load the models before the first camera starts, not on its first frame
+        for name, seconds in registry.warm().items():
+            self.stdout.write(f"[models] {name} loaded in {seconds:.1f}s")
+        start_metrics(options['metrics_port'], log=self.stdout.write)
+        if options['preview_port']:
+            start_preview_server(options['preview_port'], log=self.stdout.write)
+        if settings.ARCHIVE_INTERVAL:
+            start_archiver(settings.ARCHIVE_INTERVAL, log=self.stdout.write)
+        if settings.PAYMENT_RECONCILE_INTERVAL:
+            start_reconciler(settings.PAYMENT_RECONCILE_INTERVAL, settings.PAYMENT_SWEEP_INTERVAL,
+                             log=self.stdout.write)
+        supervisor = Supervisor(workers=options['workers'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Supervising cameras with {supervisor.workers_count} workers..."
+        ))
+
+        supervisor.run(options['reload_interval'])
+
+        self.stdout.write(f"[events] {shutdown_writer()}")
+        self.stdout.write(self.style.SUCCESS('Camera supervisor stopped'))
@@ -1,42 +1,50 @@
+import argparse
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from parking.models import ParkingRecord
-from detectors.alpr import detect_and_read_plate
-from datetime import datetime
-from django.utils import timezone
-import cv2, time
+from parking.events import shutdown_writer
+from parking.pipelines import EntrancePipeline, start_metrics
+from parking.preview import present, start_preview_server
+from detectors.capture import open_grabber, close_grabber, format_stats, wait_for_frame
+import cv2
 
 class Command(BaseCommand):
     help = "Run entrance camera loop"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics-port', type=int, default=settings.METRICS_PORT,
+                            help='Serve Prometheus metrics on this port')
+        parser.add_argument('--preview-port', type=int, default=settings.PREVIEW_PORT,
+                            help='Serve on-demand MJPEG/snapshot previews on this port')
+        parser.add_argument('--display', action=argparse.BooleanOptionalAction, default=settings.CAMERA_DISPLAY,
+                            help='Show the annotated video in a local window (--no-display to override CAMERA_DISPLAY)')
+
     def handle(self, *args, **options):
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
+        source = 0
+        cap = open_grabber(source)
+        if cap is None:
             self.stdout.write(self.style.ERROR("Camera not accessible."))
             return
+        pipeline = EntrancePipeline("entrance", log=self.stdout.write)
+        start_metrics(options["metrics_port"], log=self.stdout.write)
+        if options["preview_port"]:
+            start_preview_server(options["preview_port"], log=self.stdout.write)
+        window = "Entrance" if options["display"] else None
 
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                continue
-
-            plate = detect_and_read_plate(frame)
-            if plate:
-                plate = plate.strip().upper()
-                existing = ParkingRecord.objects.filter(plate=plate, exit_time__isnull=True).first()
-                if not existing:
-                    ParkingRecord.objects.create(
-                        plate=plate,
-                        entry_time=timezone.now()
-                    )
-                    self.stdout.write(self.style.SUCCESS(f"Logged new entry for {plate}"))
-                else:
-                    self.stdout.write(f"{plate} already logged. Skipping.")
+            # Always the newest frame; stale ones are dropped by the grabber
+            frame = wait_for_frame(cap)
+            if frame is None:
+                break
 
-                time.sleep(1)
+            with pipeline.timer.time("frame"):
+                pipeline.process(frame)
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            # Headless: draws only while someone watches the preview
+            if not present(pipeline, frame, window):
                 break
 
-        cap.release()
-        cv2.destroyAllWindows()
-
+        self.stdout.write(format_stats(close_grabber(source)))
+        # This command owns the process, so it stops the shared writer
+        self.stdout.write(f"[events] {shutdown_writer()}")
+        if window:
+            cv2.destroyAllWindows()
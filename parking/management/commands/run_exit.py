@@ -1,55 +1,60 @@
 # cameras/exit.py
+import argparse
 import cv2
-import time
-from datetime import datetime
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from detectors.alpr import detect_and_read_plate
-from parking.models import ParkingRecord
+from detectors.capture import open_grabber, close_grabber, format_stats, wait_for_frame
+from parking.events import shutdown_writer
+from parking.pipelines import ExitPipeline, start_metrics
+from parking.preview import present, start_preview_server
 
 class Command(BaseCommand):
     help = 'Monitor exit camera and record vehicle exits'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics-port', type=int, default=settings.METRICS_PORT,
+                            help='Serve Prometheus metrics on this port')
+        parser.add_argument('--preview-port', type=int, default=settings.PREVIEW_PORT,
+                            help='Serve on-demand MJPEG/snapshot previews on this port')
+        parser.add_argument('--display', action=argparse.BooleanOptionalAction, default=settings.CAMERA_DISPLAY,
+                            help='Show the annotated video in a local window (--no-display to override CAMERA_DISPLAY)')
+
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.SUCCESS('Starting exit camera monitoring...'))
+        start_metrics(kwargs['metrics_port'])
+        if kwargs['preview_port']:
+            start_preview_server(kwargs['preview_port'])
 
         # Call the function to monitor exit camera
-        run_exit_camera(source=0)  # You can change the source if needed
+        run_exit_camera(source=0, display=kwargs['display'])  # You can change the source if needed
+        self.stdout.write(f"[events] {shutdown_writer()}")
 
         self.stdout.write(self.style.SUCCESS('Exit camera monitoring completed'))
 
 
-def run_exit_camera(source):
-    cap = cv2.VideoCapture(source)
-    if not cap.isOpened():
-        print("Error: Could not open video source. {source}")
+def run_exit_camera(source, display=False):
+    cap = open_grabber(source)
+    if cap is None:
+        print(f"Error: Could not open video source. {source}")
         return
+    pipeline = ExitPipeline("exit")
+    window = "Exit" if display else None
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        frame = wait_for_frame(cap)
+        if frame is None:
             print("Error: Failed to read frame.")
             break
 
-        # Detect the plate using the ALPR system
-        plate = detect_and_read_plate(frame)
-        if plate:
-            plate = plate.strip().upper()
-            print(f"Detected plate: {plate}") 
-            # Fetch the latest open parking record for this plate
-            rec = ParkingRecord.objects.filter(plate=plate, exit_time=None).order_by('-entry_time').first()
-
-            if rec:
-                rec.exit_time = datetime.utcnow()  # Update exit time
-                rec.save()  # Save the updated record to the database
-                print(f"[Exit] {plate} exited at {rec.exit_time}")
+        # Track vehicles, confirm plates and queue the exits
+        with pipeline.timer.time("frame"):
+            pipeline.process(frame)
 
-            time.sleep(1)  # Wait for a moment before reading the next frame
-
-        # Break the loop if 'q' is pressed
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        # Headless unless displayed; break the loop if 'q' is pressed
+        if not present(pipeline, frame, window):
             break
 
-    # Release the video capture and close any OpenCV windows
-    cap.release()
-    cv2.destroyAllWindows()
-
+    # Stop the capture thread and close any OpenCV windows
+    print(format_stats(close_grabber(source)))
+    if window:
+        cv2.destroyAllWindows()
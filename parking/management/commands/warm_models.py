@@ -0,0 +1,45 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from detectors import registry
+from parking.models import Camera
+
+
+class Command(BaseCommand):
+    help = "Load the YOLO and OCR models (and run one dummy inference) ahead of traffic"
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', default=None,
+                            help='Models to load (default: all of yolo, ocr)')
+        parser.add_argument('--no-infer', action='store_true',
+                            help='Only load the weights, skip the dummy inference')
+
+    def handle(self, *args, **options):
+        names = options['models'] or None
+        unknown = sorted(set(names or ()) - set(registry.names()))
+        if unknown:
+            raise CommandError(f"Unknown model(s) {', '.join(unknown)}; "
+                               f"choose from {', '.join(registry.names())}")
+        registry.warm(names)
+        if not names or "yolo" in names:
+            # Cameras with their own detector settings get theirs loaded too
+            for camera in Camera.objects.filter(enabled=True).exclude(detector={}):
+                registry.get_model("yolo", registry.detector_config(camera.detector))
+        for name, seconds in registry.load_times().items():
+            self.stdout.write(f"[models] {name} loaded in {seconds:.2f}s")
+        if options['no_infer']:
+            return
+
+        # The first call of each model is much slower than the rest
+        # (allocations, kernel selection), so pay for it here too
+        frame = np.zeros((480, 640, 3), np.uint8)
+        for name in names or ("yolo", "ocr"):
+            start = time.perf_counter()
+            model = registry.get_model(name)
+            if name == "yolo":
+                model.detect_batch([frame])
+            elif name == "ocr":
+                model.readtext(frame[:64])
+            self.stdout.write(f"[models] {name} first inference {time.perf_counter() - start:.2f}s")
+        self.stdout.write(self.style.SUCCESS("Models warm"))
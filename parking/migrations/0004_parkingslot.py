@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0003_parkingrecord_entry_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParkingSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20)),
+                ('polygon', models.JSONField()),
+                ('camera', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='parking.camera')),
+            ],
+            options={
+                'unique_together': {('camera', 'name')},
+            },
+        ),
+    ]
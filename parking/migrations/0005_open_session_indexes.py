@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0004_parkingslot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(fields=['plate', 'exit_time'], name='parking_plate_exit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(condition=models.Q(('exit_time__isnull', True)), fields=['plate'], name='parking_open_plate_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0006_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='razorpay_order_id',
+            field=models.CharField(blank=True, max_length=40, null=True, unique=True),
+        ),
+    ]
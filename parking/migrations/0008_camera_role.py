@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+def infer_roles(apps, schema_editor):
+    # Existing rows were named "Entrance" / "Exit" / "Section A" by convention
+    Camera = apps.get_model('parking', 'Camera')
+    for camera in Camera.objects.all():
+        name = camera.name.lower()
+        if 'entrance' in name or 'entry' in name:
+            camera.role = 'entrance'
+        elif 'exit' in name:
+            camera.role = 'exit'
+        else:
+            continue
+        camera.save(update_fields=['role'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_payment_razorpay_order_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='enabled',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='role',
+            field=models.CharField(choices=[('entrance', 'Entrance'), ('exit', 'Exit'), ('section', 'Section')], default='section', max_length=10),
+        ),
+        migrations.RunPython(infer_roles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_camera_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedParkingRecord',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('plate', models.CharField(db_index=True, max_length=20)),
+                ('entry_time', models.DateTimeField()),
+                ('section', models.CharField(blank=True, max_length=50, null=True)),
+                ('slot', models.CharField(blank=True, max_length=20, null=True)),
+                ('exit_time', models.DateTimeField()),
+                ('paid', models.BooleanField(default=True)),
+                ('month', models.DateField(db_index=True)),
+                ('payment_method', models.CharField(blank=True, max_length=10, null=True)),
+                ('payment_status', models.CharField(blank=True, max_length=10, null=True)),
+                ('payment_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('razorpay_order_id', models.CharField(blank=True, max_length=40, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'section'], name='parking_archive_month_idx')],
+            },
+        ),
+    ]
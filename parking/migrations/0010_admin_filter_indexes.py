@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0009_archivedparkingrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(fields=['entry_time'], name='parking_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(fields=['section', 'entry_time'], name='parking_section_entry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='parkingrecord',
+            index=models.Index(fields=['paid', 'exit_time'], name='parking_paid_exit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['method', 'created_at'], name='payment_method_created_idx'),
+        ),
+    ]
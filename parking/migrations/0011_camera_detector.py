@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0010_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='detector',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0011_camera_detector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=80, unique=True)),
+                ('order_id', models.CharField(db_index=True, max_length=40)),
+                ('status', models.CharField(max_length=10)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('source', models.CharField(default='webhook', max_length=10)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='payment_event_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0012_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='order_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -10,15 +10,30 @@ class ParkingRecord(models.Model):
     exit_time = models.DateTimeField(blank=True, null=True)
     paid = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Gate lookups: "open session for this plate"
+            models.Index(fields=['plate', 'exit_time'], name='parking_plate_exit_idx'),
+            # Same, limited to open sessions where the backend supports it
+            models.Index(fields=['plate'], condition=models.Q(exit_time__isnull=True),
+                         name='parking_open_plate_idx'),
+            # Admin date/section/paid filters, reports and archival
+            models.Index(fields=['entry_time'], name='parking_entry_idx'),
+            models.Index(fields=['section', 'entry_time'], name='parking_section_entry_idx'),
+            models.Index(fields=['paid', 'exit_time'], name='parking_paid_exit_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.plate} {timezone.localtime(self.entry_time):%Y-%m-%d %H:%M}"
+
     def duration_minutes(self):
         end = self.exit_time or timezone.now()
         return (end - self.entry_time).total_seconds() / 60
 
-    def amount_due(self, rate_per_hour=10):
-        # mins = max(0, self.duration_minutes() - 5)  # free first 5 min
-        mins = self.duration_minutes()
-        hours = (mins / 60)
-        return round(hours * rate_per_hour, 2)
+    def amount_due(self, now=None):
+        """Fare under settings.TARIFF (see parking/tariff.py), as a Decimal."""
+        from .tariff import get_engine
+        return get_engine().price_session(self, now=now)
 
 
 class Payment(models.Model):
@@ -31,10 +46,107 @@ class Payment(models.Model):
                                                       ('FAILED','Failed')],
                               default='PENDING')
     amount = models.DecimalField(max_digits=8, decimal_places=2)
+    # Gateway order, created once per payment and reused on kiosk refresh
+    razorpay_order_id = models.CharField(max_length=40, blank=True, null=True, unique=True)
+    # Set while one request is creating that order, so refreshes don't create more
+    order_claimed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Admin filters, e.g. "today's pending cash payments"
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+            models.Index(fields=['method', 'created_at'], name='payment_method_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.amount} ({self.status})"
+
 class Camera(models.Model):
+    ROLE_CHOICES = [('entrance', 'Entrance'), ('exit', 'Exit'), ('section', 'Section')]
+
     name    = models.CharField(max_length=50)        # “Entrance”, “Section A”, “Exit”
     source  = models.CharField(max_length=200)       # e.g. “0” or rtsp://...
     section = models.CharField(max_length=50, null=True, blank=True)
+    role    = models.CharField(max_length=10, choices=ROLE_CHOICES, default='section')
+    enabled = models.BooleanField(default=True)
+    # Overrides of settings.DETECTOR, e.g. {"backend": "onnx", "imgsz": 480, "threads": 2}
+    detector = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ParkingSlot(models.Model):
+    camera  = models.ForeignKey(Camera, on_delete=models.CASCADE, related_name='slots')
+    name    = models.CharField(max_length=20)        # matches ParkingRecord.slot
+    polygon = models.JSONField()                     # [[x, y], ...] in frame pixels
+
+    class Meta:
+        unique_together = [('camera', 'name')]
+
+    def __str__(self):
+        return f"{self.camera.name} / {self.name}"
+
+
+class DashboardCounter(models.Model):
+    """
+    Running totals for the dashboard ("inside", "occupied:<section>",
+    "revenue:<YYYY-MM-DD>"), bumped by the write paths so the dashboard
+    never has to scan ParkingRecord.
+    """
+    key   = models.CharField(max_length=80, primary_key=True)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.key}={self.value}"
+
+
+class ArchivedParkingRecord(models.Model):
+    """
+    Closed, paid sessions moved out of ParkingRecord by parking/archive.py,
+    with their payment folded in. `id` is the original ParkingRecord id;
+    `month` (first day of the exit month) is the partition key reports
+    filter on.
+    """
+    id             = models.BigIntegerField(primary_key=True)
+    plate          = models.CharField(max_length=20, db_index=True)
+    entry_time     = models.DateTimeField()
+    section        = models.CharField(max_length=50, blank=True, null=True)
+    slot           = models.CharField(max_length=20, blank=True, null=True)
+    exit_time      = models.DateTimeField()
+    paid           = models.BooleanField(default=True)
+    month          = models.DateField(db_index=True)
+    payment_method = models.CharField(max_length=10, blank=True, null=True)
+    payment_status = models.CharField(max_length=10, blank=True, null=True)
+    payment_amount = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
+    razorpay_order_id = models.CharField(max_length=40, blank=True, null=True)
+    archived_at    = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['month', 'section'], name='parking_archive_month_idx')]
+
+    def __str__(self):
+        return f"{self.plate} {self.entry_time:%Y-%m-%d} (archived)"
+
+
+class PaymentEvent(models.Model):
+    """
+    Inbox of gateway callbacks (and sweep results). The webhook only
+    inserts here; parking/payments.py applies them to Payment in batches
+    and stamps `processed_at`. `event_id` makes gateway retries no-ops.
+    """
+    event_id     = models.CharField(max_length=80, unique=True)
+    order_id     = models.CharField(max_length=40, db_index=True)
+    status       = models.CharField(max_length=10)          # SUCCESS / FAILED
+    amount       = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
+    source       = models.CharField(max_length=10, default='webhook')  # or "sweep"
+    received_at  = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'id'], name='payment_event_pending_idx')]
+
+    def __str__(self):
+        return f"{self.order_id} {self.status} ({self.source})"
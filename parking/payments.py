@@ -0,0 +1,235 @@
+# parking/payments.py
+"""
+Gateway callbacks to Payment rows, off the request path.
+
+  webhook    verify the signature, turn the callback into PaymentEvent rows
+             (one INSERT, duplicates from gateway retries ignored) and answer
+  reconcile  apply pending events in batches: one UPDATE for the payments
+             that succeeded, one for the ones that failed, one flipping
+             ParkingRecord.paid, all keyed by the unique razorpay_order_id
+  sweep      ask the gateway about pending orders that never got a callback
+             and feed the answers through the same inbox
+  prune      delete applied events older than PAYMENT_EVENT_RETENTION_DAYS
+
+run_cameras runs reconcile every PAYMENT_RECONCILE_INTERVAL seconds and
+sweep (then prune) every PAYMENT_SWEEP_INTERVAL; `manage.py
+reconcile_payments` does the same on demand.
+"""
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import counters
+from .gateway import get_gateway
+from .models import ParkingRecord, Payment, PaymentEvent
+
+# Razorpay webhook events we act on
+EVENT_STATUS = {
+    "payment.captured": "SUCCESS",
+    "order.paid": "SUCCESS",
+    "payment.failed": "FAILED",
+}
+
+
+def verify_signature(body, signature, secret=None):
+    """X-Razorpay-Signature is the hex HMAC-SHA256 of the raw body."""
+    secret = settings.RAZORPAY_WEBHOOK_SECRET if secret is None else secret
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    # As bytes: compare_digest raises TypeError on non-ASCII str
+    return hmac.compare_digest(expected.encode(), signature.encode())
+
+
+def parse_webhook(body, event_id=None):
+    """
+    PaymentEvent (unsaved) for a verified callback body, or None for events
+    we do not track. Raises ValueError on a malformed body.
+    """
+    try:
+        data = json.loads(body)
+        status = EVENT_STATUS.get(data["event"])
+        if status is None:
+            return None
+        payment = data["payload"]["payment"]["entity"]
+        order_id = payment["order_id"]
+        amount = payment.get("amount")
+        amount = Decimal(amount) / 100 if amount is not None else None
+    except (KeyError, TypeError, InvalidOperation, json.JSONDecodeError) as exc:
+        raise ValueError(f"malformed webhook: {exc!r}")
+    if not order_id:
+        return None
+    event = PaymentEvent(
+        event_id=event_id or f"{data['event']}:{payment.get('id') or order_id}",
+        order_id=order_id,
+        status=status,
+        amount=amount,
+    )
+    # Rejected here rather than failing the INSERT (SQLite alone would store them)
+    for name in ("event_id", "order_id"):
+        value = getattr(event, name)
+        if not isinstance(value, str) or len(value) > PaymentEvent._meta.get_field(name).max_length:
+            raise ValueError(f"malformed webhook: bad {name}")
+    return event
+
+
+def set_status(payment_ids, status, now=None):
+    """One UPDATE of Payment.status; update() skips auto_now, so updated_at is stamped here."""
+    return Payment.objects.filter(pk__in=payment_ids).update(status=status, updated_at=now or timezone.now())
+
+
+def enqueue(events):
+    """Insert events into the inbox; ones already received are skipped."""
+    PaymentEvent.objects.bulk_create(events, ignore_conflicts=True)
+
+
+def _outcomes(events):
+    """
+    order id -> (status, amount) for a batch. A success wins over a
+    failure for the same order (a failed attempt followed by a retry).
+    """
+    outcomes = {}
+    for e in events:
+        if outcomes.get(e.order_id, (None,))[0] != "SUCCESS":
+            outcomes[e.order_id] = (e.status, e.amount)
+    return outcomes
+
+
+def apply_batch(events, log=print):
+    """Apply one batch of events; returns (succeeded, failed) payment counts."""
+    outcomes = _outcomes(events)
+    now = timezone.now()
+    paid, failed, revenue = [], [], Decimal("0.00")
+    with transaction.atomic():
+        # Locked so two reconcilers can never count the same payment twice
+        rows = (Payment.objects.select_for_update()
+                .filter(razorpay_order_id__in=list(outcomes))
+                .values_list("pk", "parking_record_id", "razorpay_order_id", "amount", "status"))
+        for pk, record_id, order_id, amount, status in rows:
+            outcome, received = outcomes.pop(order_id)
+            if status == "SUCCESS":
+                continue
+            if outcome == "SUCCESS":
+                if received is not None and received < amount:
+                    log(f"[payments] {order_id} paid {received}, expected {amount}; left pending")
+                    continue
+                paid.append((pk, record_id))
+                revenue += amount
+            elif status == "PENDING":
+                failed.append(pk)
+
+        if paid:
+            set_status([pk for pk, _ in paid], "SUCCESS", now)
+            ParkingRecord.objects.filter(pk__in=[rec for _, rec in paid]).update(paid=True)
+            counters.bump({counters.revenue_key(): revenue})
+        if failed:
+            set_status(failed, "FAILED", now)
+        PaymentEvent.objects.filter(pk__in=[e.pk for e in events]).update(processed_at=now)
+
+    for order_id in outcomes:
+        # Unknown or already archived orders: nothing to update
+        log(f"[payments] no payment for order {order_id}")
+    return len(paid), len(failed)
+
+
+def reconcile(batch_size=None, log=print):
+    """Drain the inbox in batches of `batch_size`; returns totals."""
+    batch_size = batch_size or settings.PAYMENT_RECONCILE_BATCH
+    totals = {"events": 0, "paid": 0, "failed": 0}
+    while True:
+        batch = list(PaymentEvent.objects.filter(processed_at__isnull=True)
+                     .order_by("pk")[:batch_size])
+        if not batch:
+            return totals
+        paid, failed = apply_batch(batch, log=log)
+        totals["events"] += len(batch)
+        totals["paid"] += paid
+        totals["failed"] += failed
+        log(f"[payments] applied {len(batch)} events: {paid} paid, {failed} failed")
+
+
+def sweep(after=None, max_age=None, limit=200, gateway=None, log=print):
+    """
+    Poll the gateway for pending payments whose order is older than `after`
+    seconds (but younger than `max_age`) and queue what it reports, then
+    reconcile. Catches callbacks that were lost or never configured.
+    """
+    after = settings.PAYMENT_SWEEP_AFTER if after is None else after
+    max_age = settings.PAYMENT_SWEEP_MAX_AGE if max_age is None else max_age
+    gateway = gateway or get_gateway()
+    now = timezone.now()
+    pending = (Payment.objects
+               .filter(status="PENDING", razorpay_order_id__isnull=False,
+                       created_at__lt=now - timedelta(seconds=after),
+                       created_at__gte=now - timedelta(seconds=max_age))
+               # Already has a callback waiting to be applied
+               .exclude(razorpay_order_id__in=PaymentEvent.objects.filter(
+                   processed_at__isnull=True).values("order_id"))
+               .order_by("created_at")
+               .values_list("razorpay_order_id", flat=True)[:limit])
+
+    events = []
+    for order_id in pending:
+        try:
+            order = gateway.fetch_order(order_id)
+        except Exception as exc:
+            log(f"[payments] could not fetch {order_id}: {exc}")
+            continue
+        if order.get("status") == "paid":
+            amount = order.get("amount_paid", order.get("amount"))
+            events.append(PaymentEvent(
+                event_id=f"sweep:{order_id}", order_id=order_id, status="SUCCESS",
+                amount=Decimal(amount) / 100 if amount is not None else None, source="sweep",
+            ))
+    if events:
+        log(f"[payments] sweep found {len(events)} paid orders without a callback")
+        enqueue(events)
+    return reconcile(log=log)
+
+
+def prune(days=None, log=print):
+    """
+    Delete events applied more than `days` ago; returns how many. A gateway
+    retry arriving after that is queued again and finds its payment already
+    settled, so it changes nothing.
+    """
+    days = settings.PAYMENT_EVENT_RETENTION_DAYS if days is None else days
+    before = timezone.now() - timedelta(days=days)
+    deleted, _ = PaymentEvent.objects.filter(processed_at__lt=before).delete()
+    if deleted:
+        log(f"[payments] pruned {deleted} applied events")
+    return deleted
+
+
+def start_reconciler(interval, sweep_interval=None, log=print):
+    """
+    Run reconcile() every `interval` seconds, and sweep() and prune() every
+    `sweep_interval` seconds, from a daemon thread.
+    """
+    stop = threading.Event()
+
+    def run():
+        last_sweep = time.monotonic()
+        while not stop.wait(interval):
+            try:
+                if sweep_interval and time.monotonic() - last_sweep >= sweep_interval:
+                    last_sweep = time.monotonic()
+                    sweep(log=log)
+                    prune(log=log)
+                else:
+                    reconcile(log=log)
+            except Exception as exc:
+                log(f"[payments] reconcile failed: {exc}")
+            finally:
+                close_old_connections()
+
+    threading.Thread(target=run, name="payment-reconciler", daemon=True).start()
+    return stop
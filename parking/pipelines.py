@@ -0,0 +1,345 @@
+# parking/pipelines.py
+"""
+Per-frame logic of the entrance, exit and section cameras.
+
+A pipeline takes one frame at a time in process() and turns it into
+events for the writer. The live management commands feed it from a
+FrameGrabber and the replay harness feeds it from recorded clips, so both
+run exactly the same code. Models, writer and timing are injected so the
+pipelines can run against fakes.
+"""
+from abc import ABC, abstractmethod
+
+import cv2
+from django.conf import settings
+
+from detectors.motion import MotionGate
+from detectors.metrics import CameraTimer, start_http_server, start_log_reporter
+from detectors.tiling import coverage, merge_detections
+from detectors.tracker import VehicleTracker, confirmed_plates
+
+from .events import entry_event, exit_event, release_event, slot_event
+from .slots import FREE, OCCUPIED, SlotStates, TTLCache
+
+
+def start_metrics(port=None, log=print):
+    """
+    Export stage histograms for this camera process: Prometheus text on
+    http://127.0.0.1:<port>/metrics if a port is given, and a summary log
+    line per camera every METRICS_LOG_INTERVAL seconds.
+    """
+    if port:
+        start_http_server(port)
+        log(f"[metrics] serving http://127.0.0.1:{port}/metrics")
+    if settings.METRICS_LOG_INTERVAL:
+        start_log_reporter(settings.METRICS_LOG_INTERVAL, log=log)
+
+
+def _server(detector=None):
+    from detectors.inference_server import get_server
+    from detectors.registry import detector_config
+
+    return get_server(settings.YOLO_MAX_BATCH, settings.YOLO_MAX_WAIT_MS / 1000,
+                      config=detector_config(detector))
+
+
+def default_detector(camera_name, detector=None):
+    """
+    Detection through the shared inference server for this camera's
+    detector settings: settings.DETECTOR with `detector` (a dict such as
+    Camera.detector, or a "k=v,..." string) on top.
+    """
+    server = _server(detector)
+    timeout = settings.YOLO_RESULT_TIMEOUT
+    return lambda frame: server.detect(frame, camera=camera_name, timeout=timeout)
+
+
+def default_detector_many(camera_name, detector=None):
+    """Like default_detector, for a list of images sent to the server together."""
+    server = _server(detector)
+    timeout = settings.YOLO_RESULT_TIMEOUT
+    return lambda images: server.detect_many(images, camera=camera_name, timeout=timeout)
+
+
+def default_plate_reader():
+    from detectors.alpr import detect_and_read_plate
+
+    return lambda crop: detect_and_read_plate(crop, strategy=settings.ALPR_STRATEGY)
+
+
+def default_motion_gate(regions=None):
+    if not settings.MOTION_GATE:
+        return None
+    return MotionGate(
+        threshold=settings.MOTION_THRESHOLD,
+        min_area=settings.MOTION_MIN_AREA,
+        refresh_seconds=settings.MOTION_REFRESH_SECONDS,
+        regions=regions,
+    )
+
+
+class Pipeline(ABC):
+    """
+    Base of the camera pipelines; subclasses implement process().
+
+    `motion` is a MotionGate (None: from settings, False: disabled);
+    `motion_regions` limits the default gate to those polygons. `detector`
+    overrides settings.DETECTOR for the default detector; `detect_many`
+    (several images at once) defaults to calling `detect` per image when
+    `detect` is given.
+    """
+
+    def __init__(self, camera_name, detect=None, read_plate=None, writer=None,
+                 sessions=None, timer=None, log=print, motion=None, motion_regions=None,
+                 detector=None, detect_many=None):
+        from .events import get_writer
+        from .sessions import get_index
+
+        self.camera_name = camera_name
+        if detect is None:
+            detect = default_detector(camera_name, detector)
+            detect_many = detect_many or default_detector_many(camera_name, detector)
+        self.detect = detect
+        self.detect_many = detect_many or (lambda images: [detect(image) for image in images])
+        self.detector = detector
+        self.read_plate = read_plate or default_plate_reader()
+        self.writer = writer or get_writer()
+        self.sessions = sessions if sessions is not None else get_index()
+        # Stage histograms per camera unless the caller brings its own timer
+        self.timer = timer or CameraTimer(camera_name)
+        self.log = log
+        self.tracker = VehicleTracker(required_votes=settings.PLATE_VOTES_REQUIRED)
+        if motion is None:
+            motion = default_motion_gate(motion_regions)
+        self.motion = motion or None
+
+    def _idle(self, frame):
+        """
+        True when the scene is static and no vehicle is still being read,
+        so detection and OCR can be skipped for this frame.
+        """
+        if self.motion is None:
+            return False
+        # A car waiting at the gate mid-vote must keep getting OCR
+        voting = any(t.needs_ocr and not t.missed for t in self.tracker.tracks.values())
+        with self.timer.time("motion"):
+            return not self.motion.should_process(frame, force=voting)
+
+    def _detect(self, frame):
+        with self.timer.time("detect"):
+            return self.detect(frame)
+
+    def _read(self, crop):
+        with self.timer.time("ocr"):
+            return self.read_plate(crop)
+
+    def _emit(self, event):
+        with self.timer.time("db"):
+            self.writer.emit(event)
+
+    @abstractmethod
+    def process(self, frame):
+        """Handle one frame; returns the plates (or plate, slot pairs) acted on."""
+
+    def draw(self, frame):
+        """Overlay the last result onto `frame` (for display only)."""
+        for track in self.tracker.tracks.values():
+            if track.missed:
+                continue
+            x1, y1, x2, y2 = track.box
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            if track.plate:
+                cv2.putText(frame, track.plate, (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        return frame
+
+
+class EntrancePipeline(Pipeline):
+    def process(self, frame):
+        logged = []
+        if self._idle(frame):
+            return logged
+        dets = self._detect(frame)
+        # OCR runs per tracked vehicle only until its plate is confirmed
+        for track, plate in confirmed_plates(self.tracker, frame, dets, self._read):
+            # One event per confirmed vehicle. Whether the car already has
+            # an open session is decided by apply_events against the
+            # database; this process's index may not have seen the
+            # kiosk or another process close it.
+            self._emit(entry_event(plate))
+            self.log(f"Queued entry for {plate}")
+            logged.append(plate)
+        return logged
+
+
+class ExitPipeline(Pipeline):
+    def process(self, frame):
+        exited = []
+        if self._idle(frame):
+            return exited
+        dets = self._detect(frame)
+        for track, plate in confirmed_plates(self.tracker, frame, dets, self._read):
+            self.log(f"Detected plate: {plate}")
+            # Exact match, else the closest open plate (OCR confusions)
+            with self.timer.time("db"):
+                match = self.sessions.match(plate)
+            if match is None:
+                self.log(f"[Exit] {plate} has no open session.")
+                continue
+            if match != plate:
+                self.log(f"[Exit] {plate} matched open session {match}")
+            # Closing the session happens on the event writer thread
+            self._emit(exit_event(match))
+            exited.append(match)
+        return exited
+
+
+class SectionPipeline(Pipeline):
+    """
+    `slot_map` is the camera's SlotMap; `section_name` is written to
+    ParkingRecord.section on assignment. Occupancy goes through a debounced
+    per-slot state machine and only its transitions are written: one slot
+    event when a car has settled in a slot, one release when it has left.
+    """
+
+    def __init__(self, camera_name, slot_map, section_name, tiled=None, **kwargs):
+        # Only movement inside the slots matters to a section camera
+        kwargs.setdefault("motion_regions", slot_map.polygons)
+        super().__init__(camera_name, **kwargs)
+        self.slot_map = slot_map
+        self.section_name = section_name
+        # Detect on crops around the slots instead of the whole frame
+        self.tiled = settings.SECTION_TILING if tiled is None else tiled
+        self._tile_logged = False
+        self.states = SlotStates(slot_map.names, settings.SLOT_ARRIVE_SECONDS,
+                                 settings.SLOT_LEAVE_SECONDS)
+        # plate -> slot this camera announced it in; bounded and expiring so
+        # memory stays flat however many cars pass through
+        self.announced = TTLCache(settings.SLOT_PLATE_CACHE_SIZE, settings.SLOT_PLATE_CACHE_TTL)
+        # plate -> slot it settled in while its session was unknown or still
+        # held another slot; assigned once that clears (at most one per slot)
+        self.pending = {}
+        self._retried = None
+        self.last_slots = []
+
+    def tile_size(self):
+        if settings.SECTION_TILE_SIZE:
+            return settings.SECTION_TILE_SIZE
+        from detectors.registry import detector_config
+        # Tiles the size of the network input are detected at native resolution
+        return detector_config(self.detector).imgsz
+
+    def _detect(self, frame):
+        if not self.tiled or not self.slot_map.names:
+            return super()._detect(frame)
+        tiles = self.slot_map.tiles(frame.shape, self.tile_size(),
+                                    settings.SECTION_TILE_MARGIN, settings.SECTION_TILE_OVERLAP)
+        if not self._tile_logged:
+            self._tile_logged = True
+            self.log(f"Detecting on {len(tiles)} slot tiles covering "
+                     f"{coverage(tiles, frame.shape):.0%} of the frame")
+        with self.timer.time("detect"):
+            crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+            return merge_detections(tiles, self.detect_many(crops))
+
+    def process(self, frame):
+        assigned = []
+        if self._idle(frame):
+            return assigned
+        dets = self._detect(frame)
+        tracks = self.tracker.update(dets)
+        self.last_slots = []
+
+        seen = {}
+        # One vectorised mask lookup for every vehicle centroid
+        slots = self.slot_map.slots_for_boxes([t.box for t in tracks], frame.shape)
+        for track, slot_name in zip(tracks, slots):
+            if slot_name is None:
+                continue
+            self.last_slots.append((track.box, slot_name))
+            x1, y1, x2, y2 = track.box
+
+            # OCR only until this vehicle's plate has been voted in
+            if track.needs_ocr:
+                text = self._read(frame[y1:y2, x1:x2])
+                track.add_read(text.strip().upper() if text else None)
+            seen[slot_name] = seen.get(slot_name) or track.plate
+
+        # Slots with nothing in them still advance towards "free"
+        for state, slot_name, plate in self.states.update(seen):
+            if plate is None:
+                continue
+            if state == OCCUPIED:
+                if self._assign(plate, slot_name):
+                    assigned.append((plate, slot_name))
+            elif state == FREE:
+                self._release(plate, slot_name)
+        assigned.extend(self._retry_pending())
+        return assigned
+
+    def _assign(self, plate, slot_name):
+        current = self.announced.get(plate)
+        if current == slot_name:
+            return False
+        # Index lookup; a query only for plates this process has not seen
+        session = self.sessions.lookup(plate)
+        if session is not None and session.slot == slot_name:
+            self.announced[plate] = slot_name
+            self.pending.pop(plate, None)
+            return False
+        if session is None or current is not None or session.slot is not None:
+            # Not written yet, or the car still holds the slot it came from:
+            # assign once its session appears or that slot is released
+            self.pending[plate] = slot_name
+            return False
+        self._emit(slot_event(plate, self.section_name, slot_name))
+        self.announced[plate] = slot_name
+        self.pending.pop(plate, None)
+        return True
+
+    def _release(self, plate, slot_name):
+        session = self.sessions.get(plate)
+        if self.announced.get(plate) == slot_name:
+            self.announced.pop(plate)
+        elif session is None or session.slot != slot_name:
+            return
+        self._emit(release_event(plate, self.section_name, slot_name))
+        self.log(f"{plate} left {slot_name}")
+        # A car that moved: its new slot goes right behind the release, so
+        # the writer applies them in that order
+        target = self.pending.pop(plate, None)
+        if target is not None and self.states.plate(target) == plate:
+            self._emit(slot_event(plate, self.section_name, target))
+            self.announced[plate] = target
+            self.log(f"{plate} moved to {target}")
+
+    def _retry_pending(self):
+        """Pending assignments whose session may have appeared since, every SLOT_ARRIVE_SECONDS."""
+        now = self.states.clock()
+        if not self.pending or (self._retried is not None and now - self._retried < self.states.arrive_seconds):
+            return []
+        self._retried = now
+        assigned = []
+        for plate, slot_name in list(self.pending.items()):
+            if self.states.plate(slot_name) != plate:
+                # Left again (or another car took it) before it could be assigned
+                del self.pending[plate]
+            elif self._assign(plate, slot_name):
+                assigned.append((plate, slot_name))
+        return assigned
+
+    def draw(self, frame):
+        # Visual aid: vehicle boxes labelled with their slot
+        for (x1, y1, x2, y2), slot_name in self.last_slots:
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            cv2.putText(frame, slot_name, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+        # Draw slot polygons (green if free, red if taken)
+        occupied_slots = self.states.occupied()
+        for slot_name, pts in zip(self.slot_map.names, self.slot_map.polygons):
+            color = (0, 255, 0) if slot_name not in occupied_slots else (0, 0, 255)
+            cv2.polylines(frame, [pts], isClosed=True, color=color, thickness=2)
+            cv2.putText(frame, slot_name, tuple(int(v) for v in pts[0, 0]),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        return frame
@@ -0,0 +1,120 @@
+# parking/plates.py
+from collections import defaultdict
+
+# Characters OCR mixes up on plates, folded onto one representative
+CONFUSABLES = str.maketrans({
+    "O": "0", "Q": "0", "D": "0",
+    "I": "1", "L": "1",
+    "Z": "2",
+    "S": "5",
+    "G": "6",
+    "B": "8",
+})
+
+
+def normalize_plate(plate):
+    return "".join(ch for ch in plate.upper() if ch.isalnum()).translate(CONFUSABLES)
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 as soon as it must exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) == len(b):
+        # Up to one substitution: Hamming distance is exact, skip the DP
+        mismatches = sum(ca != cb for ca, cb in zip(a, b))
+        if mismatches <= 1:
+            return mismatches
+        if limit <= 1:
+            return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _deletes(word, depth):
+    """`word` plus every string reachable by deleting up to `depth` chars."""
+    out = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+class FuzzyPlateIndex:
+    """
+    Approximate lookup over a changing set of plates (symmetric-delete
+    index). Plates are confusable-normalized, and every normalized form is
+    stored under all its up-to-`max_distance` deletions, so a query only
+    expands its own deletions and verifies a handful of candidates no
+    matter how many plates are indexed. Adds and removals are O(len^k).
+    """
+
+    def __init__(self, max_distance=1):
+        self.max_distance = max_distance
+        self._keys = defaultdict(set)      # deletion key -> normalized plates
+        self._plates = defaultdict(set)    # normalized plate -> raw plates
+
+    def __len__(self):
+        return sum(len(v) for v in self._plates.values())
+
+    def add(self, plate):
+        norm = normalize_plate(plate)
+        if not self._plates[norm]:
+            for key in _deletes(norm, self.max_distance):
+                self._keys[key].add(norm)
+        self._plates[norm].add(plate)
+
+    def remove(self, plate):
+        norm = normalize_plate(plate)
+        raw = self._plates.get(norm)
+        if not raw:
+            return
+        raw.discard(plate)
+        if raw:
+            return
+        del self._plates[norm]
+        for key in _deletes(norm, self.max_distance):
+            bucket = self._keys.get(key)
+            if bucket is not None:
+                bucket.discard(norm)
+                if not bucket:
+                    del self._keys[key]
+
+    def clear(self):
+        self._keys.clear()
+        self._plates.clear()
+
+    def candidates(self, plate):
+        """[(distance, raw_plate)] within max_distance, closest first."""
+        norm = normalize_plate(plate)
+        seen = set()
+        for key in _deletes(norm, self.max_distance):
+            seen |= self._keys.get(key, set())
+        found = []
+        for cand in seen:
+            d = edit_distance(norm, cand, self.max_distance)
+            if d <= self.max_distance:
+                found.extend((d, raw) for raw in self._plates[cand])
+        found.sort()
+        return found
+
+    def best(self, plate):
+        """
+        The single closest indexed plate, or None if there is none within
+        range or the closest distance is shared by several plates (we would
+        rather leave a car "inside" than close someone else's session).
+        """
+        found = self.candidates(plate)
+        if not found:
+            return None
+        if len(found) > 1 and found[1][0] == found[0][0]:
+            return None
+        return found[0][1]
@@ -0,0 +1,237 @@
+# parking/preview.py
+"""
+On-demand live view of the camera processes, for headless servers.
+
+Camera loops hand every processed frame to the hub with offer(). Unless
+someone is watching that camera, offer() is a dictionary lookup and
+nothing is drawn or encoded. While a viewer is connected, the pipeline's
+overlay is drawn on a copy of the frame and JPEG-encoded at most
+PREVIEW_FPS times a second, and the bytes are shared by every viewer of
+that camera.
+
+start_preview_server() serves, per camera process:
+
+  /                         JSON viewers and frames rendered per camera
+  /<camera>/snapshot.jpg    one fresh annotated frame
+  /<camera>/stream.mjpg     multipart MJPEG stream
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import cv2
+from django.conf import settings
+
+BOUNDARY = "frame"
+
+
+class _Feed:
+    def __init__(self):
+        self.viewers = 0
+        self.requested = False  # a snapshot is waiting for the next frame
+        self.rendered = None    # clock() of the last render
+        self.seq = 0
+        self.jpeg = None
+
+
+class PreviewHub:
+    def __init__(self, fps=5, quality=70, width=960, clock=time.monotonic):
+        self.interval = 1.0 / fps if fps else 0.0
+        self.quality = quality
+        self.width = width
+        self.clock = clock
+        self._feeds = {}
+        self._cond = threading.Condition()
+
+    def _feed(self, camera):
+        feed = self._feeds.get(camera)
+        if feed is None:
+            feed = self._feeds[camera] = _Feed()
+        return feed
+
+    def cameras(self):
+        with self._cond:
+            return sorted(self._feeds)
+
+    def wants(self, camera):
+        """True if a frame of `camera` should be rendered now."""
+        feed = self._feeds.get(camera)
+        if feed is None or not (feed.viewers or feed.requested):
+            return False
+        return feed.rendered is None or self.clock() - feed.rendered >= self.interval
+
+    def offer(self, camera, frame, draw):
+        """
+        Called by the camera loop after each processed frame. Draws and
+        encodes only when wanted; returns True if it did.
+        """
+        if camera not in self._feeds:
+            with self._cond:
+                self._feed(camera)
+        if not self.wants(camera):
+            return False
+        self.publish(camera, draw(frame.copy()))
+        return True
+
+    def encode(self, image):
+        h, w = image.shape[:2]
+        if self.width and w > self.width:
+            image = cv2.resize(image, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return buf.tobytes() if ok else None
+
+    def publish(self, camera, image):
+        """Encode an already drawn frame and wake up its viewers."""
+        jpeg = self.encode(image)
+        with self._cond:
+            feed = self._feed(camera)
+            feed.rendered = self.clock()
+            feed.requested = False
+            if jpeg is not None:
+                feed.jpeg = jpeg
+                feed.seq += 1
+            self._cond.notify_all()
+
+    def snapshot(self, camera, timeout=2.0):
+        """
+        JPEG bytes of a fresh frame of `camera`, or None if the camera
+        produced none within `timeout` seconds.
+        """
+        with self._cond:
+            feed = self._feeds.get(camera)
+            if feed is None:
+                return None
+            # Reuse a frame another viewer caused to be rendered just now
+            if feed.jpeg is not None and self.clock() - feed.rendered < self.interval:
+                return feed.jpeg
+            seq = feed.seq
+            feed.requested = True
+            if not self._cond.wait_for(lambda: feed.seq != seq, timeout=timeout):
+                feed.requested = False
+                return None
+            return feed.jpeg
+
+    def stream(self, camera, timeout=5.0):
+        """
+        MJPEG parts for `camera`, one per rendered frame. The viewer counts
+        as watching from this call until the generator is closed.
+
+        With no new frame for `timeout` seconds the last part is sent again
+        (a bare CRLF before the first frame), so the server writes to the
+        socket and notices a viewer that has gone away.
+        """
+        with self._cond:
+            feed = self._feed(camera)
+            feed.viewers += 1
+
+        def parts():
+            seq, part = 0, b"\r\n"
+            try:
+                while True:
+                    with self._cond:
+                        fresh = self._cond.wait_for(lambda: feed.seq != seq, timeout=timeout)
+                        if fresh:
+                            seq, jpeg = feed.seq, feed.jpeg
+                    if fresh:
+                        part = (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg + b"\r\n"
+                    # Not under the lock: the caller writes this to a socket
+                    yield part
+            finally:
+                with self._cond:
+                    feed.viewers -= 1
+        return parts()
+
+    def stats(self):
+        with self._cond:
+            return {name: {"viewers": f.viewers, "frames": f.seq} for name, f in self._feeds.items()}
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """The process-wide hub, configured from settings."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = PreviewHub(settings.PREVIEW_FPS, settings.PREVIEW_JPEG_QUALITY,
+                              settings.PREVIEW_WIDTH)
+        return _hub
+
+
+def present(pipeline, frame, window=None):
+    """
+    Call after pipeline.process(frame). Headless (window=None) the frame is
+    only offered to preview viewers. With a window name the overlay is also
+    shown locally; returns False once 'q' is pressed there.
+    """
+    hub = get_hub()
+    if window is None:
+        with pipeline.timer.time("preview"):
+            hub.offer(pipeline.camera_name, frame, pipeline.draw)
+        return True
+    image = pipeline.draw(frame)
+    if hub.wants(pipeline.camera_name):
+        hub.publish(pipeline.camera_name, image)
+    cv2.imshow(window, image)
+    return cv2.waitKey(1) & 0xFF != ord('q')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    hub = None
+
+    def do_GET(self):
+        parts = [unquote(p) for p in self.path.split("?")[0].strip("/").split("/") if p]
+        if not parts:
+            self._send(200, "application/json", json.dumps(self.hub.stats()).encode())
+        elif len(parts) == 2 and parts[1] == "snapshot.jpg" and parts[0] in self.hub.cameras():
+            jpeg = self.hub.snapshot(parts[0])
+            if jpeg is None:
+                self.send_error(503, "No frame from this camera yet")
+            else:
+                self._send(200, "image/jpeg", jpeg)
+        elif len(parts) == 2 and parts[1] == "stream.mjpg" and parts[0] in self.hub.cameras():
+            self._stream(parts[0])
+        else:
+            self.send_error(404)
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, camera):
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        parts = self.hub.stream(camera)
+        try:
+            for part in parts:
+                self.wfile.write(part)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            # Stops the drawing as soon as the last viewer disconnects
+            parts.close()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_preview_server(port, host="127.0.0.1", hub=None, log=print):
+    """Serve the hub's cameras from a daemon thread (one per camera process)."""
+    handler = type("PreviewHandler", (_Handler,), {"hub": hub or get_hub()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="preview-http", daemon=True).start()
+    log(f"[preview] serving http://{host}:{server.server_address[1]}/<camera>/stream.mjpg")
+    return server
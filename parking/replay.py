@@ -0,0 +1,185 @@
+# parking/replay.py
+# Offline replay of recorded clips through the camera pipelines, for
+# throughput/latency/accuracy measurements without a live camera.
+import contextlib
+import json
+import os
+import time
+from collections import defaultdict
+
+from detectors.capture import iter_frames
+
+from .events import apply_events, entry_event
+from .sessions import OpenSessionIndex
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class StageTimer:
+    """Records every duration per stage; summary() gives percentiles in ms."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[stage].append(time.perf_counter() - start)
+
+    def summary(self):
+        out = {}
+        for stage, values in self.samples.items():
+            values = sorted(values)
+            out[stage] = {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+                "total_ms": round(sum(values) * 1000, 3),
+            }
+        return out
+
+
+class SyncWriter:
+    """
+    Stand-in for EventWriter that writes each event immediately, so the
+    database cost lands in the pipeline's "db" stage.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.written = 0
+
+    def emit(self, event):
+        apply_events([event], log=lambda msg: None, index=self.index)
+        self.written += 1
+        return True
+
+    def stop(self):
+        pass
+
+    def stats(self):
+        return {"written": self.written}
+
+
+def load_annotations(path):
+    """
+    Ground truth for a clip, JSON:
+      {"fps": 25,
+       "plates": ["KA01AB1234", ...],          # plates that should be read
+       "slots": {"KA01AB1234": "SlotA"},        # section clips only
+       "slot_polygons": {"SlotA": [[x, y], ...]}}  # optional, else from DB
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def seed_open_sessions(plates, index):
+    """Open a session per plate so an exit clip has something to close."""
+    apply_events([entry_event(p) for p in plates], log=lambda msg: None, index=index)
+
+
+def replay(pipeline, frames, timer, fps=None):
+    """
+    Run `frames` through `pipeline.process`. With `fps` set, frames are
+    paced at that rate and frames that are already late are dropped (as
+    the live grabber would); otherwise everything runs at full speed.
+    Returns a report dict; "results" holds what process() returned.
+    """
+    results = []
+    processed = dropped = 0
+    frames = iter(frames)
+    start = time.perf_counter()
+    index = 0
+    while True:
+        with timer.time("decode"):
+            frame = next(frames, None)
+        if frame is None:
+            break
+        if fps:
+            due = start + index / fps
+            now = time.perf_counter()
+            if now > due + 1.0 / fps:
+                dropped += 1
+                index += 1
+                continue
+            if now < due:
+                time.sleep(due - now)
+        index += 1
+        with timer.time("frame"):
+            results.extend(pipeline.process(frame))
+        processed += 1
+
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": index,
+        "processed": processed,
+        "dropped": dropped,
+        "elapsed_s": round(elapsed, 3),
+        "fps": round(processed / elapsed, 2) if elapsed else 0.0,
+        "stages": timer.summary(),
+        "results": results,
+    }
+
+
+def score_plates(expected, got):
+    expected, got = set(expected), set(got)
+    hits = len(expected & got)
+    return {
+        "expected": len(expected),
+        "read": len(got),
+        "precision": round(hits / len(got), 3) if got else 0.0,
+        "recall": round(hits / len(expected), 3) if expected else 0.0,
+    }
+
+
+def score_slots(expected, got):
+    """expected: {plate: slot}; got: [(plate, slot)] (last assignment wins)."""
+    final = dict(got)
+    correct = sum(1 for plate, slot in expected.items() if final.get(plate) == slot)
+    return {
+        "expected": len(expected),
+        "assigned": len(final),
+        "accuracy": round(correct / len(expected), 3) if expected else 0.0,
+    }
+
+
+def replay_clip(kind, clip, pipeline_factory, annotations=None, realtime=False,
+                max_frames=None):
+    """
+    Replay one clip (a path, or any iterable of frames).
+    `pipeline_factory(writer, sessions, timer)` builds the pipeline for
+    `kind` ("entrance", "exit" or "section"). Run this inside a
+    transaction that gets rolled back; it writes to the database.
+    """
+    annotations = annotations or {}
+    timer = StageTimer()
+    sessions = OpenSessionIndex()
+    sessions.warm()
+    if kind == "exit":
+        seed_open_sessions(annotations.get("plates", []), sessions)
+
+    pipeline = pipeline_factory(SyncWriter(sessions), sessions, timer)
+    fps = annotations.get("fps", 25) if realtime else None
+    if isinstance(clip, (str, os.PathLike)):
+        clip = iter_frames(clip, max_frames)
+    report = replay(pipeline, clip, timer, fps=fps)
+
+    results = report.pop("results")
+    if kind == "section":
+        report["accuracy"] = score_slots(annotations.get("slots", {}), results)
+    elif "plates" in annotations:
+        report["accuracy"] = score_plates(annotations["plates"], results)
+    return report
@@ -0,0 +1,142 @@
+# parking/sessions.py
+import threading
+from collections import namedtuple
+
+from .models import ParkingRecord
+from .plates import FuzzyPlateIndex
+
+OpenSession = namedtuple("OpenSession", "record_id section slot")
+
+
+class OpenSessionIndex:
+    """
+    Process-local map of plate -> OpenSession for every session that has
+    not exited yet, so the gate loops answer "is this car inside?" with a
+    dict lookup instead of a query.
+
+    The index is warmed from the database once and then kept current by the
+    event writer (apply_events). Other processes may open sessions this one
+    has not seen, so a miss falls back to load(), which queries only the
+    plates asked for using the (plate, exit_time) index.
+
+    match() adds an approximate fallback for OCR errors (0/O, 8/B, one
+    wrong or missing character) through a FuzzyPlateIndex kept alongside.
+    Before using it, sessions other processes opened since are loaded (rows
+    past the highest id seen), and a fuzzy hit is checked against the
+    database, so a plate the kiosk, archiver or admin closed is never
+    returned.
+    """
+
+    def __init__(self, max_distance=1):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._fuzzy = FuzzyPlateIndex(max_distance)
+        self._last_pk = 0
+        self.warmed = False
+
+    def warm(self):
+        rows = ParkingRecord.objects.filter(exit_time__isnull=True).order_by(
+            "entry_time"
+        ).values_list("plate", "id", "section", "slot")
+        sessions = {plate: OpenSession(pk, section, slot) for plate, pk, section, slot in rows}
+        with self._lock:
+            self._sessions = sessions
+            self._fuzzy.clear()
+            for plate in sessions:
+                self._fuzzy.add(plate)
+            self._last_pk = max((s.record_id for s in sessions.values()), default=0)
+            self.warmed = True
+        return len(sessions)
+
+    def refresh(self):
+        """Load sessions opened (by any process) since the highest id seen."""
+        rows = ParkingRecord.objects.filter(
+            pk__gt=self._last_pk, exit_time__isnull=True
+        ).order_by("pk").values_list("plate", "id", "section", "slot")
+        found = 0
+        for plate, pk, section, slot in rows:
+            self.opened(plate, pk, section, slot)
+            found += 1
+        return found
+
+    def load(self, plates):
+        """Cold path: fetch open sessions for `plates` from the database."""
+        rows = ParkingRecord.objects.filter(
+            plate__in=list(plates), exit_time__isnull=True
+        ).order_by("entry_time").values_list("plate", "id", "section", "slot")
+        found = {plate: OpenSession(pk, section, slot) for plate, pk, section, slot in rows}
+        with self._lock:
+            self._sessions.update(found)
+            for plate in found:
+                self._fuzzy.add(plate)
+        # Asked for and not open: closed elsewhere
+        for plate in set(plates) - set(found):
+            if plate in self._sessions:
+                self.closed(plate)
+        return found
+
+    def get(self, plate):
+        return self._sessions.get(plate)
+
+    def lookup(self, plate):
+        """get() with a database fallback on a miss."""
+        session = self._sessions.get(plate)
+        if session is None:
+            session = self.load([plate]).get(plate)
+        return session
+
+    def match(self, plate):
+        """
+        Resolve an OCR'd plate to the plate of an open session: exact
+        first (with the database fallback), then the closest unambiguous
+        approximate match among indexed sessions. None if nothing fits.
+        """
+        if self.lookup(plate) is not None:
+            return plate
+        self.refresh()
+        while True:
+            with self._lock:
+                best = self._fuzzy.best(plate)
+            # load() drops it from the index if it has been closed meanwhile
+            if best is None or self.load([best]):
+                return best
+
+    def __contains__(self, plate):
+        return plate in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def plates(self):
+        return list(self._sessions)
+
+    def opened(self, plate, record_id, section=None, slot=None):
+        with self._lock:
+            self._sessions[plate] = OpenSession(record_id, section, slot)
+            self._fuzzy.add(plate)
+            self._last_pk = max(self._last_pk, record_id)
+
+    def closed(self, plate):
+        with self._lock:
+            self._sessions.pop(plate, None)
+            self._fuzzy.remove(plate)
+
+    def clear(self):
+        with self._lock:
+            self._sessions = {}
+            self._fuzzy.clear()
+            self._last_pk = 0
+            self.warmed = False
+
+
+_index = OpenSessionIndex()
+_warm_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index, warmed from the database on first use."""
+    if not _index.warmed:
+        with _warm_lock:
+            if not _index.warmed:
+                _index.warm()
+    return _index
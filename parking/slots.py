@@ -0,0 +1,206 @@
+# parking/slots.py
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from detectors.tiling import plan_tiles
+
+from .models import ParkingSlot
+
+
+def _centroids(boxes):
+    b = np.asarray([box[:4] for box in boxes], dtype=np.int64).reshape(-1, 4)
+    return np.stack([(b[:, 0] + b[:, 2]) // 2, (b[:, 1] + b[:, 3]) // 2], axis=1)
+
+
+class SlotMap:
+    """
+    Slot geometry for one camera, rasterised once into an integer label
+    mask (0 = no slot, i + 1 = self.names[i]). Looking up which slot a
+    point falls in is then a single array index, and all detections of a
+    frame can be resolved in one vectorised call.
+    """
+
+    def __init__(self, polygons):
+        # polygons: {slot_name: [(x, y), ...]}
+        self.names = list(polygons)
+        self.polygons = [
+            np.array(coords, np.int32).reshape((-1, 1, 2)) for coords in polygons.values()
+        ]
+        self._mask = None
+        self._tiles = {}
+
+    @classmethod
+    def for_camera(cls, camera):
+        slots = ParkingSlot.objects.filter(camera=camera).order_by('name')
+        return cls({s.name: [tuple(p) for p in s.polygon] for s in slots})
+
+    def mask(self, shape):
+        h, w = shape[:2]
+        if self._mask is None or self._mask.shape != (h, w):
+            # Overlapping polygons: the later slot wins, like drawing order
+            mask = np.zeros((h, w), np.int32)
+            for i, pts in enumerate(self.polygons):
+                cv2.fillPoly(mask, [pts], i + 1)
+            self._mask = mask
+        return self._mask
+
+    def bounding_rects(self):
+        """(x1, y1, x2, y2) around each slot polygon."""
+        rects = []
+        for pts in self.polygons:
+            x, y, w, h = cv2.boundingRect(pts)
+            rects.append((x, y, x + w, y + h))
+        return rects
+
+    def tiles(self, shape, tile, margin=0.25, overlap=0.2):
+        """Detection tiles covering the slots (see detectors.tiling.plan_tiles)."""
+        key = (shape[:2], tile, margin, overlap)
+        if key not in self._tiles:
+            self._tiles[key] = plan_tiles(self.bounding_rects(), shape, tile, margin, overlap)
+        return self._tiles[key]
+
+    def slot_indices(self, points, shape):
+        """
+        points: (N, 2) array-like of (x, y). Returns an int array of slot
+        indices into self.names, -1 where a point is in no slot.
+        """
+        mask = self.mask(shape)
+        pts = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        if len(pts) == 0:
+            return np.empty(0, np.int64)
+        h, w = mask.shape
+        xs, ys = pts[:, 0], pts[:, 1]
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        labels = np.zeros(len(pts), np.int64)
+        labels[inside] = mask[ys[inside], xs[inside]]
+        return labels - 1
+
+    def slots_for_boxes(self, boxes, shape):
+        """Slot name (or None) for the centroid of each (x1,y1,x2,y2, ...) box."""
+        if not boxes:
+            return []
+        idx = self.slot_indices(_centroids(boxes), shape)
+        return [self.names[i] if i >= 0 else None for i in idx]
+
+
+FREE = "free"
+ARRIVING = "arriving"
+OCCUPIED = "occupied"
+LEAVING = "leaving"
+
+
+class TTLCache:
+    """
+    Mapping capped at `maxsize` entries whose entries expire `ttl` seconds
+    after they were last set; the stalest entries are evicted first.
+    """
+
+    def __init__(self, maxsize=1000, ttl=3600, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._data = OrderedDict()   # key -> (expires_at, value), oldest first
+
+    def _expire(self, now):
+        while self._data:
+            key, (expires, _) = next(iter(self._data.items()))
+            if expires > now:
+                break
+            del self._data[key]
+
+    def get(self, key, default=None):
+        self._expire(self.clock())
+        item = self._data.get(key)
+        return item[1] if item is not None else default
+
+    def __setitem__(self, key, value):
+        now = self.clock()
+        self._data.pop(key, None)
+        self._data[key] = (now + self.ttl, value)
+        self._expire(now)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else default
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        self._expire(self.clock())
+        return len(self._data)
+
+
+class _Slot:
+    __slots__ = ("state", "since", "plate")
+
+    def __init__(self):
+        self.state, self.since, self.plate = FREE, 0.0, None
+
+
+class SlotStates:
+    """
+    Debounced occupancy per slot: free -> arriving -> occupied -> leaving
+    -> free. A vehicle has to be seen for `arrive_seconds` before its slot
+    counts as occupied, and missing for `leave_seconds` before it is free
+    again, so detector flicker never reaches the database.
+
+    update() returns only the transitions callers act on:
+      (OCCUPIED, slot, plate)  slot became occupied, or its plate got known
+      (FREE, slot, plate)      slot released (plate may be None)
+    """
+
+    def __init__(self, names, arrive_seconds=2.0, leave_seconds=5.0, clock=time.monotonic):
+        self.arrive_seconds = arrive_seconds
+        self.leave_seconds = leave_seconds
+        self.clock = clock
+        self.slots = {name: _Slot() for name in names}
+
+    def update(self, seen, now=None):
+        """`seen`: {slot: plate or None} for slots with a vehicle this frame."""
+        now = self.clock() if now is None else now
+        changes = []
+        for name, slot in self.slots.items():
+            present = name in seen
+            plate = seen.get(name)
+
+            if slot.state == FREE and present:
+                slot.state, slot.since, slot.plate = ARRIVING, now, plate
+            if slot.state == ARRIVING:
+                if not present:
+                    slot.state, slot.plate = FREE, None
+                    continue
+                slot.plate = slot.plate or plate
+                if now - slot.since >= self.arrive_seconds:
+                    slot.state = OCCUPIED
+                    changes.append((OCCUPIED, name, slot.plate))
+                continue
+            if slot.state == LEAVING and present:
+                slot.state = OCCUPIED
+            if slot.state == OCCUPIED:
+                if not present:
+                    slot.state, slot.since = LEAVING, now
+                elif plate and not slot.plate:
+                    slot.plate = plate
+                    changes.append((OCCUPIED, name, plate))
+            if slot.state == LEAVING and now - slot.since >= self.leave_seconds:
+                changes.append((FREE, name, slot.plate))
+                slot.state, slot.plate = FREE, None
+        return changes
+
+    def state(self, name):
+        return self.slots[name].state
+
+    def occupied(self):
+        """Slots counted as taken (occupied, or leaving but not yet free)."""
+        return {name for name, s in self.slots.items() if s.state in (OCCUPIED, LEAVING)}
+
+    def plate(self, name):
+        """Plate of the vehicle taking `name` (occupied or leaving), else None."""
+        slot = self.slots[name]
+        return slot.plate if slot.state in (OCCUPIED, LEAVING) else None
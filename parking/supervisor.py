@@ -0,0 +1,184 @@
+# parking/supervisor.py
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from detectors.capture import close_grabber, open_grabber
+
+from .models import Camera, ParkingSlot
+from .pipelines import EntrancePipeline, ExitPipeline, SectionPipeline
+from .preview import present
+from .slots import SlotMap
+
+
+def build_pipeline(camera, log=print):
+    """The pipeline for a Camera row, according to its role."""
+    options = {"log": log, "detector": camera.detector or None}
+    if camera.role == "entrance":
+        return EntrancePipeline(camera.name, **options)
+    if camera.role == "exit":
+        return ExitPipeline(camera.name, **options)
+    return SectionPipeline(
+        camera.name, SlotMap.for_camera(camera), camera.section or camera.name, **options
+    )
+
+
+class CameraWorker:
+    """
+    Runs one camera on its own thread: newest frame from the shared
+    grabber, through the camera's pipeline. Frame processing is gated by
+    the supervisor's semaphore, so at most `workers` cameras use the CPU at
+    once however many streams are connected. A stream that cannot be
+    opened or ends is reopened with exponential backoff.
+    """
+
+    def __init__(self, camera, gate, log=print, max_backoff=60):
+        self.camera = camera
+        self.gate = gate
+        self.max_backoff = max_backoff
+        self.log = lambda msg: log(f"[{camera.name}] {msg}")
+        self.restarts = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"camera-{self.camera.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait and self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        try:
+            pipeline = build_pipeline(self.camera, log=self.log)
+        except Exception as exc:
+            self.log(f"could not start pipeline: {exc}")
+            return
+        finally:
+            close_old_connections()
+
+        backoff = 1
+        source = self.camera.source
+        while not self._stop.is_set():
+            cap = open_grabber(source)
+            if cap is None:
+                self.log(f"cannot open {source}; retrying in {backoff}s")
+            else:
+                if self._consume(cap, pipeline):
+                    backoff = 1
+                close_grabber(source)
+                if self._stop.is_set():
+                    break
+                self.log(f"stream ended; restarting in {backoff}s")
+            self.restarts += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _consume(self, cap, pipeline):
+        """Process frames until the stream ends or we are stopped."""
+        got_frames = False
+        while not self._stop.is_set():
+            ret, frame = cap.read(timeout=0.5)
+            if not ret:
+                if not cap.isOpened():
+                    break
+                continue
+            got_frames = True
+            with self.gate:
+                try:
+                    with pipeline.timer.time("frame"):
+                        pipeline.process(frame)
+                    # No-op unless someone is watching this camera
+                    present(pipeline, frame)
+                except Exception as exc:
+                    # One bad frame must not take the camera down
+                    self.errors += 1
+                    self.log(f"error processing frame: {exc}")
+        return got_frames
+
+
+def camera_signature(camera):
+    """Changes whenever the camera row or its slot geometry changes."""
+    slots = ParkingSlot.objects.filter(camera=camera).order_by("name").values_list("name", "polygon")
+    raw = repr((camera.name, camera.source, camera.section, camera.role,
+                sorted((camera.detector or {}).items()), list(slots)))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class Supervisor:
+    """
+    Keeps one CameraWorker per enabled Camera row. reload() diffs the table
+    against the running workers: new cameras are started, removed or
+    disabled ones stopped, and changed ones (source, role, slots, ...)
+    restarted. Every worker shares this process's YOLO server, OCR reader,
+    event writer and session index.
+    """
+
+    def __init__(self, workers=None, log=print, worker_factory=CameraWorker):
+        self.workers_count = workers or os.cpu_count() or 1
+        self.gate = threading.BoundedSemaphore(self.workers_count)
+        self.log = log
+        self.worker_factory = worker_factory
+        self.workers = {}       # camera id -> worker
+        self.signatures = {}    # camera id -> camera_signature()
+
+    def reload(self):
+        cameras = {c.pk: c for c in Camera.objects.filter(enabled=True)}
+        wanted = {pk: camera_signature(c) for pk, c in cameras.items()}
+
+        for pk in list(self.workers):
+            if wanted.get(pk) != self.signatures.get(pk):
+                worker = self.workers.pop(pk)
+                self.signatures.pop(pk, None)
+                worker.stop()
+                self.log(f"[supervisor] stopped {worker.camera.name}")
+
+        for pk, signature in wanted.items():
+            worker = self.workers.get(pk)
+            if worker is not None and not worker.is_alive():
+                # Pipeline failed to start; try again on this reload
+                self.workers.pop(pk)
+                worker = None
+            if worker is None:
+                self.workers[pk] = self.worker_factory(
+                    cameras[pk], self.gate, log=self.log,
+                    max_backoff=settings.CAMERA_RESTART_MAX_BACKOFF,
+                ).start()
+                self.signatures[pk] = signature
+                self.log(f"[supervisor] started {cameras[pk].name} ({cameras[pk].role})")
+        close_old_connections()
+
+    def run(self, interval):
+        try:
+            while True:
+                try:
+                    self.reload()
+                except Exception as exc:
+                    # e.g. "database is locked": keep the running cameras
+                    # and try again on the next interval
+                    self.log(f"[supervisor] reload failed: {exc}")
+                    close_old_connections()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        for worker in self.workers.values():
+            worker.stop(wait=False)
+        for worker in self.workers.values():
+            worker.stop()
+        self.workers.clear()
+        self.signatures.clear()
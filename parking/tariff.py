@@ -0,0 +1,190 @@
+# parking/tariff.py
+"""
+Parking fares.
+
+A Tariff prices a stay from its length in minutes:
+
+  * bands: [(up_to_minutes, rate_per_hour), ..., (None, rate_per_hour)],
+    charged per minute, e.g. [(60, 30), (180, 20), (None, 10)] is 30/h for
+    the first hour, 20/h up to three hours and 10/h after that;
+  * grace_minutes: stays this short are free;
+  * daily_cap: no 24h block costs more than this; the bands start again
+    every 24 hours.
+
+TariffEngine holds the default tariff plus per-section overrides. The same
+NumPy code prices one session at the kiosk and a whole queryset (one query,
+no per-row Python pricing) for reports. Stay lengths of a queryset are
+computed by the database, and every fare is rounded half-up to the paisa on
+both paths.
+"""
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+PRICE_FIELDS = ("id", "duration", "section")
+
+
+def price_annotations(now=None):
+    """
+    The `duration` column of PRICE_FIELDS: exit (or `now` for open
+    sessions) minus entry, computed in SQL.
+    """
+    end = Coalesce(F("exit_time"), Value(now or timezone.now(), output_field=DateTimeField()))
+    return {"duration": ExpressionWrapper(end - F("entry_time"), output_field=DurationField())}
+
+
+class Tariff:
+    def __init__(self, bands=((None, 10),), grace_minutes=0, daily_cap=None):
+        bands = [tuple(b) for b in bands]
+        if not bands or bands[-1][0] is not None:
+            raise ValueError("the last tariff band must be open-ended (None)")
+        self.bands = bands
+        self.grace_minutes = grace_minutes
+        self.daily_cap = daily_cap
+
+        # Cumulative price at every band boundary, so pricing is an interp
+        breaks, totals = [0.0], [0.0]
+        for up_to, rate in bands[:-1]:
+            totals.append(totals[-1] + (up_to - breaks[-1]) * rate / 60)
+            breaks.append(float(up_to))
+        self._breaks = np.array(breaks)
+        self._totals = np.array(totals)
+        self._tail_rate = bands[-1][1] / 60
+        self._day_price = self._banded(np.array([MINUTES_PER_DAY]))[0]
+        if daily_cap is not None:
+            self._day_price = min(self._day_price, daily_cap)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            bands=config.get("bands", ((None, 10),)),
+            grace_minutes=config.get("grace_minutes", 0),
+            daily_cap=config.get("daily_cap"),
+        )
+
+    def _banded(self, minutes):
+        last = self._breaks[-1]
+        within = np.interp(np.minimum(minutes, last), self._breaks, self._totals)
+        return within + np.maximum(minutes - last, 0) * self._tail_rate
+
+    def price_minutes(self, minutes):
+        """Fares for an array of durations in minutes (float array, unrounded)."""
+        minutes = np.maximum(np.asarray(minutes, dtype=float), 0)
+        days, rest = np.divmod(minutes, MINUTES_PER_DAY)
+        rest_price = self._banded(rest)
+        if self.daily_cap is not None:
+            rest_price = np.minimum(rest_price, self.daily_cap)
+        fares = days * self._day_price + rest_price
+        fares[minutes <= self.grace_minutes] = 0
+        return fares
+
+    def price(self, minutes):
+        return to_amount(self.price_minutes([minutes])[0])
+
+
+def to_amount(value):
+    return Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def round_fares(fares):
+    """to_amount's half-up rounding for a float array (np.round is half-even)."""
+    # Rounding to 6 places first drops float noise such as 7333.4999999
+    return np.floor(np.round(np.asarray(fares, dtype=float) * 100, 6) + 0.5) / 100
+
+
+class TariffEngine:
+    def __init__(self, default, sections=None):
+        self.default = default
+        self.sections = sections or {}
+
+    @classmethod
+    def from_config(cls, config):
+        sections = {
+            name: Tariff.from_config({**config, **override})
+            for name, override in config.get("sections", {}).items()
+        }
+        return cls(Tariff.from_config(config), sections)
+
+    def for_section(self, section):
+        return self.sections.get(section, self.default)
+
+    def price_session(self, record, now=None):
+        """Fare of one ParkingRecord (open sessions priced up to `now`)."""
+        end = record.exit_time or now or timezone.now()
+        minutes = (end - record.entry_time).total_seconds() / 60
+        return self.for_section(record.section).price(minutes)
+
+    def price_durations(self, minutes, sections):
+        """Vectorised fares for parallel arrays of minutes and section names."""
+        minutes = np.asarray(minutes, dtype=float)
+        sections = np.asarray(sections, dtype=object)
+        fares = self.default.price_minutes(minutes)
+        for name, tariff in self.sections.items():
+            mask = sections == name
+            if mask.any():
+                fares[mask] = tariff.price_minutes(minutes[mask])
+        return round_fares(fares)
+
+    def durations(self, queryset, now=None):
+        """
+        (ids, minutes, sections) arrays for a ParkingRecord queryset, one
+        query; the database computes the durations. Querysets already
+        projected to PRICE_FIELDS rows (such as archive.sessions(
+        fields=PRICE_FIELDS, annotate=price_annotations(now))) are used as
+        they are.
+        """
+        if not (queryset.query.combinator or queryset.query.values_select):
+            queryset = queryset.annotate(**price_annotations(now)).values_list(*PRICE_FIELDS)
+        rows = list(queryset)
+        ids, durations, sections = zip(*rows) if rows else ((), (), ())
+        seconds = np.array(durations, dtype="timedelta64[us]").astype(np.int64) / 1e6
+        return np.array(ids, dtype=np.int64), seconds / 60, np.array(sections, dtype=object)
+
+    def price_queryset(self, queryset, now=None):
+        """{record id: Decimal fare} for every record in the queryset."""
+        ids, minutes, sections = self.durations(queryset, now)
+        fares = self.price_durations(minutes, sections)
+        return {int(pk): to_amount(f) for pk, f in zip(ids, fares)}
+
+    def report(self, queryset, now=None):
+        """Sessions, minutes and fares per section (None: no section)."""
+        ids, minutes, sections = self.durations(queryset, now)
+        fares = self.price_durations(minutes, sections)
+        keys = np.array([s or "" for s in sections])
+        names, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(names))
+        total_minutes = np.bincount(inverse, weights=minutes, minlength=len(names))
+        total_fares = np.bincount(inverse, weights=fares, minlength=len(names))
+        return {
+            (name or None): {
+                "sessions": int(n),
+                "minutes": round(float(m), 1),
+                "amount": to_amount(round(float(f), 2)),
+            }
+            for name, n, m, f in zip(names, counts, total_minutes, total_fares)
+        }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The engine for settings.TARIFF, built once."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TariffEngine.from_config(settings.TARIFF)
+        return _engine
+
+
+def reset_engine():
+    global _engine
+    with _engine_lock:
+        _engine = None
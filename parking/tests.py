@@ -1,3 +1,1282 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.urls import reverse
+from django.utils import timezone
+
+from detectors import backends, metrics, registry, tiling
+from detectors.alpr import localize_plates
+from detectors.inference_server import InferenceServer
+from detectors.motion import MotionGate
+from detectors.tracker import PlateVoter, VehicleTracker, confirmed_plates
+from parking import archive, counters, dbbench, payments
+from parking.events import (EventWriter, apply_events, entry_event, event_from_dict, exit_event,
+                            slot_event)
+from parking.gateway import get_gateway, reset_gateway
+from parking.models import (ArchivedParkingRecord, Camera, ParkingRecord, ParkingSlot, Payment,
+                            PaymentEvent)
+from parking.pipelines import EntrancePipeline, SectionPipeline
+from parking.preview import PreviewHub, start_preview_server
+from parking.plates import FuzzyPlateIndex
+from parking.replay import replay_clip
+from parking.sessions import OpenSessionIndex
+from parking.slots import FREE, OCCUPIED, SlotMap, SlotStates, TTLCache
+from parking.supervisor import Supervisor
+from parking.tariff import PRICE_FIELDS, Tariff, TariffEngine, price_annotations
+
+
+# Wall-clock checks depend on the machine; run them with PARKING_BENCHMARKS=1
+benchmark = lambda test: tag("benchmark")(unittest.skipUnless(
+    os.environ.get("PARKING_BENCHMARKS") == "1", "set PARKING_BENCHMARKS=1 to run timing checks")(test))
+
+
+class PlateVotingTests(SimpleTestCase):
+    def test_character_vote_overrules_single_misreads(self):
+        voter = PlateVoter(required=3)
+        for read in ["KA01AB1234", "KA01A81234", "KAO1AB1234", "KA01AB1234"]:
+            plate = voter.add(read)
+        self.assertEqual(plate, "KA01AB1234")
+
+    def test_not_confirmed_until_enough_reads(self):
+        voter = PlateVoter(required=3)
+        self.assertIsNone(voter.add("KA01AB1234"))
+        self.assertIsNone(voter.add("KA01AB1234"))
+        self.assertEqual(voter.add("KA01AB1234"), "KA01AB1234")
+
+    def test_ocr_stops_once_track_is_confirmed(self):
+        tracker = VehicleTracker(required_votes=2)
+        calls = []
+
+        def read(crop):
+            calls.append(1)
+            return "ka01ab1234 "
+
+        box = (10, 10, 110, 60, "car", 0.9)
+        confirmed = []
+        for _ in range(5):
+            confirmed += confirmed_plates(tracker, _Frame(), [box], read)
+
+        self.assertEqual([p for _, p in confirmed], ["KA01AB1234"])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(tracker.tracks), 1)
+
+    def test_track_dropped_after_leaving(self):
+        tracker = VehicleTracker(max_missed=2)
+        tracker.update([(0, 0, 50, 50)])
+        for _ in range(3):
+            tracker.update([])
+        self.assertEqual(tracker.tracks, {})
+
+
+class _Frame:
+    # Slicing stand-in for a numpy frame
+    def __getitem__(self, key):
+        return self
+
+
+class SlotMapTests(SimpleTestCase):
+    def setUp(self):
+        self.slots = SlotMap({
+            "SlotA": [(100, 100), (200, 100), (200, 200), (100, 200)],
+            "SlotB": [(300, 100), (400, 100), (400, 200), (300, 200)],
+        })
+
+    def test_centroid_lookup(self):
+        boxes = [(120, 120, 180, 180), (310, 110, 390, 190), (0, 0, 10, 10)]
+        self.assertEqual(self.slots.slots_for_boxes(boxes, (480, 640)),
+                         ["SlotA", "SlotB", None])
+
+    def test_points_outside_frame(self):
+        idx = self.slots.slot_indices([(-5, 150), (150, 5000)], (480, 640))
+        self.assertEqual(list(idx), [-1, -1])
+
+
+class EventBatchTests(TestCase):
+    def test_batch_is_applied_in_order(self):
+        quiet = lambda msg: None
+        index = OpenSessionIndex()
+        apply_events([
+            entry_event("KA01AB1234"),
+            entry_event("KA01AB1234"),
+            slot_event("KA01AB1234", "Section A", "SlotA"),
+            entry_event("MH12XY9999"),
+        ], log=quiet, index=index)
+        apply_events([exit_event("MH12XY9999"), exit_event("UNKNOWN")], log=quiet, index=index)
+
+        rec = ParkingRecord.objects.get(plate="KA01AB1234")
+        self.assertEqual((rec.section, rec.slot, rec.exit_time), ("Section A", "SlotA", None))
+        self.assertIsNotNone(ParkingRecord.objects.get(plate="MH12XY9999").exit_time)
+        self.assertEqual(ParkingRecord.objects.count(), 2)
+
+        self.assertEqual(index.plates(), ["KA01AB1234"])
+        self.assertEqual(index.get("KA01AB1234").slot, "SlotA")
+
+    def test_rows_changed_by_another_process_are_not_overwritten(self):
+        quiet = lambda msg: None
+        index = OpenSessionIndex()
+        apply_events([entry_event("KA01AB1234"), entry_event("MH12XY9999")], log=quiet, index=index)
+
+        # Another process (the kiosk) closes one session and (a section
+        # camera) slots the other; this process's index sees neither
+        ParkingRecord.objects.filter(plate="KA01AB1234").update(exit_time=timezone.now())
+        ParkingRecord.objects.filter(plate="MH12XY9999").update(section="Section B", slot="SlotB")
+
+        apply_events([slot_event("KA01AB1234", "Section A", "SlotA")], log=quiet, index=index)
+        self.assertIsNotNone(ParkingRecord.objects.get(plate="KA01AB1234").exit_time)
+        self.assertNotIn("KA01AB1234", index)
+
+        # The car's next visit is a new session, not "already logged"
+        apply_events([entry_event("KA01AB1234")], log=quiet, index=index)
+        self.assertEqual(ParkingRecord.objects.filter(plate="KA01AB1234").count(), 2)
+
+        apply_events([exit_event("MH12XY9999")], log=quiet, index=index)
+        rec = ParkingRecord.objects.get(plate="MH12XY9999")
+        self.assertIsNotNone(rec.exit_time)
+        self.assertEqual((rec.section, rec.slot), ("Section B", "SlotB"))
+
+
+class EventWriterTests(TransactionTestCase):
+    # The writer resets broken connections, which a TestCase transaction cannot survive
+    def test_failed_batch_is_retried_and_bad_events_dead_lettered(self):
+        import tempfile
+        from unittest import mock
+
+        from parking import events as events_module
+
+        real = events_module.apply_events
+
+        def flaky(batch, **kwargs):
+            if any(e.plate == "BAD" for e in batch):
+                raise RuntimeError("boom")
+            return real(batch, **kwargs)
+
+        path = os.path.join(tempfile.mkdtemp(), "dead.jsonl")
+        writer = EventWriter(retries=2, retry_delay=0, dead_letter_path=path, log=lambda msg: None)
+        with mock.patch.object(events_module, "apply_events", flaky):
+            writer._flush([entry_event("KA01AB1234"), entry_event("BAD"), entry_event("MH12XY9999")])
+
+        self.assertEqual(ParkingRecord.objects.count(), 2)
+        stats = writer.stats()
+        self.assertEqual((stats["retried"], stats["failed"], stats["dead_lettered"]), (2, 1, 1))
+        with open(path) as f:
+            self.assertEqual(event_from_dict(json.loads(f.read())).plate, "BAD")
+
+
+class OpenSessionIndexTests(TestCase):
+    def test_warm_and_cold_lookup(self):
+        ParkingRecord.objects.create(plate="KA01AB1234")
+        ParkingRecord.objects.create(plate="OLD1234", exit_time=timezone.now())
+        index = OpenSessionIndex()
+        self.assertEqual(index.warm(), 1)
+        self.assertIn("KA01AB1234", index)
+        self.assertNotIn("OLD1234", index)
+
+        # Opened by another process after warm-up: found via the DB fallback
+        rec = ParkingRecord.objects.create(plate="MH12XY9999")
+        self.assertIsNone(index.get("MH12XY9999"))
+        self.assertEqual(index.lookup("MH12XY9999").record_id, rec.pk)
+
+    def test_fuzzy_match_sees_sessions_opened_elsewhere(self):
+        index = OpenSessionIndex()
+        index.warm()
+        # Entered through another process after warm-up, then misread (8/B)
+        rec = ParkingRecord.objects.create(plate="KA01AB1234")
+        self.assertEqual(index.match("KA01A81234"), "KA01AB1234")
+        self.assertEqual(index.get("KA01AB1234").record_id, rec.pk)
+
+    def test_fuzzy_match_skips_sessions_closed_elsewhere(self):
+        rec = ParkingRecord.objects.create(plate="KA01AB1234")
+        index = OpenSessionIndex()
+        index.warm()
+        # Closed by the kiosk: this index never saw the exit event
+        ParkingRecord.objects.filter(pk=rec.pk).update(exit_time=timezone.now())
+        self.assertIsNone(index.match("KA01A81234"))
+        self.assertNotIn("KA01AB1234", index)
+
+
+class FuzzyPlateTests(SimpleTestCase):
+    def test_confusables_and_single_edit(self):
+        index = FuzzyPlateIndex()
+        for plate in ["KA01AB1234", "MH12XY9999", "DL3CAF0001"]:
+            index.add(plate)
+        self.assertEqual(index.best("KAO1A81234"), "KA01AB1234")
+        self.assertEqual(index.best("MH12XY999"), "MH12XY9999")
+        self.assertEqual(index.best("DL3CAF0002"), "DL3CAF0001")
+        self.assertIsNone(index.best("TN09ZZ1111"))
+
+    def test_ambiguous_match_is_rejected(self):
+        index = FuzzyPlateIndex()
+        index.add("KA01AB1234")
+        index.add("KA01AB1235")
+        self.assertIsNone(index.best("KA01AB1236"))
+        index.remove("KA01AB1235")
+        self.assertEqual(index.best("KA01AB1236"), "KA01AB1234")
+
+    def _many_plates(self, n=30000):
+        rng = random.Random(7)
+        letters = lambda k: "".join(rng.choice(string.ascii_uppercase) for _ in range(k))
+        plates = [f"{letters(2)}{rng.randint(0, 99):02d}{letters(2)}{rng.randint(0, 9999):04d}"
+                  for _ in range(n)]
+        index = FuzzyPlateIndex()
+        for plate in plates:
+            index.add(plate)
+        return plates, index
+
+    def test_lookup_checks_few_candidates_with_many_plates(self):
+        plates, index = self._many_plates()
+
+        # The symmetric-delete index only verifies a handful of candidates
+        # per query, however many plates it holds
+        from unittest import mock
+
+        from parking import plates as plates_module
+
+        with mock.patch.object(plates_module, "edit_distance", wraps=plates_module.edit_distance) as verify:
+            for plate in plates[:500]:
+                index.best(plate[:-1] + "X")
+        self.assertLess(verify.call_count / 500, 5)
+
+    @benchmark
+    def test_lookup_time_with_many_plates(self):
+        plates, index = self._many_plates()
+
+        start = time.perf_counter()
+        for plate in plates[:500]:
+            index.best(plate[:-1] + "X")
+        per_lookup = (time.perf_counter() - start) / 500
+        self.assertLess(per_lookup, 0.001)
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counters_follow_session_events(self):
+        index = OpenSessionIndex()
+        quiet = lambda msg: None
+        apply_events([entry_event("KA01AB1234"), entry_event("MH12XY9999")], log=quiet, index=index)
+        apply_events([slot_event("KA01AB1234", "Section A", "SlotA"),
+                      slot_event("MH12XY9999", "Section A", "SlotB")], log=quiet, index=index)
+        apply_events([exit_event("MH12XY9999")], log=quiet, index=index)
+
+        data = counters.snapshot()
+        self.assertEqual(data["inside"], 1)
+        self.assertEqual(data["occupied"], {"Section A": 1})
+
+        # Incremental counters agree with a full recount
+        counters.rebuild()
+        self.assertEqual(counters.snapshot()["inside"], 1)
+        self.assertEqual(counters.snapshot()["occupied"], {"Section A": 1})
+
+    def test_dashboard_data_is_cached(self):
+        counters.bump({counters.INSIDE: 3})
+        with self.assertNumQueries(2):
+            self.client.get(reverse("parking:dashboard_data"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("parking:dashboard_data"))
+        self.assertEqual(response.json()["inside"], 3)
+
+    @override_settings(DASHBOARD_STREAM_INTERVAL=0.01, DASHBOARD_STREAM_WSGI_SECONDS=0.05)
+    def test_stream_ends_under_wsgi(self):
+        counters.bump({counters.INSIDE: 2})
+        response = self.client.get(reverse("parking:dashboard_stream"))
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("retry: 10\n\n"))
+        self.assertIn('"inside": 2', body)
+
+    def test_kiosk_counts_the_slot_the_row_holds(self):
+        from parking.views import close_at_kiosk
+
+        apply_events([entry_event("KA01AB1234")], log=lambda msg: None, index=OpenSessionIndex())
+        rec = ParkingRecord.objects.get(plate="KA01AB1234")
+        # Slotted by a section camera after the kiosk loaded the record
+        apply_events([slot_event("KA01AB1234", "Section A", "SlotA")],
+                     log=lambda msg: None, index=OpenSessionIndex())
+        close_at_kiosk(rec)
+        self.assertEqual(counters.snapshot()["occupied"], {"Section A": 0})
+
+
+class TariffTests(TestCase):
+    def setUp(self):
+        # 30/h first hour, 20/h up to 3h, 10/h after; 5 min grace; 200/day cap
+        self.tariff = Tariff(bands=[(60, 30), (180, 20), (None, 10)], grace_minutes=5, daily_cap=200)
+        self.engine = TariffEngine(self.tariff, {"VIP": Tariff(bands=[(None, 60)])})
+
+    def test_bands_grace_and_cap(self):
+        price = self.tariff.price
+        self.assertEqual(price(4), Decimal("0.00"))
+        self.assertEqual(price(30), Decimal("15.00"))
+        self.assertEqual(price(120), Decimal("50.00"))
+        self.assertEqual(price(240), Decimal("80.00"))
+        self.assertEqual(price(23 * 60), Decimal("200.00"))          # capped
+        self.assertEqual(price(24 * 60 + 60), Decimal("230.00"))     # a day + 1h
+
+    def test_queryset_matches_single_sessions(self):
+        now = timezone.now()
+        for minutes, section in [(3, None), (45, "A"), (200, "A"), (90, "VIP"), (3000, None)]:
+            ParkingRecord.objects.create(plate=f"KA{minutes}", section=section,
+                                         entry_time=now - timedelta(minutes=minutes), exit_time=now)
+        ParkingRecord.objects.create(plate="OPEN1", entry_time=now - timedelta(minutes=60))
+
+        with self.assertNumQueries(1):
+            fares = self.engine.price_queryset(ParkingRecord.objects.all(), now=now)
+        for rec in ParkingRecord.objects.all():
+            self.assertEqual(fares[rec.pk], self.engine.price_session(rec, now=now))
+        self.assertEqual(fares[ParkingRecord.objects.get(plate="KA90").pk], Decimal("90.00"))
+
+        report = self.engine.report(ParkingRecord.objects.all(), now=now)
+        self.assertEqual(report["A"]["sessions"], 2)
+        self.assertEqual(report["A"]["amount"], Decimal("22.50") + Decimal("73.33"))
+
+    def test_both_paths_round_half_up(self):
+        # 0.75 min at 10/h is 0.125: half-up gives 0.13 (np.round gave 0.12)
+        engine = TariffEngine(Tariff())
+        now = timezone.now()
+        rec = ParkingRecord.objects.create(plate="KA45S", entry_time=now - timedelta(seconds=45), exit_time=now)
+        self.assertEqual(engine.price_session(rec), Decimal("0.13"))
+        self.assertEqual(engine.price_queryset(ParkingRecord.objects.all())[rec.pk], Decimal("0.13"))
+        self.assertEqual(engine.report(ParkingRecord.objects.all())[None]["amount"], Decimal("0.13"))
+
+    @benchmark
+    def test_month_of_sessions_reports_quickly(self):
+        now = timezone.now()
+        rng = np.random.default_rng(1)
+        sections = ["A", "B", "VIP", None]
+        ParkingRecord.objects.bulk_create([
+            ParkingRecord(plate=f"KA{i:06d}", section=sections[i % 4],
+                          entry_time=now - timedelta(minutes=float(m)), exit_time=now)
+            for i, m in enumerate(rng.uniform(0, 600, 20_000))
+        ], batch_size=2000)
+
+        # Query, durations and pricing together
+        start = time.perf_counter()
+        report = self.engine.report(ParkingRecord.objects.all(), now=now)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(sum(row["sessions"] for row in report.values()), 20_000)
+        self.assertLess(elapsed, 0.5)
+
+
+class ArchiveTests(TestCase):
+    def test_old_paid_sessions_move_and_reports_still_see_them(self):
+        now = timezone.now()
+        old = now - timedelta(days=100)
+        paid = ParkingRecord.objects.create(plate="OLD1", entry_time=old, exit_time=old + timedelta(hours=2),
+                                            section="A", paid=True)
+        Payment.objects.create(parking_record=paid, method="UPI", status="SUCCESS", amount=20)
+        ParkingRecord.objects.create(plate="UNPAID1", entry_time=old, exit_time=old + timedelta(hours=1))
+        ParkingRecord.objects.create(plate="NEW1", entry_time=now - timedelta(hours=1), exit_time=now, paid=True)
+        ParkingRecord.objects.create(plate="OPEN1", entry_time=now)
+
+        moved = archive.archive_sessions(before=now - timedelta(days=90), batch_size=1, log=lambda msg: None)
+        self.assertEqual(moved, 1)
+        self.assertFalse(ParkingRecord.objects.filter(plate="OLD1").exists())
+        self.assertFalse(Payment.objects.exists())
+        row = ArchivedParkingRecord.objects.get(pk=paid.pk)
+        self.assertEqual((row.payment_amount, row.payment_status), (Decimal("20.00"), "SUCCESS"))
+        self.assertEqual(row.month, timezone.localtime(row.exit_time).date().replace(day=1))
+
+        plates = {r[1] for r in archive.sessions()}
+        self.assertEqual(plates, {"OLD1", "UNPAID1", "NEW1", "OPEN1"})
+        self.assertEqual({r[1] for r in archive.sessions(since=now - timedelta(days=1), closed=True)}, {"NEW1"})
+
+        engine = TariffEngine(Tariff())
+        report = engine.report(archive.sessions(section="A", fields=PRICE_FIELDS,
+                                                annotate=price_annotations(now)))
+        self.assertEqual(report["A"]["amount"], Decimal("20.00"))
+
+    def test_id_clash_keeps_the_hot_session(self):
+        old = timezone.now() - timedelta(days=100)
+        rec = ParkingRecord.objects.create(plate="OLD2", entry_time=old, exit_time=old + timedelta(hours=1), paid=True)
+        ArchivedParkingRecord.objects.create(id=rec.pk, plate="OTHER", entry_time=old, exit_time=old,
+                                             month=old.date().replace(day=1))
+
+        with self.assertRaises(IntegrityError):
+            archive.archive_sessions(before=old + timedelta(days=1), log=lambda msg: None)
+        self.assertTrue(ParkingRecord.objects.filter(pk=rec.pk).exists())
+        self.assertEqual(ArchivedParkingRecord.objects.get(pk=rec.pk).plate, "OTHER")
+
+
+class PaymentAdminTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        cache.clear()
+
+    def test_mark_success_is_one_update_per_table(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        payments = [
+            Payment.objects.create(parking_record=ParkingRecord.objects.create(plate=f"CASH{i}"),
+                                   method="CASH", amount=10)
+            for i in range(25)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse("admin:parking_payment_changelist"), {
+                "action": "mark_success",
+                "_selected_action": [p.pk for p in payments],
+            })
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len([q for q in updates if '"parking_payment"' in q]), 1)
+        self.assertEqual(len([q for q in updates if '"parking_parkingrecord"' in q]), 1)
+        self.assertFalse(Payment.objects.exclude(status="SUCCESS").exists())
+        self.assertFalse(ParkingRecord.objects.filter(paid=False).exists())
+        self.assertEqual(counters.snapshot()["revenue_today"], "250.00")
+
+    def test_mark_success_skips_payments_already_settled(self):
+        pending = Payment.objects.create(parking_record=ParkingRecord.objects.create(plate="CASH1"),
+                                         method="CASH", amount=10)
+        # Settled by the reconciler (and counted there) before the click
+        settled = Payment.objects.create(parking_record=ParkingRecord.objects.create(plate="UPI1", paid=True),
+                                         method="UPI", amount=30, status="SUCCESS")
+        stamped = settled.updated_at
+        self.client.post(reverse("admin:parking_payment_changelist"), {
+            "action": "mark_success",
+            "_selected_action": [pending.pk, settled.pk],
+        })
+        self.assertEqual(Payment.objects.get(pk=pending.pk).status, "SUCCESS")
+        self.assertEqual(Payment.objects.get(pk=settled.pk).updated_at, stamped)
+        self.assertEqual(counters.snapshot()["revenue_today"], "10.00")
+
+    def test_filtered_listings_render(self):
+        ParkingRecord.objects.create(plate="KA01AB1234", section="A")
+        response = self.client.get(reverse("admin:parking_parkingrecord_changelist"),
+                                   {"paid__exact": "0", "section": "A", "q": "KA01"})
+        self.assertContains(response, "KA01AB1234")
+        response = self.client.get(reverse("admin:parking_payment_changelist"), {"method__exact": "CASH"})
+        self.assertEqual(response.status_code, 200)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser("admin", "a@example.com", "pw"))
+        now = timezone.now()
+        for i, section in enumerate(["A", "A", "B"]):
+            rec = ParkingRecord.objects.create(plate=f"KA0{i}", section=section, exit_time=now, paid=True,
+                                               entry_time=now - timedelta(hours=1))
+            Payment.objects.create(parking_record=rec, method="UPI", status="SUCCESS", amount=10)
+        ParkingRecord.objects.create(plate="OLD", section="A", entry_time=now - timedelta(days=400))
+
+    def _get(self, path, **params):
+        response = self.client.get(reverse("parking:export", kwargs=path), params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_and_json_filtered_by_section_and_date(self):
+        import csv as csvmodule
+        today = timezone.localdate().isoformat()
+        body = self._get({"kind": "sessions", "fmt": "csv"}, section="A", since=today, until=today)
+        rows = list(csvmodule.DictReader(body.splitlines()))
+        self.assertEqual(sorted(r["plate"] for r in rows), ["KA00", "KA01"])
+
+        body = self._get({"kind": "payments", "fmt": "json"}, section="B")
+        data = json.loads(body)
+        self.assertEqual([(d["plate"], d["amount"]) for d in data], [("KA02", "10.00")])
+
+    def test_asgi_export_streams_asynchronously(self):
+        from asgiref.sync import async_to_sync
+        from django.contrib.auth.models import User
+        from django.test import AsyncRequestFactory
+
+        from parking.views import export_data
+
+        request = AsyncRequestFactory().get("/export/sessions.csv", {"section": "A"})
+        request.user = User.objects.get(username="admin")
+        response = export_data(request, "sessions", "csv")
+        self.assertTrue(response.is_async)
+
+        async def collect():
+            return b"".join([chunk async for chunk in response.streaming_content])
+        body = async_to_sync(collect)().decode()
+        self.assertEqual(sorted(line.split(",")[1] for line in body.splitlines()[1:]), ["KA00", "KA01", "OLD"])
+
+    def test_export_needs_staff_and_valid_dates(self):
+        response = self.client.get(reverse("parking:export", kwargs={"kind": "sessions", "fmt": "csv"}),
+                                   {"since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        self.client.logout()
+        response = self.client.get(reverse("parking:export", kwargs={"kind": "sessions", "fmt": "csv"}))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(PAYMENT_GATEWAY="parking.gateway.FakeGateway", UPI_ID="lot@upi")
+class ExitKioskTests(TransactionTestCase):
+    def setUp(self):
+        reset_gateway()
+        cache.clear()
+        self.rec = ParkingRecord.objects.create(
+            plate="KA01AB1234", entry_time=timezone.now() - timedelta(hours=2)
+        )
+
+    def tearDown(self):
+        reset_gateway()
+
+    def test_order_created_once_per_payment(self):
+        url = reverse("parking:exit_kiosk", args=[self.rec.pk])
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+
+        payment = Payment.objects.get(parking_record=self.rec)
+        self.assertEqual(len(get_gateway().orders), 1)
+        self.assertIn(payment.razorpay_order_id, get_gateway().orders)
+        # Closed on the first visit only; the refresh reuses the exit time
+        self.rec.refresh_from_db()
+        self.assertEqual(second.context["record"].exit_time, self.rec.exit_time)
+
+    def test_qr_served_from_memory(self):
+        self.client.get(reverse("parking:exit_kiosk", args=[self.rec.pk]))
+        response = self.client.get(reverse("parking:kiosk_qr", args=[self.rec.pk]))
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+
+    @override_settings(PAYMENT_GATEWAY_TIMEOUT=0.05)
+    async def test_slow_gateway_does_not_block_kiosk(self):
+        get_gateway().delay = 0.5
+        start = time.perf_counter()
+        response = await self.async_client.get(reverse("parking:exit_kiosk", args=[self.rec.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - start, 0.4)
+        self.assertIsNone(response.context["order"])
+
+    @override_settings(PAYMENT_GATEWAY_TIMEOUT=0.05)
+    async def test_refresh_during_slow_order_creates_no_second_order(self):
+        get_gateway().delay = 0.5
+        url = reverse("parking:exit_kiosk", args=[self.rec.pk])
+        for _ in range(3):
+            response = await self.async_client.get(url)
+            self.assertIsNone(response.context["order"])
+        # The first call finishes in the background and stores its order
+        await asyncio.sleep(0.8)
+        self.assertEqual(len(get_gateway().orders), 1)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.context["order"]["id"], next(iter(get_gateway().orders)))
+
+
+@override_settings(PAYMENT_GATEWAY="parking.gateway.FakeGateway", RAZORPAY_WEBHOOK_SECRET="whsec_test")
+class PaymentWebhookTests(TestCase):
+    def setUp(self):
+        reset_gateway()
+        cache.clear()
+        self.gateway = get_gateway()
+        self.url = reverse("parking:payment_webhook")
+        self.quiet = lambda msg: None
+
+    def tearDown(self):
+        reset_gateway()
+
+    def _payment(self, plate, amount="20.00"):
+        rec = ParkingRecord.objects.create(plate=plate, exit_time=timezone.now())
+        order = self.gateway.create_order(int(Decimal(amount) * 100), f"recpt_{rec.pk}")
+        return Payment.objects.create(parking_record=rec, method="UPI", amount=Decimal(amount),
+                                      razorpay_order_id=order["id"])
+
+    def _post(self, body, headers):
+        return self.client.post(self.url, body, content_type="application/json", **headers)
+
+    def test_burst_of_callbacks_is_queued_then_applied_in_batches(self):
+        orders = [self._payment(f"KA01AB{i:04d}").razorpay_order_id for i in range(40)]
+        failed = self._payment("MH12XY9999").razorpay_order_id
+        for order_id in orders:
+            self.gateway.pay(order_id)
+            with self.assertNumQueries(1):
+                self.assertEqual(self._post(*self.gateway.webhook(order_id)).status_code, 200)
+        # Gateway retry of a delivered callback, and a failed payment
+        self._post(*self.gateway.webhook(orders[0]))
+        self._post(*self.gateway.webhook(failed, event="payment.failed"))
+        self.assertFalse(Payment.objects.filter(status="SUCCESS").exists())
+        self.assertEqual(PaymentEvent.objects.count(), 41)
+
+        totals = payments.reconcile(batch_size=25, log=self.quiet)
+        self.assertEqual(totals, {"events": 41, "paid": 40, "failed": 1})
+        self.assertEqual(ParkingRecord.objects.filter(paid=True).count(), 40)
+        self.assertEqual(Payment.objects.get(razorpay_order_id=failed).status, "FAILED")
+        self.assertEqual(counters.snapshot()["revenue_today"], "800.00")
+        # Nothing left: a second run does no writes
+        with self.assertNumQueries(1):
+            payments.reconcile(log=self.quiet)
+
+    def test_bad_signature_is_rejected(self):
+        order_id = self._payment("KA01AB1234").razorpay_order_id
+        body, headers = self.gateway.webhook(order_id, secret="not-the-secret")
+        self.assertEqual(self._post(body, headers).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_malformed_callbacks_are_rejected(self):
+        import hashlib
+        import hmac
+
+        def signed(entity, event_id="evt_1"):
+            body = json.dumps({"event": "payment.captured", "payload": {"payment": {"entity": entity}}}).encode()
+            signature = hmac.new(b"whsec_test", body, hashlib.sha256).hexdigest()
+            return body, {"HTTP_X_RAZORPAY_SIGNATURE": signature, "HTTP_X_RAZORPAY_EVENT_ID": event_id}
+
+        body, headers = signed({"order_id": "order_1", "amount": 2000})
+        cases = {
+            "non-ASCII signature": (body, dict(headers, HTTP_X_RAZORPAY_SIGNATURE="é" * 64)),
+            "bad amount": signed({"order_id": "order_1", "amount": "twenty"}),
+            "long event id": signed({"order_id": "order_1", "amount": 2000}, event_id="e" * 81),
+            "long order id": signed({"order_id": "o" * 41, "amount": 2000}),
+        }
+        for name, (body, headers) in cases.items():
+            with self.subTest(name):
+                self.assertEqual(self._post(body, headers).status_code, 400)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_sweep_settles_orders_without_callback(self):
+        paid = self._payment("KA01AB1234")
+        unpaid = self._payment("MH12XY9999")
+        Payment.objects.update(created_at=timezone.now() - timedelta(minutes=30))
+        self.gateway.pay(paid.razorpay_order_id)
+
+        totals = payments.sweep(after=600, log=self.quiet)
+        self.assertEqual(totals["paid"], 1)
+        self.assertEqual(Payment.objects.get(pk=paid.pk).status, "SUCCESS")
+        self.assertEqual(Payment.objects.get(pk=unpaid.pk).status, "PENDING")
+        self.assertTrue(ParkingRecord.objects.get(pk=paid.parking_record_id).paid)
+
+    def test_old_applied_events_are_pruned(self):
+        order_id = self._payment("KA01AB1234").razorpay_order_id
+        self.gateway.pay(order_id)
+        self._post(*self.gateway.webhook(order_id))
+        payments.reconcile(log=self.quiet)
+        PaymentEvent.objects.update(processed_at=timezone.now() - timedelta(days=31))
+        PaymentEvent.objects.create(event_id="pending", order_id="order_x", status="SUCCESS")
+
+        self.assertEqual(payments.prune(days=30, log=self.quiet), 1)
+        self.assertEqual(list(PaymentEvent.objects.values_list("event_id", flat=True)), ["pending"])
+
+        # A late gateway retry of the pruned event changes nothing
+        self._post(*self.gateway.webhook(order_id))
+        self.assertEqual(payments.reconcile(log=self.quiet)["paid"], 0)
+        self.assertEqual(counters.snapshot()["revenue_today"], "20.00")
+
+
+class ReplayTests(TestCase):
+    """Headless replay with stand-in detectors: exercises the real pipelines."""
+
+    def setUp(self):
+        cache.clear()
+        self.frames = [np.zeros((240, 320, 3), np.uint8) for _ in range(12)]
+        self.detect = lambda frame: [(120, 120, 180, 180, "car", 0.9)]
+        self.read = lambda crop: "KA01AB1234"
+        self.quiet = lambda msg: None
+
+    def test_entrance_replay_reports_stages_and_accuracy(self):
+        report = replay_clip(
+            "entrance", self.frames,
+            lambda writer, sessions, timer: EntrancePipeline(
+                "replay", detect=self.detect, read_plate=self.read, writer=writer,
+                sessions=sessions, timer=timer, log=self.quiet),
+            {"plates": ["KA01AB1234"]},
+        )
+        self.assertEqual(report["processed"], 12)
+        self.assertEqual(set(report["stages"]),
+                         {"decode", "frame", "motion", "detect", "ocr", "db"})
+        # Voting: three OCR reads, then none for the rest of the track
+        self.assertEqual(report["stages"]["ocr"]["count"], 3)
+        # Static frames after the plate is confirmed never reach the detector
+        self.assertEqual(report["stages"]["detect"]["count"], 3)
+        self.assertEqual(report["accuracy"]["recall"], 1.0)
+        self.assertEqual(ParkingRecord.objects.filter(plate="KA01AB1234").count(), 1)
+
+    @override_settings(SLOT_ARRIVE_SECONDS=0)
+    def test_section_replay_scores_slots(self):
+        slot_map = SlotMap({"SlotA": [(100, 100), (200, 100), (200, 200), (100, 200)]})
+        ParkingRecord.objects.create(plate="KA01AB1234")
+        report = replay_clip(
+            "section", self.frames,
+            lambda writer, sessions, timer: SectionPipeline(
+                "replay", slot_map, "Section A", detect=self.detect, read_plate=self.read,
+                writer=writer, sessions=sessions, timer=timer, log=self.quiet, tiled=False),
+            {"slots": {"KA01AB1234": "SlotA"}},
+        )
+        self.assertEqual(report["accuracy"]["accuracy"], 1.0)
+        self.assertEqual(ParkingRecord.objects.get(plate="KA01AB1234").slot, "SlotA")
+
+
+class _ListWriter:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event):
+        self.events.append(event)
+
+
+class SlotTilingTests(TestCase):
+    def test_small_distant_slots_are_detected_on_native_crops(self):
+        # Two slots far apart in a 4K frame
+        slot_map = SlotMap({
+            "SlotA": [(400, 1600), (600, 1600), (600, 1800), (400, 1800)],
+            "SlotB": [(3000, 300), (3200, 300), (3200, 500), (3000, 500)],
+        })
+        frame = np.zeros((2160, 3840, 3), np.uint8)
+        tiles = slot_map.tiles(frame.shape, 640)
+        self.assertEqual(len(tiles), 2)
+        self.assertLess(tiling.coverage(tiles, frame.shape), 0.05)
+
+        seen = []
+
+        def detect_many(crops):
+            seen.extend(c.shape for c in crops)
+            # A car in the middle of every crop, in crop coordinates
+            return [[(c.shape[1] // 2 - 40, c.shape[0] // 2 - 40,
+                      c.shape[1] // 2 + 40, c.shape[0] // 2 + 40, "car", 0.9)] for c in crops]
+
+        ParkingRecord.objects.create(plate="KA01AB1234")
+        pipeline = SectionPipeline(
+            "tiles", slot_map, "Section A", detect=lambda f: [], detect_many=detect_many,
+            read_plate=lambda crop: "KA01AB1234", writer=_ListWriter(), sessions=OpenSessionIndex(),
+            motion=False, log=lambda msg: None, tiled=True,
+        )
+        dets = pipeline._detect(frame)
+        self.assertTrue(all(h <= 640 and w <= 640 for h, w, _ in seen))
+        self.assertEqual(slot_map.slots_for_boxes(dets, frame.shape), ["SlotA", "SlotB"])
+
+    def test_duplicates_from_overlapping_tiles_are_merged(self):
+        tiles = tiling.split((0, 0, 1000, 600), 640, overlap=0.2)
+        self.assertEqual(tiles, [(0, 0, 640, 600), (360, 0, 1000, 600)])
+        # The same car seen whole in one tile and cut off in the other
+        results = [[(400, 100, 600, 300, "car", 0.8)], [(40, 100, 240, 300, "car", 0.9)]]
+        merged = tiling.merge_detections(tiles, results)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0][:4], (400, 100, 600, 300))
+
+
+class SlotStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_flicker_is_debounced(self):
+        states = SlotStates(["SlotA"], arrive_seconds=2, leave_seconds=5)
+        # Seen for under two seconds, then gone: never occupied
+        self.assertEqual(states.update({"SlotA": None}, now=0), [])
+        self.assertEqual(states.update({}, now=1), [])
+        self.assertEqual(states.update({"SlotA": None}, now=10), [])
+        self.assertEqual(states.update({"SlotA": "KA01AB1234"}, now=12),
+                         [(OCCUPIED, "SlotA", "KA01AB1234")])
+        # Missed detections shorter than leave_seconds change nothing
+        for t in range(13, 30, 3):
+            self.assertEqual(states.update({} if t % 2 else {"SlotA": "KA01AB1234"}, now=t), [])
+        self.assertEqual(states.update({}, now=31), [])
+        self.assertEqual(states.update({}, now=36), [(FREE, "SlotA", "KA01AB1234")])
+        self.assertEqual(states.occupied(), set())
+
+    def test_plate_cache_is_bounded_and_expires(self):
+        now = [0]
+        announced = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        announced["A"], announced["B"], announced["C"] = 1, 2, 3
+        self.assertEqual((len(announced), announced.get("A")), (2, None))
+        now[0] = 11
+        self.assertNotIn("C", announced)
+
+    def test_only_transitions_are_written(self):
+        ParkingRecord.objects.create(plate="KA01AB1234")
+        clock = [0.0]
+        writer = _ListWriter()
+        slot_map = SlotMap({"SlotA": [(100, 100), (200, 100), (200, 200), (100, 200)]})
+        car = [(120, 120, 180, 180, "car", 0.9)]
+        pipeline = SectionPipeline(
+            "states", slot_map, "Section A", detect=lambda f: car if clock[0] < 30 else [],
+            read_plate=lambda crop: "KA01AB1234", writer=writer, sessions=OpenSessionIndex(),
+            motion=False, log=lambda msg: None, tiled=False,
+        )
+        pipeline.states.clock = lambda: clock[0]
+        frame = np.zeros((240, 320, 3), np.uint8)
+        while clock[0] < 60:
+            pipeline.process(frame)
+            clock[0] += 0.5
+        self.assertEqual([e.kind for e in writer.events], ["slot", "release"])
+
+        apply_events(writer.events, log=lambda msg: None, index=OpenSessionIndex())
+        rec = ParkingRecord.objects.get(plate="KA01AB1234")
+        self.assertEqual((rec.section, rec.slot), ("Section A", None))
+        self.assertEqual(counters.snapshot()["occupied"].get("Section A", 0), 0)
+
+    def test_car_moving_to_another_slot_ends_in_the_new_slot(self):
+        quiet = lambda msg: None
+        slot_map = SlotMap({
+            "SlotA": [(100, 100), (200, 100), (200, 200), (100, 200)],
+            "SlotB": [(300, 100), (400, 100), (400, 200), (300, 200)],
+        })
+        frame = np.zeros((240, 480, 3), np.uint8)
+        in_a, in_b = [(120, 120, 180, 180, "car", 0.9)], [(320, 120, 380, 180, "car", 0.9)]
+
+        class ApplyingWriter(_ListWriter):
+            # Written as they come, like a writer that keeps up
+            def __init__(self, index):
+                super().__init__()
+                self.index = index
+
+            def emit(self, event):
+                super().emit(event)
+                apply_events([event], log=quiet, index=self.index)
+
+        index = OpenSessionIndex()
+        for writer in (ApplyingWriter(index), _ListWriter()):
+            with self.subTest(writer=type(writer).__name__):
+                ParkingRecord.objects.all().delete()
+                ParkingRecord.objects.create(plate="KA01AB1234")
+                index.clear()
+                clock = [0.0]
+                # Parks in A, then moves to B: B is taken (2s) before A is free (5s)
+                pipeline = SectionPipeline(
+                    "moves", slot_map, "Section A", detect=lambda f: in_a if clock[0] < 20 else in_b,
+                    read_plate=lambda crop: "KA01AB1234", writer=writer, sessions=index,
+                    motion=False, log=quiet, tiled=False,
+                )
+                pipeline.states.clock = lambda: clock[0]
+                while clock[0] < 40:
+                    pipeline.process(frame)
+                    clock[0] += 0.5
+                self.assertEqual([(e.kind, e.slot) for e in writer.events],
+                                 [("slot", "SlotA"), ("release", "SlotA"), ("slot", "SlotB")])
+
+                if not isinstance(writer, ApplyingWriter):
+                    apply_events(writer.events, log=quiet, index=OpenSessionIndex())
+                self.assertEqual(ParkingRecord.objects.get(plate="KA01AB1234").slot, "SlotB")
+
+
+class InferenceServerTests(SimpleTestCase):
+    def _server(self, **kwargs):
+        self.batches = []
+
+        def detect_batch(frames):
+            self.batches.append(list(frames))
+            return [f"dets-{frame}" for frame in frames]
+        server = InferenceServer(detect_batch=detect_batch, **kwargs)
+        self.addCleanup(server.stop)
+        return server
+
+    def test_frames_are_batched_and_answered_in_order(self):
+        server = self._server(max_batch=4, max_wait=0.2)
+        # Queued before the worker starts, so the grouping is deterministic
+        futures = [server.submit(n, camera=f"cam{n % 2}") for n in range(6)]
+        server.start()
+        self.assertEqual([f.result(timeout=5) for f in futures], [f"dets-{n}" for n in range(6)])
+        self.assertEqual(self.batches, [[0, 1, 2, 3], [4, 5]])
+        self.assertEqual(server.detect_many([7, 8], camera="cam0", timeout=5), ["dets-7", "dets-8"])
+        self.assertEqual(server.stats()["frames"], 8)
+
+    def test_frames_without_a_result_fail(self):
+        server = InferenceServer(detect_batch=lambda frames: ["only one"], max_wait=0.2)
+        self.addCleanup(server.stop)
+        futures = [server.submit(n) for n in range(3)]
+        server.start()
+        self.assertEqual(futures[0].result(timeout=5), "only one")
+        with self.assertRaisesRegex(RuntimeError, "1 results for 3 frames"):
+            futures[2].result(timeout=5)
+
+    def test_stopped_server_is_replaced(self):
+        from functools import partial
+        from unittest import mock
+
+        from detectors import inference_server
+
+        fake = partial(InferenceServer, detect_batch=lambda frames: list(frames))
+        with mock.patch.object(inference_server, "InferenceServer", fake):
+            server = inference_server.get_server(config="test")
+            self.assertEqual(server.detect(1, timeout=5), 1)
+            server.stop()
+            # Fails at once instead of waiting for a result that never comes
+            with self.assertRaisesRegex(RuntimeError, "stopped"):
+                server.submit(2).result(timeout=0)
+            fresh = inference_server.get_server(config="test")
+            self.addCleanup(fresh.stop)
+        self.assertIsNot(fresh, server)
+        self.assertEqual(fresh.detect(3, timeout=5), 3)
+
+    @override_settings(YOLO_RESULT_TIMEOUT=0.05)
+    def test_stalled_inference_server_times_out(self):
+        from concurrent.futures import TimeoutError
+        from unittest import mock
+
+        from parking import pipelines
+
+        # Never started: frames are queued and never answered
+        stalled = InferenceServer(detect_batch=lambda frames: [])
+        with mock.patch.object(pipelines, "_server", return_value=stalled):
+            detect_many = pipelines.default_detector_many("tiles")
+        with self.assertRaises(TimeoutError):
+            detect_many([np.zeros((8, 8, 3), np.uint8)] * 3)
+
+
+class AlprTests(SimpleTestCase):
+    def setUp(self):
+        # A dark-on-white plate on a grey car
+        self.frame = np.full((480, 640, 3), 90, np.uint8)
+        cv2.rectangle(self.frame, (220, 300), (420, 350), (255, 255, 255), -1)
+        cv2.putText(self.frame, "KA01AB1234", (228, 337), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+
+    def test_plate_region_is_localized(self):
+        [(x1, y1, x2, y2)] = localize_plates(cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY))
+        # Around the text, inside the plate
+        self.assertTrue(200 <= x1 <= 235 and 400 <= x2 <= 430)
+        self.assertTrue(300 <= y1 <= 320 and 335 <= y2 <= 350)
+
+    @override_settings(OCR={"recognize_only": True})
+    def test_crop_strategy_recognizes_only_the_plate_crop(self):
+        from unittest import mock
+
+        from detectors import alpr
+
+        reader = mock.Mock()
+        reader.recognize.return_value = [(None, "KA01AB 1234", 0.9)]
+        with mock.patch.object(alpr, "get_model", return_value=reader):
+            plate = alpr.detect_and_read_plate(self.frame, strategy="crop")
+        self.assertEqual(plate, "KA01AB1234")
+        reader.readtext.assert_not_called()
+        [(crop,), _] = reader.recognize.call_args
+        self.assertEqual(crop.ndim, 2)
+        self.assertLessEqual(crop.shape[0], alpr.PLATE_HEIGHT)
+        self.assertLess(crop.size, self.frame.shape[0] * self.frame.shape[1] / 20)
+
+
+class CaptureTests(SimpleTestCase):
+    def test_closing_an_unopened_source_still_reports(self):
+        from detectors.capture import close_grabber, format_stats
+
+        stats = close_grabber("rtsp://not-open")
+        self.assertEqual(format_stats(stats),
+                         "[capture rtsp://not-open] read=0 processed=0 dropped=0 failures=0")
+
+    def test_slow_consumer_gets_the_newest_frame(self):
+        import tempfile
+
+        from detectors.capture import FrameGrabber
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "clip.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+        for i in range(20):
+            writer.write(np.full((48, 64, 3), i * 10, np.uint8))
+        writer.release()
+
+        grabber = FrameGrabber(path, buffer_size=1)
+        self.assertTrue(grabber.start())
+        # The consumer is busy while the whole clip is decoded
+        grabber._thread.join(timeout=5)
+        ok, frame = grabber.read(timeout=1)
+        self.assertTrue(ok)
+        self.assertAlmostEqual(frame.mean(), 190, delta=5)   # the last frame
+        self.assertEqual(grabber.read(timeout=0.1), (False, None))
+        self.assertEqual({k: grabber.stats()[k] for k in ("read", "processed", "dropped")},
+                         {"read": 20, "processed": 1, "dropped": 19})
+
+
+class MetricsTests(SimpleTestCase):
+    def test_histogram_and_prometheus_text(self):
+        hist = metrics.Histogram()
+        for seconds in (0.0005, 0.003, 0.003, 0.2):
+            hist.observe(seconds)
+        self.assertEqual(hist.count, 4)
+        self.assertEqual(hist.quantile(0.5), 0.005)
+
+        with metrics.timer("ocr", "test-cam"):
+            pass
+        text = metrics.render_prometheus()
+        self.assertIn('parking_stage_seconds_count{stage="ocr",camera="test-cam"}', text)
+        self.assertIn('le="+Inf"', text)
+
+    def test_timer_records_every_block(self):
+        hist = metrics.registry.histogram("overhead", "test-cam")
+        before = hist.count
+        for _ in range(1000):
+            with metrics.timer("overhead", "test-cam"):
+                pass
+        self.assertEqual(hist.count - before, 1000)
+        # An empty block lands in the lowest bucket
+        self.assertEqual(hist.quantile(0.5), metrics.BUCKETS[0])
+
+    @benchmark
+    def test_timer_overhead_is_small(self):
+        start = time.perf_counter()
+        for _ in range(10000):
+            with metrics.timer("overhead", "test-cam"):
+                pass
+        self.assertLess((time.perf_counter() - start) / 10000, 0.00005)
+
+
+class SupervisorTests(TransactionTestCase):
+    class FakeWorker:
+        def __init__(self, camera, gate, log=print, max_backoff=60):
+            self.camera = camera
+            self.alive = False
+
+        def start(self):
+            self.alive = True
+            return self
+
+        def stop(self, wait=True):
+            self.alive = False
+
+        def is_alive(self):
+            return self.alive
+
+    def test_reload_follows_camera_table(self):
+        supervisor = Supervisor(workers=2, log=lambda msg: None, worker_factory=self.FakeWorker)
+        entrance = Camera.objects.create(name="Entrance", source="0", role="entrance")
+        section = Camera.objects.create(name="Section A", source="rtsp://a", section="A")
+
+        supervisor.reload()
+        first = supervisor.workers[section.pk]
+        self.assertEqual(set(supervisor.workers), {entrance.pk, section.pk})
+
+        # Unchanged rows keep their worker
+        supervisor.reload()
+        self.assertIs(supervisor.workers[section.pk], first)
+
+        # Slot geometry change restarts the camera
+        ParkingSlot.objects.create(camera=section, name="SlotA", polygon=[[0, 0], [10, 0], [10, 10]])
+        supervisor.reload()
+        self.assertFalse(first.alive)
+        self.assertIsNot(supervisor.workers[section.pk], first)
+
+        # Disabled cameras are stopped
+        entrance.enabled = False
+        entrance.save()
+        supervisor.reload()
+        self.assertEqual(set(supervisor.workers), {section.pk})
+
+    def test_reload_error_does_not_stop_the_loop(self):
+        from django.db import OperationalError
+
+        calls = []
+
+        class Flaky(Supervisor):
+            def reload(self):
+                calls.append(1)
+                if len(calls) == 1:
+                    raise OperationalError("database is locked")
+                raise KeyboardInterrupt   # ends run() after the retry
+
+        logged = []
+        Flaky(workers=1, log=logged.append, worker_factory=self.FakeWorker).run(0)
+        self.assertEqual(len(calls), 2)
+        self.assertIn("[supervisor] reload failed: database is locked", logged)
+
+
+class MotionGateTests(SimpleTestCase):
+    def test_static_scene_is_skipped_until_refresh(self):
+        gate = MotionGate(refresh_seconds=60)
+        still = np.full((240, 320, 3), 90, np.uint8)
+        self.assertTrue(gate.should_process(still))   # first frame primes it
+        self.assertFalse(gate.should_process(still))
+        self.assertTrue(gate.should_process(still, force=True))
+
+        moved = still.copy()
+        cv2.rectangle(moved, (100, 100), (180, 160), (255, 255, 255), -1)
+        self.assertTrue(gate.should_process(moved))
+        self.assertEqual(gate.stats(), {"passed": 3, "skipped": 1})
+
+    def test_motion_outside_regions_is_ignored(self):
+        gate = MotionGate(refresh_seconds=60, regions=[[(0, 0), (50, 0), (50, 50), (0, 50)]])
+        still = np.full((240, 320, 3), 90, np.uint8)
+        gate.should_process(still)
+        moved = still.copy()
+        cv2.rectangle(moved, (200, 150), (300, 230), (255, 255, 255), -1)
+        self.assertFalse(gate.should_process(moved))
+
+
+# Imports everything a web worker loads and reports what it cost
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import django
+from django.conf import settings
+django.setup()
+from django.urls import resolve
+from parkingApp.wsgi import application
+import parking.admin, detectors.alpr, detectors.yolo_detector
+resolve("/dashboard/")
+heavy = [m for m in ("torch", "ultralytics", "easyocr") if m in sys.modules]
+print(json.dumps({"seconds": time.perf_counter() - start, "heavy": heavy}))
+"""
+
+
+class PreviewTests(SimpleTestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.hub = PreviewHub(fps=4, quality=70, clock=lambda: self.now[0])
+        self.frame = np.zeros((480, 640, 3), np.uint8)
+        self.drawn = 0
+
+    def draw(self, frame):
+        self.drawn += 1
+        return frame
+
+    def test_nothing_is_drawn_without_viewers_and_streams_are_throttled(self):
+        for _ in range(50):
+            self.assertFalse(self.hub.offer("gate", self.frame, self.draw))
+        self.assertEqual(self.drawn, 0)
+
+        parts = self.hub.stream("gate")
+        for i in range(32):
+            self.now[0] = i / 16   # 16 fps camera for 2 seconds
+            self.hub.offer("gate", self.frame, self.draw)
+        self.assertEqual(self.drawn, 8)
+        part = next(parts)
+        self.assertTrue(part.startswith(b"--frame\r\nContent-Type: image/jpeg"))
+
+        # Last viewer gone: back to no work at all
+        parts.close()
+        self.now[0] = 10
+        self.assertFalse(self.hub.offer("gate", self.frame, self.draw))
+        self.assertEqual(self.hub.stats()["gate"], {"viewers": 0, "frames": 8})
+
+    def test_idle_stream_keeps_writing(self):
+        # A write is how the server notices a viewer that has gone
+        parts = self.hub.stream("gate", timeout=0.01)
+        self.assertEqual(next(parts), b"\r\n")
+        self.hub.offer("gate", self.frame, self.draw)
+        part = next(parts)
+        self.assertTrue(part.startswith(b"--frame\r\n"))
+        self.assertEqual(next(parts), part)
+        parts.close()
+        self.assertEqual(self.hub.stats()["gate"]["viewers"], 0)
+
+    def test_snapshot_over_http(self):
+        from urllib.error import HTTPError
+        from urllib.request import urlopen
+
+        server = start_preview_server(0, hub=self.hub, log=lambda msg: None)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        self.hub.offer("gate", self.frame, self.draw)
+        stop = threading.Event()
+
+        def camera():
+            while not stop.wait(0.01):
+                self.now[0] += 0.04
+                self.hub.offer("gate", self.frame, self.draw)
+        feeder = threading.Thread(target=camera)
+        feeder.start()
+        try:
+            with urlopen(f"{base}/gate/snapshot.jpg", timeout=5) as response:
+                image = cv2.imdecode(np.frombuffer(response.read(), np.uint8), cv2.IMREAD_COLOR)
+            with self.assertRaises(HTTPError):
+                urlopen(f"{base}/nope/snapshot.jpg", timeout=5)
+        finally:
+            stop.set()
+            feeder.join()
+        self.assertEqual(image.shape, (480, 640, 3))
+        self.assertEqual(self.drawn, 1)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def test_warming_an_unknown_model_names_the_valid_ones(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaisesRegex(CommandError, "Unknown model.*yolov9.*ocr, yolo"):
+            call_command("warm_models", "yolov9", "--no-infer")
+
+    def test_model_is_loaded_once_on_first_use(self):
+        calls = []
+
+        @registry.register("fake")
+        def load():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        self.addCleanup(registry.unload, "fake")
+        self.assertFalse(registry.is_loaded("fake"))
+        threads = [threading.Thread(target=registry.get_model, args=("fake",)) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertIn("fake", registry.load_times())
+
+    def _startup(self):
+        out = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE],
+            capture_output=True, text=True, check=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "parkingApp.settings"},
+        )
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    def test_web_startup_does_not_load_models(self):
+        self.assertEqual(self._startup()["heavy"], [])
+
+    @benchmark
+    def test_web_startup_is_fast(self):
+        self.assertLess(self._startup()["seconds"], 1.0)
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    def test_camera_writers_do_not_lose_events(self):
+        report = dbbench.run_writers(writers=4, sessions=30, batch_size=10)
+        self.assertEqual(report["failed_writers"], 0)
+        self.assertEqual(report["events"], 4 * 30 * 3)
+        # Every vehicle entered, got a slot and left
+        self.assertEqual(ParkingRecord.objects.count(), 120)
+        self.assertFalse(ParkingRecord.objects.filter(exit_time__isnull=True).exists())
+        self.assertFalse(ParkingRecord.objects.filter(slot__isnull=True).exists())
+        self.assertEqual(counters.snapshot()["inside"], 0)
+
+    def test_cleanup_leaves_the_dashboard_as_it_was(self):
+        ParkingRecord.objects.create(plate="KA01AB1234")
+        counters.rebuild()
+        # A writer that died after its entries: bench sessions left open
+        quiet = lambda msg: None
+        apply_events(dbbench.camera_events(0, 5)[:10], log=quiet, index=OpenSessionIndex())
+        self.assertEqual(counters.snapshot()["inside"], 6)
+
+        dbbench.cleanup()
+        snapshot = counters.snapshot()
+        self.assertEqual((snapshot["inside"], snapshot["occupied"]), (1, {}))
+
+
+class DetectorBackendTests(SimpleTestCase):
+    def test_decode_maps_letterboxed_boxes_back_to_the_frame(self):
+        frame = np.zeros((480, 640, 3), np.uint8)
+        blob, [(scale, pad)] = backends.preprocess([frame], 320)
+        self.assertEqual(blob.shape, (1, 3, 320, 320))
+
+        # Raw YOLOv8 output: a car, a duplicate of it, and a person
+        output = np.zeros((84, 3), np.float32)
+        car = (100, 200, 300, 400)   # x1, y1, x2, y2 in frame pixels
+        cx = (car[0] + car[2]) / 2 * scale + pad[0]
+        cy = (car[1] + car[3]) / 2 * scale + pad[1]
+        bw, bh = (car[2] - car[0]) * scale, (car[3] - car[1]) * scale
+        output[:4, 0] = output[:4, 1] = output[:4, 2] = (cx, cy, bw, bh)
+        output[4 + 2, 0], output[4 + 2, 1] = 0.9, 0.8   # car (COCO 2)
+        output[4 + 0, 2] = 0.95                         # person
+
+        dets = backends.decode(output, scale, pad, frame.shape)
+        self.assertEqual(len(dets), 1)
+        x1, y1, x2, y2, name, conf = dets[0]
+        self.assertEqual(name, "car")
+        self.assertAlmostEqual(conf, 0.9, places=5)
+        for got, want in zip((x1, y1, x2, y2), car):
+            self.assertLessEqual(abs(got - want), 1)
+
+    def test_config_parsing_and_labels(self):
+        base = backends.parse_config({"backend": "onnx", "imgsz": 640})
+        config = backends.parse_config("imgsz=480,int8=1,threads=2", base)
+        self.assertEqual(config, backends.DetectorConfig("onnx", 480, True, 2))
+        self.assertEqual(backends.label(config), "onnx-480-int8-t2")
+        self.assertTrue(backends.exported_path("yolov8s.pt", config, "models").endswith("yolov8s_480_int8.onnx"))
+        with self.assertRaises(ValueError):
+            backends.parse_config("backend=tensorrt")
@@ -0,0 +1,14 @@
+from django.urls import path, re_path
+from . import views
+
+app_name = "parking"
+
+urlpatterns = [
+    path("kiosk/<int:record_id>/", views.exit_kiosk, name="exit_kiosk"),
+    path("kiosk/<int:record_id>/qr.png", views.kiosk_qr, name="kiosk_qr"),
+    path("dashboard/", views.dashboard, name="dashboard"),
+    path("dashboard/data/", views.dashboard_data, name="dashboard_data"),
+    path("dashboard/stream/", views.dashboard_stream, name="dashboard_stream"),
+    path("payments/webhook/", views.payment_webhook, name="payment_webhook"),
+    re_path(r"^export/(?P<kind>sessions|payments)\.(?P<fmt>csv|json)$", views.export_data, name="export"),
+]
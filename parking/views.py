@@ -1,45 +1,239 @@
-from django.shortcuts import render
 # parking/views.py
-import razorpay, qrcode
-from django.shortcuts import render, get_object_or_404
+import asyncio, io, itertools, json, time
+from datetime import timedelta
+from functools import lru_cache
+import qrcode
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Q
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
 from .models import ParkingRecord, Payment
+from . import counters
+from .gateway import get_gateway
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from . import export, payments
+from django.views.decorators.http import require_POST
+
+# Export chunks fetched per sync_to_async call when streaming under ASGI
+EXPORT_CHUNKS_PER_HOP = 200
+
+
+@lru_cache(maxsize=512)
+def upi_qr_png(record_id, amount):
+    """UPI QR for one record and amount, encoded once and kept in memory."""
+    upi_link = f"upi://pay?pa={settings.UPI_ID}&pn=MyParkingLot&am={amount}&tn=Parking+Fee"
+    buf = io.BytesIO()
+    qrcode.make(upi_link).save(buf)
+    return buf.getvalue()
+
+
+def close_at_kiosk(rec):
+    # Lock the open row so two kiosk hits can't both close (and count) it,
+    # and count the slot it holds now, not the one `rec` was loaded with
+    now = timezone.now()
+    with transaction.atomic():
+        row = (ParkingRecord.objects.select_for_update()
+               .filter(pk=rec.pk, exit_time__isnull=True)
+               .values_list("section", "slot").first())
+        if row is not None:
+            section, slot = row
+            ParkingRecord.objects.filter(pk=rec.pk, exit_time__isnull=True).update(exit_time=now)
+            counters.bump(counters.session_deltas(exited_sections=[section if slot else None]))
+    rec.refresh_from_db(fields=["exit_time", "section", "slot"])
+
+
+def create_order(payment):
+    """
+    Create the gateway order for `payment` unless it already has one and
+    store its id. Runs in a worker thread; if the kiosk request gave up
+    waiting, the id is still saved and the next refresh picks it up.
 
-client = razorpay.Client(
-    auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-)
+    Only one request at a time may call the gateway for a payment: it
+    claims the row first (order_claimed_at), and refreshes that arrive
+    while the call is in flight get None instead of creating another order.
+    A claim older than PAYMENT_ORDER_CLAIM_SECONDS is treated as abandoned.
+    """
+    if payment.razorpay_order_id:
+        return payment.razorpay_order_id
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.PAYMENT_ORDER_CLAIM_SECONDS)
+    claimed = Payment.objects.filter(
+        Q(order_claimed_at__isnull=True) | Q(order_claimed_at__lt=stale),
+        pk=payment.pk, razorpay_order_id__isnull=True,
+    ).update(order_claimed_at=now)
+    if not claimed:
+        # Stored meanwhile, or another request is creating it right now
+        return Payment.objects.values_list("razorpay_order_id", flat=True).get(pk=payment.pk)
+    try:
+        order = get_gateway().create_order(
+            int(payment.amount * 100),  # in paise
+            f"recpt_{payment.parking_record_id}",
+        )
+    except Exception:
+        # Let the next refresh try again
+        Payment.objects.filter(pk=payment.pk, order_claimed_at=now).update(order_claimed_at=None)
+        raise
+    Payment.objects.filter(pk=payment.pk, razorpay_order_id__isnull=True).update(
+        razorpay_order_id=order["id"])
+    return Payment.objects.values_list("razorpay_order_id", flat=True).get(pk=payment.pk)
 
-def exit_kiosk(request, record_id):
-    rec = get_object_or_404(ParkingRecord, pk=record_id, exit_time__isnull=True)
-    rec.exit_time = timezone.now()
-    rec.save()
-    amount = int(rec.amount_due() * 100)  # in paise
 
-    # create or get Payment
-    payment, created = Payment.objects.get_or_create(
+async def exit_kiosk(request, record_id):
+    rec = await ParkingRecord.objects.filter(pk=record_id).afirst()
+    if rec is None:
+        raise Http404("No such parking record")
+    if rec.exit_time is None:
+        await sync_to_async(close_at_kiosk)(rec)
+
+    # create or get Payment; amount is fixed at the first kiosk visit
+    payment, created = await Payment.objects.aget_or_create(
        parking_record=rec,
        defaults={"amount": rec.amount_due(), "method": "UPI"}
     )
 
-    razorpay_order = client.order.create({
-        "amount": amount,
-        "currency": "INR",
-        "receipt": f"recpt_{rec.id}",
-        "payment_capture": 1
-    })
-    payment.razorpay_order_id = razorpay_order['id']
-    payment.save()
-
-    # Generate UPI QR code
-    upi_link = f"upi://pay?pa={settings.UPI_ID}&pn=MyParkingLot&am={rec.amount_due()}&tn=Parking+Fee"
-    img = qrcode.make(upi_link)
-    img.save(f"/tmp/upi_{rec.id}.png")
+    # The gateway call must not hold up the kiosk page
+    try:
+        order_id = await asyncio.wait_for(
+            sync_to_async(create_order, thread_sensitive=False)(payment),
+            timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        order_id = None
+    order = {"id": order_id, "amount": int(payment.amount * 100), "currency": "INR"} if order_id else None
 
-    return render(request, "exit_kiosk.html", {
+    return render(request, "parking/exit_kiosk.html", {
         "record": rec,
-        "order": razorpay_order,
-        "qr_url": f"/static/upi_{rec.id}.png",
+        "payment": payment,
+        "order": order,
+        "qr_url": reverse("parking:kiosk_qr", args=[rec.id]),
     })
 
+
+async def kiosk_qr(request, record_id):
+    amount = await Payment.objects.filter(parking_record_id=record_id).values_list(
+        "amount", flat=True).afirst()
+    if amount is None:
+        raise Http404("No payment for this record")
+    png = upi_qr_png(record_id, amount)
+    response = HttpResponse(png, content_type="image/png")
+    response["Cache-Control"] = "private, max-age=300"
+    return response
+
+
+def dashboard(request):
+    return render(request, "parking/dashboard.html", {"stats": counters.snapshot()})
+
+
+def dashboard_data(request):
+    # Served from the counter snapshot, never from ParkingRecord
+    return JsonResponse(counters.snapshot())
+
+
+def _sse_message(data, last):
+    """(chunk, body) for one poll: the data if it changed, else a keep-alive."""
+    body = {k: v for k, v in data.items() if k != "updated"}
+    if body != last:
+        return f"data: {json.dumps(data)}\n\n", body
+    return ": keep-alive\n\n", last
+
+
+def dashboard_stream(request):
+    """
+    Server-sent events: pushes the snapshot whenever it changes.
+
+    Under ASGI (uvicorn parkingApp.asgi:application) the stream is an async
+    generator, so idle viewers hold no worker thread between updates. WSGI
+    servers (runserver, gunicorn sync workers) cannot stream async
+    iterators, so there the stream is synchronous and ends after
+    DASHBOARD_STREAM_WSGI_SECONDS; EventSource reconnects on its own, and a
+    worker is never pinned to one viewer for good.
+    """
+    interval = settings.DASHBOARD_STREAM_INTERVAL
+
+    async def async_events():
+        last = None
+        while True:
+            chunk, last = _sse_message(await sync_to_async(counters.snapshot)(), last)
+            yield chunk
+            await asyncio.sleep(interval)
+
+    def sync_events():
+        last = None
+        deadline = time.monotonic() + settings.DASHBOARD_STREAM_WSGI_SECONDS
+        yield f"retry: {int(interval * 1000)}\n\n"
+        while True:
+            chunk, last = _sse_message(counters.snapshot(), last)
+            yield chunk
+            if time.monotonic() + interval > deadline:
+                return
+            time.sleep(interval)
+
+    events = async_events() if isinstance(request, ASGIRequest) else sync_events()
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _async_chunks(chunks, batch=EXPORT_CHUNKS_PER_HOP):
+    """
+    Async iterator over a sync one, `batch` chunks per thread hop. The
+    hops are thread-sensitive, so the database cursor stays on one thread.
+    """
+    take = sync_to_async(lambda: list(itertools.islice(chunks, batch)))
+
+    async def iterate():
+        try:
+            while part := await take():
+                for chunk in part:
+                    yield chunk
+        finally:
+            await sync_to_async(chunks.close)()
+    return iterate()
+
+
+@staff_member_required
+def export_data(request, kind, fmt):
+    """
+    /export/<sessions|payments>.<csv|json>?since=YYYY-MM-DD&until=YYYY-MM-DD&section=A
+    streamed row by row, so a year of data never sits in memory.
+    """
+    try:
+        start, end = export.day_bounds(request.GET.get("since"), request.GET.get("until"))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    section = request.GET.get("section") or None
+
+    chunks = export.stream(kind, fmt, start, end, section)
+    if isinstance(request, ASGIRequest):
+        # Django would otherwise collect a sync iterator into a list first
+        chunks = _async_chunks(chunks)
+    content_type = "text/csv" if fmt == "csv" else "application/json"
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    """
+    Razorpay callback. Only verified and queued here (one INSERT); the
+    reconciler applies it to the Payment, so bursts at peak exit time never
+    hold a request open on payment and counter row locks.
+    """
+    if not payments.verify_signature(request.body, request.headers.get("X-Razorpay-Signature")):
+        return HttpResponseBadRequest("invalid signature")
+    try:
+        event = payments.parse_webhook(request.body, request.headers.get("X-Razorpay-Event-Id"))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    if event is not None:
+        payments.enqueue([event])
+    return JsonResponse({"queued": event is not None})
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -69,17 +70,76 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'parkingApp.wsgi.application'
+# Production: `uvicorn parkingApp.asgi:application` (async dashboard stream)
+ASGI_APPLICATION = 'parkingApp.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE selects the backend: "sqlite" (default, small sites), "mysql"
+# (through PyMySQL) or "postgresql" (psycopg 3). Camera workers and the web
+# tier keep their connections open for DB_CONN_MAX_AGE seconds instead of
+# reconnecting per request/batch; with DB_POOL=1 PostgreSQL uses a real
+# connection pool (psycopg[pool]) of up to DB_POOL_SIZE connections instead.
+# DB_WAL=1 switches SQLite to WAL; set it on deployments only, the journal
+# mode is written into the database file (db.sqlite3 is tracked by git).
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+DB_WAL = os.environ.get("DB_WAL") == "1"
+
+if DB_ENGINE == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DB_NAME", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # WAL lets the dashboard read while a camera writes; IMMEDIATE
+                # takes the write lock at BEGIN so concurrent writers queue on
+                # the busy timeout instead of failing with "database is locked"
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;' if DB_WAL else '',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # File-backed test database so the concurrent writer test sees
+            # real file locking
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'NAME': os.environ.get("DB_NAME", "parking"),
+            'USER': os.environ.get("DB_USER", "parking"),
+            'PASSWORD': os.environ.get("DB_PASSWORD", ""),
+            'HOST': os.environ.get("DB_HOST", "127.0.0.1"),
+            'PORT': os.environ.get("DB_PORT", ""),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Drop dead persistent connections (DB restart) before reuse
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if DB_ENGINE == "mysql":
+        import pymysql
+        pymysql.install_as_MySQLdb()
+        DATABASES['default']['ENGINE'] = 'django.db.backends.mysql'
+        DATABASES['default']['OPTIONS'] = {
+            'charset': 'utf8mb4',
+            # Fewer gap locks between camera writers than REPEATABLE READ
+            'isolation_level': 'read committed',
+            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
+        }
+    elif DB_ENGINE == "postgresql":
+        DATABASES['default']['ENGINE'] = 'django.db.backends.postgresql'
+        if os.environ.get("DB_POOL") == "1":
+            # The pool replaces persistent connections
+            DATABASES['default']['CONN_MAX_AGE'] = 0
+            DATABASES['default']['OPTIONS'] = {
+                'pool': {'min_size': 2, 'max_size': int(os.environ.get("DB_POOL_SIZE", 10))},
+            }
+    else:
+        raise ValueError(f"Unknown DB_ENGINE {DB_ENGINE!r}")
 
 
 # Password validation
@@ -122,3 +182,157 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Camera pipeline
+# Models are loaded on first use (see detectors/registry.py), never at import;
+# `manage.py warm_models` or run_cameras loads them up front.
+YOLO_WEIGHTS = "yolov8s.pt"  # or yolov8n/yolov8m as you need
+OCR_LANGUAGES = ["en"]
+
+# Vehicle detector backend (detectors/backends.py): "torch" runs YOLO_WEIGHTS
+# directly; "onnx" and "openvino" run a copy exported into MODEL_DIR by
+# `manage.py export_models`, optionally INT8. imgsz is the network input size
+# and threads the intra-op thread count (None: runtime default).
+# Camera.detector overrides any of these per camera; compare settings on
+# recorded clips with `manage.py replay_bench --detector ...`.
+DETECTOR = {"backend": "torch", "imgsz": 640, "int8": False, "threads": None}
+MODEL_DIR = BASE_DIR / "models"
+
+# EasyOCR stays on PyTorch: int8 is its dynamic quantisation, threads the
+# torch thread count, and recognize_only skips EasyOCR's text detector on
+# crops that are already plate regions (ALPR_STRATEGY = "crop").
+OCR = {"int8": True, "threads": None, "recognize_only": False}
+
+# Frames from all cameras in a process are batched into one YOLO call:
+# up to YOLO_MAX_BATCH frames, waiting at most YOLO_MAX_WAIT_MS for more.
+YOLO_MAX_BATCH = 8
+YOLO_MAX_WAIT_MS = 20
+# A camera gives up on a frame whose detections take longer than this
+# (stalled inference server) instead of blocking its loop for good
+YOLO_RESULT_TIMEOUT = 10
+
+# "full" runs OCR over the whole frame, "crop" only over candidate plate regions
+ALPR_STRATEGY = "crop"
+
+# A tracked vehicle's plate is accepted once every character is backed by
+# this many OCR reads; no further OCR runs on that vehicle afterwards.
+PLATE_VOTES_REQUIRED = 3
+
+# Detection events are written by a background thread in batches of up to
+# EVENT_BATCH_SIZE, at least every EVENT_FLUSH_INTERVAL_MS. Camera loops block
+# (then drop) once EVENT_QUEUE_SIZE events are waiting. A failing batch is
+# retried EVENT_RETRIES times; events that still fail are appended to
+# EVENT_DEAD_LETTER_FILE for `manage.py replay_events`.
+EVENT_QUEUE_SIZE = 1000
+EVENT_BATCH_SIZE = 200
+EVENT_FLUSH_INTERVAL_MS = 200
+EVENT_RETRIES = 3
+EVENT_DEAD_LETTER_FILE = BASE_DIR / "events.deadletter.jsonl"
+
+# Payments
+RAZORPAY_KEY_ID = os.environ.get("RAZORPAY_KEY_ID", "")
+RAZORPAY_KEY_SECRET = os.environ.get("RAZORPAY_KEY_SECRET", "")
+UPI_ID = os.environ.get("UPI_ID", "")
+# Signs the gateway's callbacks to /payments/webhook/ (Razorpay dashboard)
+RAZORPAY_WEBHOOK_SECRET = os.environ.get("RAZORPAY_WEBHOOK_SECRET", "")
+# Use "parking.gateway.FakeGateway" for local development and tests
+PAYMENT_GATEWAY = os.environ.get("PAYMENT_GATEWAY", "parking.gateway.RazorpayGateway")
+# The kiosk renders without a gateway order if it takes longer than this
+PAYMENT_GATEWAY_TIMEOUT = 3  # seconds
+# A kiosk request creating a gateway order holds it this long at most before
+# another request may try again (e.g. after a crashed worker)
+PAYMENT_ORDER_CLAIM_SECONDS = 60
+
+# Webhook reconciliation (parking/payments.py): queued callbacks are applied
+# every PAYMENT_RECONCILE_INTERVAL seconds, PAYMENT_RECONCILE_BATCH per
+# transaction. Every PAYMENT_SWEEP_INTERVAL seconds pending orders older than
+# PAYMENT_SWEEP_AFTER (and younger than PAYMENT_SWEEP_MAX_AGE) seconds are
+# checked with the gateway. run_cameras runs both (None: only via
+# `manage.py reconcile_payments`).
+PAYMENT_RECONCILE_INTERVAL = 2
+PAYMENT_RECONCILE_BATCH = 500
+PAYMENT_SWEEP_INTERVAL = 300
+PAYMENT_SWEEP_AFTER = 600
+PAYMENT_SWEEP_MAX_AGE = 24 * 3600
+# Applied callbacks are deleted from the inbox after this many days (after
+# each sweep); keep it longer than the gateway's webhook retry window
+PAYMENT_EVENT_RETENTION_DAYS = 30
+
+# Parking fares (parking/tariff.py). bands are (up_to_minutes, rate_per_hour)
+# charged per minute, the last one open-ended; stays up to grace_minutes are
+# free; daily_cap limits each 24h block. "sections" overrides any of these
+# per ParkingRecord.section, e.g.
+#   "sections": {"VIP": {"bands": [(None, 40)], "daily_cap": 500}}
+TARIFF = {
+    "bands": [(None, 10)],
+    "grace_minutes": 0,
+    "daily_cap": None,
+    "sections": {},
+}
+
+# Archival (parking/archive.py): closed, paid sessions that exited more than
+# ARCHIVE_AFTER_DAYS ago move to ArchivedParkingRecord, ARCHIVE_BATCH_SIZE
+# per transaction. run_cameras does this every ARCHIVE_INTERVAL seconds
+# (None: only via `manage.py archive_sessions`).
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_INTERVAL = 6 * 3600
+
+# Dashboard live updates: how often the stream checks for new numbers. Serve
+# the site with an ASGI server (`uvicorn parkingApp.asgi:application`) so
+# viewers hold no worker thread; under WSGI each stream is cut after
+# DASHBOARD_STREAM_WSGI_SECONDS and the browser reconnects.
+DASHBOARD_STREAM_INTERVAL = 2  # seconds
+DASHBOARD_STREAM_WSGI_SECONDS = 30
+
+# Stage timing histograms of the camera processes. Set METRICS_PORT (or pass
+# --metrics-port) to serve them as Prometheus text on 127.0.0.1:<port>/metrics;
+# a summary line per camera is logged every METRICS_LOG_INTERVAL seconds (0 = off).
+METRICS_PORT = None
+METRICS_LOG_INTERVAL = 60
+
+# Camera commands run headless unless CAMERA_DISPLAY (or --display) opens a
+# local OpenCV window. With PREVIEW_PORT (or --preview-port) set, each camera
+# process serves 127.0.0.1:<port>/<camera>/stream.mjpg and /snapshot.jpg;
+# overlays are only drawn while someone watches, at most PREVIEW_FPS frames a
+# second, scaled down to PREVIEW_WIDTH pixels and JPEG-encoded at
+# PREVIEW_JPEG_QUALITY.
+CAMERA_DISPLAY = False
+PREVIEW_PORT = None
+PREVIEW_FPS = 5
+PREVIEW_WIDTH = 960
+PREVIEW_JPEG_QUALITY = 70
+
+# run_cameras: all cameras in one process. CAMERA_WORKERS caps how many
+# process frames at once (None = CPU cores); the Camera table is re-read
+# every CAMERA_RELOAD_INTERVAL seconds; dead streams retry with backoff.
+CAMERA_WORKERS = None
+CAMERA_RELOAD_INTERVAL = 10
+CAMERA_RESTART_MAX_BACKOFF = 60
+
+# Motion gate in front of detection/OCR: a frame is only analysed if more than
+# MOTION_MIN_AREA of the watched pixels changed by over MOTION_THRESHOLD grey
+# levels, or MOTION_REFRESH_SECONDS passed since the last analysed frame.
+MOTION_GATE = True
+MOTION_THRESHOLD = 25
+MOTION_MIN_AREA = 0.002
+MOTION_REFRESH_SECONDS = 5
+
+# Section cameras detect on tiles around their slot polygons rather than
+# the whole frame: each slot's box grown by SECTION_TILE_MARGIN of its size,
+# overlapping boxes merged and split into tiles of SECTION_TILE_SIZE pixels
+# (None: the detector input size, i.e. native resolution) overlapping by
+# SECTION_TILE_OVERLAP.
+SECTION_TILING = True
+SECTION_TILE_SIZE = None
+SECTION_TILE_MARGIN = 0.25
+SECTION_TILE_OVERLAP = 0.2
+
+# Slot occupancy debounce: a car must be seen in a slot for
+# SLOT_ARRIVE_SECONDS before it is assigned, and gone for SLOT_LEAVE_SECONDS
+# before the slot is released. Section cameras remember up to
+# SLOT_PLATE_CACHE_SIZE announced plates for SLOT_PLATE_CACHE_TTL seconds.
+SLOT_ARRIVE_SECONDS = 2
+SLOT_LEAVE_SECONDS = 5
+SLOT_PLATE_CACHE_SIZE = 1000
+SLOT_PLATE_CACHE_TTL = 6 * 3600